@@ -1,34 +1,40 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
 import sys
 import os
 import getopt
 import gettext
-from engines.sqlite import read_sites as sqlite_read_sites,\
-    add_site as sqlite_add_site,\
-    delete_site as sqlite_delete_site
-from engines.csv_engine import read_sites as csv_read_sites,\
-    add_site as csv_add_site,\
-    delete_site as csv_delete_site
-from engines.sitemap import read_sites as sitemap_read_sites
-from engines.sitespeed_result import read_sites as sitespeed_read_sites
-from engines.webperf import read_sites as webperf_read_sites,\
-    add_site as webperf_add_site,\
-    delete_site as webperf_delete_site
-from engines.json_engine import read_sites as json_read_sites,\
-    add_site as json_add_site,\
-    delete_site as json_delete_site
+from helpers.registry_helper import INPUT_ENGINES, get_engine_function, get_lazy_function,\
+    register_startup_report, set_startup_done
+from engines.utils import parse_shard
 from helpers.carbon_rating_helper import update_carbon_percentiles
 from helpers.credits_helper import get_credits, update_credits_markdown
-from helpers.dependency_helper import dependency
-from helpers.release_helper import set_new_release_version_in_env, update_release_version
+from helpers.journal_helper import get_journal_filename, get_journal_results,\
+    remove_journal, restart_journal, resume_journal
+from helpers.site_source_helper import collect_sites, read_sites_ahead
 from helpers.setting_helper import config_mapping, get_config, set_config,\
     set_config_from_cmd, set_runtime_config_only
-from helpers.test_helper import TEST_ALL,\
-    restart_failures_log, test_sites, validate_test_type, write_test_results
-from helpers.translation_helper import validate_translations
-from helpers.update_software_helper import filter_unknown_sources,\
-    update_licenses, update_software_info, update_user_agent
-from tests.utils import clean_cache_files
+from helpers.test_helper import TEST_ALL, get_fresh_site_tests, merge_test_results,\
+    restart_failures_log, sort_sites_by_staleness, test_sites, validate_test_type,\
+    write_test_results
+
+# Only imported when used, see helpers/registry_helper.py
+dependency = get_lazy_function('helpers.dependency_helper', 'dependency')
+set_new_release_version_in_env = get_lazy_function(
+    'helpers.release_helper', 'set_new_release_version_in_env')
+update_release_version = get_lazy_function('helpers.release_helper', 'update_release_version')
+validate_translations = get_lazy_function('helpers.translation_helper', 'validate_translations')
+filter_unknown_sources = get_lazy_function(
+    'helpers.update_software_helper', 'filter_unknown_sources')
+update_licenses = get_lazy_function('helpers.update_software_helper', 'update_licenses')
+update_software_info = get_lazy_function('helpers.update_software_helper', 'update_software_info')
+update_user_agent = get_lazy_function('helpers.update_software_helper', 'update_user_agent')
+clean_cache_files = get_lazy_function('tests.utils', 'clean_cache_files')
+run_queue_worker = get_lazy_function('helpers.queue_helper', 'run_queue_worker')
+run_service = get_lazy_function('helpers.service_helper', 'run_service')
+print_estimate = get_lazy_function('helpers.estimate_helper', 'print_estimate')
+enqueue_sites = get_lazy_function('engines.sqlite', 'enqueue_sites')
+read_queue_results = get_lazy_function('engines.sqlite', 'read_queue_results')
 
 def show_test_help(global_translation):
     """
@@ -79,16 +85,28 @@ class CommandLineOptions: # pylint: disable=too-many-instance-attributes,missing
     setting_filename = ''
     input_skip = 0
     input_take = -1
+    input_shard = None
+    workers = 1
+    resume = False
+    merge_filenames = []
+    queue_filename = ''
+    worker_queue_filename = ''
+    stale_first = False
+    deadline = None
+    estimate = False
+    serve_port = None
     add_url = ''
     delete_url = ''
     language = False
 
     read_sites = None
+    get_sites = None
     add_site = None
     delete_site = None
 
     def __init__(self):
         self.language = False
+        self.merge_filenames = []
 
     def update_credits(self, _):
         """
@@ -237,6 +255,130 @@ class CommandLineOptions: # pylint: disable=too-many-instance-attributes,missing
             print(self.language('TEXT_COMMAND_USAGE'))
             sys.exit(2)
 
+    def set_workers(self, arg):
+        """
+        Sets the number of worker processes sites are tested in.
+        This function attempts to parse the provided argument as an integer and
+        assigns it as the number of workers for the instance.
+        If the argument cannot be parsed into a positive integer,
+        the function prints a usage message and exits the program.
+
+        Args:
+            arg (str): The desired number of workers as a string.
+
+        Returns:
+            None
+        """
+        try:
+            self.workers = int(arg)
+        except (TypeError, ValueError):
+            print(self.language('TEXT_COMMAND_USAGE'))
+            sys.exit(2)
+
+        if self.workers < 1:
+            print(self.language('TEXT_COMMAND_USAGE'))
+            sys.exit(2)
+
+    def set_input_shard(self, arg):
+        """
+        Sets the input shard for the instance.
+        The argument is in the format k/n, meaning only sites belonging to shard k of n
+        (based on a hash of the site url) are tested.
+        If the argument is not in a valid format,
+        the function prints a usage message and exits the program.
+
+        Args:
+            arg (str): The desired shard as a string, for example 1/4.
+
+        Returns:
+            None
+        """
+        try:
+            self.input_shard = parse_shard(arg)
+        except ValueError as ex:
+            print(ex)
+            print(self.language('TEXT_COMMAND_USAGE'))
+            sys.exit(2)
+
+    def set_deadline(self, arg):
+        """
+        Sets when testing must be done, no new site is started after this
+        unless it is estimated to be done in time (sites already started are finished).
+        The argument is either a time (HH:MM, the next time it occurs)
+        or a date and time (YYYY-MM-DDTHH:MM).
+        If the argument is not in a valid format,
+        the function prints a usage message and exits the program.
+
+        Args:
+            arg (str): The deadline as a string.
+
+        Returns:
+            None
+        """
+        try:
+            if len(arg) <= 5:
+                deadline_time = datetime.strptime(arg, '%H:%M').time()
+                deadline = datetime.combine(datetime.now().date(), deadline_time)
+                if deadline < datetime.now():
+                    deadline += timedelta(days=1)
+            else:
+                deadline = datetime.fromisoformat(arg)
+        except ValueError:
+            print(self.language('TEXT_COMMAND_USAGE'))
+            sys.exit(2)
+        self.deadline = deadline
+
+    def add_merge_filename(self, arg):
+        """
+        Adds an output file (for example from another shard) to merge into -o/--output
+        """
+        self.merge_filenames.append(arg)
+
+    def set_queue_filename(self, arg):
+        """
+        Sets the SQLite queue file, sites from -i/--input are added to the queue
+        instead of being tested. Without input, results from the queue are written to
+        -o/--output.
+        """
+        self.queue_filename = arg
+
+    def set_worker_queue_filename(self, arg):
+        """
+        Run as worker, testing sites from the SQLite queue file until it is empty.
+        """
+        self.worker_queue_filename = arg
+
+    def set_serve_port(self, arg):
+        """
+        Run as service, accepting test jobs over HTTP on localhost at given port.
+        """
+        try:
+            self.serve_port = int(arg)
+        except ValueError:
+            print(self.language('TEXT_COMMAND_USAGE'))
+            sys.exit(2)
+
+    def enable_stale_first(self, _):
+        """
+        Test never tested sites first, followed by the sites with the oldest results
+        in -o/--output.
+        """
+        self.stale_first = True
+
+    def enable_estimate(self, _):
+        """
+        Estimate browser launches, DNS queries, HTTP fetches, wall time and
+        peak disk usage of testing the sites instead of testing them.
+        """
+        self.estimate = True
+
+    def enable_resume(self, _):
+        """
+        Resume a previous run, sites already found in the journal next to
+        the output file are not tested again.
+        """
+        self.resume = True
+
     def show_available_settings(self):
         """
         Display valid settings and their aliases.
@@ -354,42 +496,27 @@ class CommandLineOptions: # pylint: disable=too-many-instance-attributes,missing
         """
 
         self.input_filename = input_filename
-        file_ending = ""
-        file_long_ending = ""
-        if len(input_filename) > 4:
-            file_ending = input_filename[-4:].lower()
-        if len(input_filename) > 7:
-            file_long_ending = input_filename[-7:].lower()
-
-        add_site = None
-        delete_site = None
-        if file_long_ending == ".sqlite":
-            read_sites = sqlite_read_sites
-            add_site = sqlite_add_site
-            delete_site = sqlite_delete_site
-        elif file_ending == ".csv":
-            read_sites = csv_read_sites
-            add_site = csv_add_site
-            delete_site = csv_delete_site
-        elif file_ending == ".xml" or file_long_ending == ".xml.gz":
-            # https://example.com/sitemap.xml
-            # https://example.com/sitemap.xml.gz
-            read_sites = sitemap_read_sites
-        elif file_long_ending == ".result":
-            read_sites = sitespeed_read_sites
-        elif file_long_ending == ".webprf":
-            read_sites = webperf_read_sites
-            add_site = webperf_add_site
-            delete_site = webperf_delete_site
-        else:
-            read_sites = json_read_sites
-            add_site = json_add_site
-            delete_site = json_delete_site
-        self.read_sites = read_sites
-        self.add_site = add_site
-        self.delete_site = delete_site
+        self.read_sites = get_engine_function(INPUT_ENGINES, input_filename, 'read_sites')
+        self.get_sites = get_engine_function(INPUT_ENGINES, input_filename, 'get_sites')
+        self.add_site = get_engine_function(INPUT_ENGINES, input_filename, 'add_site')
+        self.delete_site = get_engine_function(INPUT_ENGINES, input_filename, 'delete_site')
 
 
+    def use_site_source(self):
+        """
+        Returns True if sites should be read while testing (see general.input.read-ahead),
+        this requires an input engine supporting it (get_sites) and a plain test run
+        (sites are not added, deleted, queued, sorted or resumed).
+        """
+        return self.get_sites is not None and\
+            get_config('general.input.read-ahead') > 0 and\
+            self.add_url == '' and\
+            self.delete_url == '' and\
+            self.queue_filename == '' and\
+            not self.stale_first and\
+            not self.resume and\
+            not self.estimate
+
     def try_load_language(self, arg):
         """
         Attempts to load the specified language for translation.
@@ -461,6 +588,16 @@ class CommandLineOptions: # pylint: disable=too-many-instance-attributes,missing
             ("--is", "--input-skip"): self.set_input_skip,
             ("-m", "--mobile"): self.enable_mobile,
             ("--it", "--input-take"): self.set_input_take,
+            ("--shard",): self.set_input_shard,
+            ("--merge",): self.add_merge_filename,
+            ("--workers",): self.set_workers,
+            ("--queue",): self.set_queue_filename,
+            ("--worker",): self.set_worker_queue_filename,
+            ("--serve",): self.set_serve_port,
+            ("--resume",): self.enable_resume,
+            ("--stale-first",): self.enable_stale_first,
+            ("--deadline",): self.set_deadline,
+            ("--estimate",): self.enable_estimate,
             ("-o", "--output"): self.set_output_filename,
             ("-r", "--review", "--report"): self.enable_reviews,
             ("-c", "--credits", "--contributors"): self.show_credits,
@@ -497,6 +634,17 @@ def main(argv):
     -r/--review\t\t\t: show reviews in terminal
     -i/--input <file path>\t: input file path (.json/.sqlite)
     -o/--output <file path>\t: output file path (.json/.csv/.sql/.sqlite/.md)
+    --shard <k>/<n>\t\t: only test sites in shard k of n (based on hash of url)
+    --merge <file path>\t\t: merge output file into -o/--output (can be used many times)
+    --workers <number>\t\t: number of sites to test in parallel (1 = default)
+    --resume\t\t\t: skip sites already tested in previous run (requires -o/--output)
+    --stale-first\t\t: test sites with oldest results in -o/--output first
+    --deadline <time>\t\t: don't start sites that won't be done before time (HH:MM)
+    --estimate\t\t\t: estimate browser launches, requests, time and disk usage (no testing)
+    --queue <file path>\t\t: add sites from -i/--input to queue (.sqlite),
+                                  without -i/--input write queue results to -o/--output
+    --worker <file path>\t: test sites from queue (.sqlite) until it is empty
+    --serve <port>\t\t: run as service with HTTP job API on localhost
     -A/--addUrl <site url>\t: website url (required in combination with -i/--input)
     -D/--deleteUrl <site url>\t: website url (required in combination with -i/--input)
     -L/--language <lang code>\t: language used for output(en = default/sv)
@@ -507,6 +655,7 @@ def main(argv):
     --uc/--update-credits\t\t: Update credits.md file
     """
 
+    register_startup_report()
     options = CommandLineOptions()
     options.load_language(get_config('general.language'))
 
@@ -525,7 +674,9 @@ def main(argv):
                                    "dep", "dependency", "check-dependency",
                                    "fus", "find-unknown-sources",
                                    "update-carbon=",
-                                   "is=", "it=", "setting=", "save-setting="])
+                                   "is=", "it=", "shard=", "merge=", "workers=", "resume", "queue=", "worker=",
+                                   "serve=", "stale-first", "deadline=", "estimate",
+                                   "setting=", "save-setting="])
     except getopt.GetoptError:
         print(main.__doc__)
         sys.exit(2)
@@ -536,13 +687,40 @@ def main(argv):
 
     for opt, arg in opts:
         options.handle_option(opt, arg)
+    set_startup_done()
+
+    if len(options.merge_filenames) > 0:
+        if options.output_filename == '':
+            print(options.language('TEXT_COMMAND_USAGE'))
+            sys.exit(2)
+        merge_test_results(options.output_filename, options.merge_filenames)
+        return
+
+    if options.serve_port is not None:
+        run_service(options.language, options.serve_port)
+        return
+
+    if options.worker_queue_filename != '':
+        run_queue_worker(options.language, options.worker_queue_filename)
+            # Cleanup exipred cache
+        clean_cache_files()
+        return
 
     show_help = True
-    if options.input_filename != '':
+    site_source = None
+    if options.input_filename != '' and options.use_site_source():
+        site_source = options.get_sites(
+            options.input_filename,
+            options.input_skip,
+            options.input_take,
+            options.input_shard)
+        show_help = False
+    elif options.input_filename != '':
         options.sites = options.read_sites(
             options.input_filename,
             options.input_skip,
-            options.input_take)
+            options.input_take,
+            options.input_shard)
         show_help = False
 
     if options.setting_filename != '':
@@ -563,16 +741,58 @@ def main(argv):
             options.delete_url,
             options.input_skip,
             options.input_take)
-    elif len(options.sites) > 0:
-        restart_failures_log()
+    elif len(options.sites) > 0 and options.queue_filename != '':
+        if options.stale_first:
+            options.sites = sort_sites_by_staleness(options.sites, options.output_filename)
+        nof_sites = enqueue_sites(options.queue_filename, options.sites, options.test_types)
+        print(f'Added {nof_sites} site(s) to queue {options.queue_filename}')
+    elif len(options.sites) > 0 and options.estimate:
+        print_estimate(options.sites,
+                       options.test_types,
+                       workers=options.workers,
+                       fresh_site_tests=get_fresh_site_tests(options.output_filename))
+    elif len(options.sites) > 0 or site_source is not None:
+        if options.stale_first:
+            options.sites = sort_sites_by_staleness(options.sites, options.output_filename)
+        journal_filename = get_journal_filename(options.output_filename)
+        sites = options.sites
+        if site_source is not None:
+            # Test sites while they are read, options.sites gets the sites as they are tested.
+            # Worker processes only take new sites when ready, so no reader thread is needed.
+            if options.workers <= 1:
+                site_source = read_sites_ahead(
+                    site_source, get_config('general.input.read-ahead'))
+            options.sites = []
+            sites = collect_sites(site_source, options.sites)
+        if options.resume:
+            journaled_sites = resume_journal(journal_filename)
+            sites = [site for site in options.sites if site[1] not in journaled_sites]
+        else:
+            restart_failures_log()
+            restart_journal(journal_filename)
+
         # run test(s) for every website
         test_results = test_sites(options.language,
-                                        options.sites,
-                                        test_types=options.test_types)
+                                        sites,
+                                        test_types=options.test_types,
+                                        workers=options.workers,
+                                        journal_filename=journal_filename,
+                                        fresh_site_tests=get_fresh_site_tests(
+                                            options.output_filename),
+                                        deadline=options.deadline)
+
+        if journal_filename is not None:
+            # rebuild results from journal so we include sites tested in previous run(s)
+            test_results = get_journal_results(journal_filename, options.sites)
 
         write_test_results(options.sites, options.output_filename, test_results, options.language)
+        remove_journal(journal_filename)
             # Cleanup exipred cache
         clean_cache_files()
+    elif options.queue_filename != '' and options.output_filename != '':
+        # write results from queue workers
+        sites, test_results = read_queue_results(options.queue_filename)
+        write_test_results(sites, options.output_filename, test_results, options.language)
     elif show_help:
         print(options.language('TEXT_COMMAND_USAGE'))
 
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import csv
+import sys
 from helpers.models import Sites, SiteTests
-from engines.utils import use_item
+from engines.utils import use_item, use_site
 
 def write_tests(output_filename, site_tests, _, _2):
     """
@@ -25,6 +26,33 @@ def write_tests(output_filename, site_tests, _, _2):
         writer.writerows(site_tests)
 
 
+def merge_tests(output_filename, input_filenames):
+    """
+    Merges site test results from several CSV files (for example outputs from
+    different shards) into one CSV formated file.
+    Rows are copied one by one, so no input file is loaded into memory.
+
+    Args:
+        output_filename (str): The name of the output file.
+        input_filenames (list): The CSV files to merge.
+
+    Returns:
+        None
+    """
+    # test data is stored in a single column and can be larger than default limit
+    csv.field_size_limit(sys.maxsize)
+
+    with open(output_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SiteTests.fieldnames())
+        writer.writeheader()
+
+        for input_filename in input_filenames:
+            print(f'Merging {input_filename} into {output_filename}')
+            with open(input_filename, newline='', encoding='utf-8') as input_file:
+                for row in csv.DictReader(input_file):
+                    writer.writerow(row)
+
+
 def add_site(input_filename, url, input_skip, input_take):
     """
     Adds a site to a list of sites in a CSV file.
@@ -90,7 +118,7 @@ def delete_site(input_filename, url, input_skip, input_take):
     return tmp_sites
 
 
-def read_sites(input_filename, input_skip, input_take):
+def read_sites(input_filename, input_skip, input_take, input_shard=None):
     """
     Reads a list of sites from a CSV file.
 
@@ -103,6 +131,7 @@ def read_sites(input_filename, input_skip, input_take):
         input_filename (str): The name of the input file.
         input_skip (int): The number of items to skip at the beginning.
         input_take (int): The number of items to take after skipping.
+        input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
 
     Returns:
         sites (list[tuple]): A list of tuples,
@@ -121,11 +150,13 @@ def read_sites(input_filename, input_skip, input_take):
             current_number_of_fields = len(row)
             if number_of_fields == current_number_of_fields:
                 # ignore first row as that is our header info
-                if current_index != 0 and use_item(current_index + 1, input_skip, input_take):
+                if current_index != 0 and use_item(current_index + 1, input_skip, input_take)\
+                        and use_site(row[1], input_shard):
                     sites.append([row[0], row[1]])
             elif current_number_of_fields == 1:
                 # we have no header and only one colmn, use column as website url
-                if use_item(current_index, input_skip, input_take):
+                if use_item(current_index, input_skip, input_take)\
+                        and use_site("".join(row), input_shard):
                     sites.append([current_index, "".join(row)])
             current_index += 1
 
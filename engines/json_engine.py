@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import json
-from engines.utils import use_item
+import os
+from engines.utils import use_item, use_site
 
 def add_site(input_filename, url, input_skip, input_take):
     """
@@ -67,7 +68,7 @@ def delete_site(input_filename, url, input_skip, input_take):
     return tmp_sites
 
 
-def read_sites(input_filename, input_skip, input_take):
+def read_sites(input_filename, input_skip, input_take, input_shard=None):
     """
     Reads a list of sites from a JSON file.
 
@@ -79,6 +80,7 @@ def read_sites(input_filename, input_skip, input_take):
         input_filename (str): The name of the input file.
         input_skip (int): The number of items to skip at the beginning.
         input_take (int): The number of items to take after skipping.
+        input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
 
     Returns:
         sites (list[tuple]): A list of tuples,
@@ -92,7 +94,8 @@ def read_sites(input_filename, input_skip, input_take):
         data = json.load(json_input_file)
         current_index = 0
         for site in data["sites"]:
-            if use_item(current_index, input_skip, input_take):
+            if use_item(current_index, input_skip, input_take) and\
+                    use_site(site["url"], input_shard):
                 sites.append([site["id"], site["url"]])
             current_index += 1
     return sites
@@ -170,6 +173,69 @@ def read_tests(input_filename, input_skip, input_take):
     return result
 
 
+def get_latest_test_dates(output_filename):
+    """
+    Returns the date of the latest test for every site in a JSON formated output file.
+    Test data is thrown away while the file is parsed so it is never held in memory.
+
+    Args:
+        output_filename (str): The name of the output file.
+
+    Returns:
+        dict: Date (as ISO formated str) of latest test, with site id (as str) as key.
+    """
+    latest_test_dates = {}
+    if not os.path.exists(output_filename):
+        return latest_test_dates
+
+    def without_test_data(pairs):
+        return {key: value for key, value in pairs if key != 'data'}
+
+    with open(output_filename, encoding='utf-8') as json_input_file:
+        data = json.load(json_input_file, object_pairs_hook=without_test_data)
+
+    for test_result in data.get("tests", []):
+        if 'site_id' not in test_result or 'date' not in test_result:
+            continue
+        site_id = str(test_result['site_id'])
+        if site_id not in latest_test_dates or\
+                latest_test_dates[site_id] < test_result['date']:
+            latest_test_dates[site_id] = test_result['date']
+    return latest_test_dates
+
+
+def merge_tests(output_filename, input_filenames):
+    """
+    Merges site test results from several JSON files (for example outputs from
+    different shards) into one JSON formated file.
+
+    Test results are written to the output file one by one as they are read,
+    so only one input file at a time is held in memory.
+
+    Args:
+        output_filename (str): The name of the output file.
+        input_filenames (list): The JSON files to merge.
+
+    Returns:
+        None
+    """
+    with open(output_filename, 'w', encoding='utf-8') as outfile:
+        # json require us to have an object as root element
+        outfile.write('{"tests": [')
+        is_first = True
+        for input_filename in input_filenames:
+            print(f'Merging {input_filename} into {output_filename}')
+            with open(input_filename, encoding='utf-8') as json_input_file:
+                data = json.load(json_input_file)
+            for test_result in data["tests"]:
+                if not is_first:
+                    outfile.write(', ')
+                json.dump(test_result, outfile)
+                is_first = False
+            del data
+        outfile.write(']}')
+
+
 def write_tests(output_filename, site_tests, _, _2):
     """
     Writes site test results to a JSON formated file from a given list of site tests.
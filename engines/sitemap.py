@@ -4,110 +4,76 @@ from urllib.parse import urlparse
 import gzip
 import io
 from bs4 import BeautifulSoup
-from engines.utils import use_item
-from tests.utils import get_http_content, merge_dicts
+from engines.utils import use_item, use_site
+from tests.utils import get_http_content
 
-def read_sites(input_sitemap_url, input_skip, input_take):
+def read_sites(input_sitemap_url, input_skip, input_take, input_shard=None):
     """
     This function reads site data from a specific sitemap.
+    Sites are given in the order they appear in the sitemap, with the same
+    indexes as get_sites gives them.
     
     Parameters:
     input_url (str): Absolute url to sitemap, .xml and .xml.bz fileendings are supported.
     input_skip (int): The number of lines to skip in the input file.
     input_take (int): The number of lines to take from the input file after skipping.
+    input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
     
     Returns:
     list: The list of sites read from the specified sitemap.
     """
-    ignore_none_html = True
-    sitemaps = read_sitemap(input_sitemap_url, input_skip, input_take, ignore_none_html)
-
-    sites = []
-    for index, address in enumerate(sitemaps['all']):
-        sites.append((index, address))
-
-    return sites
+    return list(get_sites(input_sitemap_url, input_skip, input_take, input_shard))
 
-def read_sitemap(input_sitemap_url, input_skip, input_take, ignore_none_html):
+def get_sites(input_sitemap_url, input_skip, input_take, input_shard=None):
     """
-    This function reads a sitemap from a given URL,
-    which can be in XML or gzipped XML format.
-    It then parses the sitemap content, filters the URLs based on certain conditions,
-    and returns a dictionary of URLs.
-    
+    This function yields site data from a specific sitemap, one site at a time.
+    Child sitemaps are only read when the sites before them have been used,
+    so testing can start before the whole sitemap is read.
+    Sites are given in the order they appear in the sitemap.
+
     Parameters:
-    input_sitemap_url (str): The URL of the sitemap.
-    input_skip (int): The number of URLs to skip.
-    input_take (int): The number of URLs to take after skipping.
-    ignore_none_html (bool): If True, non-HTML URLs are ignored.
-    
-    Returns:
-    dict: A dictionary containing all URLs and filtered URLs from the sitemap.
+    input_url (str): Absolute url to sitemap, .xml and .xml.bz fileendings are supported.
+    input_skip (int): The number of lines to skip in the input file.
+    input_take (int): The number of lines to take from the input file after skipping.
+    input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
+
+    Yields:
+    tuple: Site index and website url.
     """
-    result = {
-        'all': [],
-        'sitemapindex': [],
-        input_sitemap_url: []
-    }
-
-    if input_sitemap_url.endswith('.xml.gz'):
-        # unpack gzip:ed sitemap
-        sitemap_content = get_http_content(input_sitemap_url, True, False)
-        try:
-            if isinstance(sitemap_content, str):
-                return result
-            gzip_io = io.BytesIO(sitemap_content)
-            with gzip.GzipFile(fileobj=gzip_io, mode='rb') as gzip_file:
-                gzip_content = gzip_file.read()
-                sitemap_content = gzip_content.decode('utf-8', 'ignore')
-                result = merge_dicts(read_sitemap_xml(
-                    input_sitemap_url,
-                    sitemap_content,
-                    input_skip,
-                    input_take,
-                    ignore_none_html), result, True, False)
-        except gzip.BadGzipFile:
-            return result
-    else:
-        sitemap_content = get_http_content(input_sitemap_url, True, True)
-        result = merge_dicts(read_sitemap_xml(input_sitemap_url,
-            sitemap_content,
-            input_skip,
-            input_take,
-            ignore_none_html), result, True, False)
-
-    return result
-
-def read_sitemap_xml(input_url, sitemap_content, input_skip, input_take, ignore_none_html):
+    ignore_none_html = True
+    urls = get_sitemap_urls(input_sitemap_url, input_skip, input_take, ignore_none_html)
+    for index, address in enumerate(urls):
+        if use_site(address, input_shard):
+            yield (index, address)
+
+def get_sitemap_urls(input_sitemap_url, input_skip, input_take, ignore_none_html):
     """
-    This function parses the XML content of a sitemap,
-    filters the URLs based on certain conditions, and returns a dictionary of URLs.
-    
+    This function yields the urls in a sitemap (and its child sitemaps)
+    in the order they appear, reading child sitemaps when they are reached.
+
     Parameters:
-    input_url (str): The url to be used in the result dictionary for storing filtered URLs.
-    sitemap_content (str): The XML content of the sitemap.
+    input_sitemap_url (str): The URL of the sitemap.
     input_skip (int): The number of URLs to skip.
     input_take (int): The number of URLs to take after skipping.
     ignore_none_html (bool): If True, non-HTML URLs are ignored.
-    
-    Returns:
-    dict: A dictionary containing all URLs and filtered URLs.
+
+    Yields:
+    str: Url in the sitemap.
     """
-    result = {
-        'all': [],
-        'sitemapindex': []
-    }
+    sitemap_content = get_sitemap_content(input_sitemap_url)
+    if sitemap_content is None:
+        return
 
     root_element = get_root_element(sitemap_content)
     if root_element is None:
-        return result
-
-    # Get the direct children of the root element
-    children = [child for child in root_element.children \
-                if child.name in ('url', 'sitemap')]
+        return
+    is_sitemapindex = root_element.name.lower() == 'sitemapindex'
 
     current_index = 0
-    for child in children:
+    nof_urls = 0
+    for child in root_element.children:
+        if child.name not in ('url', 'sitemap'):
+            continue
         loc_children = [child for child in child.children \
                     if child.name == 'loc']
         if len(loc_children) == 0:
@@ -115,21 +81,24 @@ def read_sitemap_xml(input_url, sitemap_content, input_skip, input_take, ignore_
 
         item_url = loc_children[0].text
 
+        if input_take != -1 and current_index >= (input_skip + input_take):
+            # No more items will be used in this sitemap
+            return
+
         if not use_item(current_index, input_skip, input_take):
             current_index += 1
             continue
 
-        if root_element.name.lower() == 'sitemapindex':
-            result['sitemapindex'].append(input_url)
-            result = merge_dicts(read_sitemap(
-                item_url,
-                input_skip,
-                input_take,
-                ignore_none_html), result, True, False)
-            current_index += len(result['all'])
+        if is_sitemapindex:
+            for url in get_sitemap_urls(
+                    item_url,
+                    input_skip,
+                    input_take,
+                    ignore_none_html):
+                nof_urls += 1
+                yield url
+            current_index += nof_urls
         else:
-            if input_url not in result:
-                result[input_url] = []
             if ignore_none_html:
                 item_type = 'html'
                 tmp = os.path.splitext(urlparse(item_url).path)[1].strip('.').lower()
@@ -140,10 +109,32 @@ def read_sitemap_xml(input_url, sitemap_content, input_skip, input_take, ignore_
                 if item_type not in ('html', 'htm'):
                     print(f'- skipping because it is of type: {item_type}')
                     continue
-            result['all'].append(item_url)
-            result[input_url].append(item_url)
+            yield item_url
         current_index += 1
-    return result
+
+def get_sitemap_content(input_sitemap_url):
+    """
+    This function returns the XML content of a sitemap,
+    unpacking it if it is gzipped (.xml.gz).
+
+    Parameters:
+    input_sitemap_url (str): The URL of the sitemap.
+
+    Returns:
+    str: The XML content or None if it could not be read.
+    """
+    if not input_sitemap_url.endswith('.xml.gz'):
+        return get_http_content(input_sitemap_url, True, True)
+
+    sitemap_content = get_http_content(input_sitemap_url, True, False)
+    if isinstance(sitemap_content, str):
+        return None
+    try:
+        gzip_io = io.BytesIO(sitemap_content)
+        with gzip.GzipFile(fileobj=gzip_io, mode='rb') as gzip_file:
+            return gzip_file.read().decode('utf-8', 'ignore')
+    except gzip.BadGzipFile:
+        return None
 
 def get_root_element(sitemap_content):
     """
@@ -3,7 +3,7 @@ import os
 from pathlib import Path
 from urllib.parse import urlparse
 import re
-from engines.utils import use_item
+from engines.utils import use_item, use_site
 from helpers.setting_helper import get_config
 
 def get_url_from_file_content(input_filename):
@@ -78,7 +78,7 @@ def read_sites_from_directory(directory, hostname_or_argument, input_skip, input
 
     return sites
 
-def read_sites(hostname_or_argument, input_skip, input_take):
+def read_sites(hostname_or_argument, input_skip, input_take, input_shard=None):
     """
     Reads the sites from the cache directory based on the hostname or
     the argument that ends with '.result'.
@@ -87,10 +87,12 @@ def read_sites(hostname_or_argument, input_skip, input_take):
     hostname_or_argument (str): The hostname or the argument that ends with '.result'.
     input_skip (int): The number of items to skip from the start.
     input_take (int): The number of items to take after skipping. If -1, takes all items.
+    input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
 
     Returns:
     list: A list of sites where each site is represented as a
           list containing the path to the HAR file and the URL.
     """
     cache_folder = get_config('general.cache.folder')
-    return read_sites_from_directory(cache_folder, hostname_or_argument, input_skip, input_take)
+    sites = read_sites_from_directory(cache_folder, hostname_or_argument, input_skip, input_take)
+    return [site for site in sites if use_site(site[1], input_shard)]
@@ -1,6 +1,15 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
 import sqlite3
-from engines.utils import use_item
+import time
+from engines.utils import use_item, use_site
+
+# Number of times a site is leased before we give up on it
+# (for example if it makes the worker crash every time)
+QUEUE_MAX_ATTEMPTS = 3
 
 def db_tables(output_filename):
     """
@@ -75,7 +84,7 @@ def delete_site(input_filename, url, input_skip, input_take):
     return read_sites(input_filename, input_skip, input_take)
 
 
-def read_sites(input_filename, input_skip, input_take):
+def read_sites(input_filename, input_skip, input_take, input_shard=None):
     """
     Reads active sites from a SQLite database and returns a subset of them.
 
@@ -83,6 +92,7 @@ def read_sites(input_filename, input_skip, input_take):
         input_filename (str): The name of the SQLite database file.
         input_skip (int): The number of sites to skip before starting to take.
         input_take (int): The number of sites to take after skipping.
+        input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
 
     Returns:
         list: A list of sites,
@@ -96,7 +106,7 @@ def read_sites(input_filename, input_skip, input_take):
 
     current_index = 0
     for row in c.execute(f'SELECT id, website FROM sites WHERE active=1 ORDER BY {order_by}'):
-        if use_item(current_index, input_skip, input_take):
+        if use_item(current_index, input_skip, input_take) and use_site(row[1], input_shard):
             sites.append([row[0], row[1]])
         current_index += 1
     conn.close()
@@ -175,6 +185,57 @@ def write_tests(output_filename, site_tests, _, _2):
             print('db exception', str_ex)
 
 
+def merge_tests(output_filename, input_filenames):
+    """
+    Merges site test results from several SQLite databases (for example outputs from
+    different shards) into one SQLite database.
+
+    Every input database is attached and its rows are copied with INSERT ... SELECT,
+    this so no test results are loaded into memory.
+    Rows already in the output database (same site, test type and date) are not copied again,
+    making it safe to merge shards that started from a copy of the same database.
+    Finally most_recent is updated so only the latest result for every site and
+    test type is marked as most recent.
+
+    Parameters:
+    output_filename (str): The name of the SQLite database file to merge into,
+                           if it doesn't exist the first input file is used as base.
+    input_filenames (list): The SQLite database files to merge.
+    """
+    input_filenames = list(input_filenames)
+    if not os.path.exists(output_filename):
+        shutil.copyfile(input_filenames.pop(0), output_filename)
+
+    conn = sqlite3.connect(output_filename)
+    cursor = conn.cursor()
+
+    output_columns = [row[1] for row in cursor.execute('PRAGMA main.table_info(sitetests)')]
+    for input_filename in input_filenames:
+        print(f'Merging {input_filename} into {output_filename}')
+        cursor.execute('ATTACH DATABASE ? AS shard', (input_filename,))
+
+        input_columns = [row[1] for row in cursor.execute('PRAGMA shard.table_info(sitetests)')]
+        columns = ', '.join([column for column in output_columns
+                             if column in input_columns and column != 'id'])
+
+        cursor.execute(
+            f"INSERT INTO main.sitetests ({columns}) "
+            f"SELECT {columns} FROM shard.sitetests AS s WHERE NOT EXISTS ("
+            "SELECT 1 FROM main.sitetests AS m WHERE m.site_id=s.site_id AND "
+            "m.type_of_test=s.type_of_test AND m.test_date=s.test_date);")
+        conn.commit()
+        cursor.execute('DETACH DATABASE shard')
+
+    # only keep latest result for every site and test type as most recent
+    cursor.execute(
+        "UPDATE sitetests SET most_recent=0 WHERE most_recent=1 AND EXISTS ("
+        "SELECT 1 FROM sitetests AS n WHERE n.site_id=sitetests.site_id AND "
+        "n.type_of_test=sitetests.type_of_test AND n.most_recent=1 AND "
+        "n.test_date > sitetests.test_date);")
+    conn.commit()
+    conn.close()
+
+
 def ensure_latest_db_version(output_filename):
     """
     This function updates the 'sitetests' table in the SQLite database to the latest version.
@@ -214,3 +275,278 @@ def ensure_latest_db_version(output_filename):
 
     conn.commit()
     conn.close()
+
+
+def ensure_most_recent_index(conn):
+    """
+    Makes sure there is an index for looking up the most recent tests by date.
+    The index covers site_id and type_of_test so lookups never have to read the
+    (large) json_check_data column.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the SQLite database.
+    """
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS sitetests_most_recent "
+        "ON sitetests (most_recent, test_date, site_id, type_of_test);")
+    conn.commit()
+
+
+def get_fresh_site_tests(output_filename, max_age_minutes):
+    """
+    Returns the site tests (site and test type) whose most recent result
+    is newer than max_age_minutes.
+
+    Args:
+        output_filename (str): The name of the SQLite database file.
+        max_age_minutes (int): Max age, in minutes, for a result to be considered fresh.
+
+    Returns:
+        dict: Set of fresh test types for every site, with site id (as str) as key.
+              Type -1 means a combined result of several test types.
+    """
+    fresh_site_tests = {}
+    if not os.path.exists(output_filename):
+        return fresh_site_tests
+
+    oldest_date = (datetime.now() - timedelta(minutes=max_age_minutes)).isoformat()
+    conn = sqlite3.connect(output_filename)
+    try:
+        ensure_most_recent_index(conn)
+        for site_id, type_of_test in conn.execute(
+                "SELECT site_id, type_of_test FROM sitetests "
+                "WHERE most_recent=1 AND test_date >= ?;", (oldest_date,)):
+            fresh_site_tests.setdefault(str(site_id), set()).add(int(type_of_test))
+    except sqlite3.OperationalError as ex:
+        print('db exception', str(ex))
+    conn.close()
+    return fresh_site_tests
+
+
+def get_latest_test_dates(output_filename):
+    """
+    Returns the date of the latest test for every site, using one query
+    (and the most recent index) without reading any json_check_data.
+
+    Args:
+        output_filename (str): The name of the SQLite database file.
+
+    Returns:
+        dict: Date (as ISO formated str) of latest test, with site id (as str) as key.
+    """
+    latest_test_dates = {}
+    if not os.path.exists(output_filename):
+        return latest_test_dates
+
+    conn = sqlite3.connect(output_filename)
+    try:
+        ensure_most_recent_index(conn)
+        for site_id, test_date in conn.execute(
+                "SELECT site_id, MAX(test_date) FROM sitetests "
+                "WHERE most_recent=1 GROUP BY site_id;"):
+            latest_test_dates[str(site_id)] = test_date
+    except sqlite3.OperationalError as ex:
+        print('db exception', str(ex))
+    conn.close()
+    return latest_test_dates
+
+
+def connect_queue(queue_filename):
+    """
+    Connects to a SQLite queue database and makes sure the queue table exists.
+
+    The connection is in autocommit mode so every lease can be done in its own
+    BEGIN IMMEDIATE transaction, this is what makes it safe for many worker processes
+    (or containers sharing a volume) to use the same queue file.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+
+    Returns:
+        sqlite3.Connection: The connection to the queue database.
+    """
+    conn = sqlite3.connect(queue_filename, timeout=60, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL;')
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS queue ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "site_id, website text NOT NULL, test_types text NOT NULL, "
+        "status text NOT NULL DEFAULT 'queued', "
+        "lease_owner text, lease_expires float, attempts integer NOT NULL DEFAULT 0, "
+        "result text, updated float);")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS queue_status ON queue (status, id);")
+    return conn
+
+
+def enqueue_sites(queue_filename, sites, test_types):
+    """
+    Adds sites to the queue, to be tested by any worker using the queue.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+        sites (list): A list of sites, each a list of site id and website.
+        test_types (list): The test types to run on the sites.
+
+    Returns:
+        int: Number of sites added to the queue.
+    """
+    conn = connect_queue(queue_filename)
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE;')
+    conn.executemany(
+        "INSERT INTO queue (site_id, website, test_types, updated) VALUES (?, ?, ?, ?);",
+        [(site[0], site[1], json.dumps(test_types), now) for site in sites])
+    conn.execute('COMMIT;')
+    conn.close()
+    return len(sites)
+
+
+def requeue_expired_leases(conn):
+    """
+    Puts sites with an expired lease (their worker stopped sending heartbeats)
+    back in the queue, or marks them as failed if they have been leased too many times.
+    Must be called inside a transaction.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the queue database.
+    """
+    now = time.time()
+    conn.execute(
+        "UPDATE queue SET status='failed', lease_owner=NULL, updated=? "
+        "WHERE status='leased' AND lease_expires < ? AND attempts >= ?;",
+        (now, now, QUEUE_MAX_ATTEMPTS))
+    conn.execute(
+        "UPDATE queue SET status='queued', lease_owner=NULL, updated=? "
+        "WHERE status='leased' AND lease_expires < ?;",
+        (now, now))
+
+
+def lease_site(queue_filename, worker_id, lease_seconds):
+    """
+    Leases the next queued site for a worker.
+    The lease has to be renewed (see `renew_lease`) before it expires,
+    otherwise the site is put back in the queue for another worker.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+        worker_id (str): Unique name of the worker leasing the site.
+        lease_seconds (int): Number of seconds until the lease expires.
+
+    Returns:
+        tuple: (job_id, site, test_types) or None if there are no queued sites.
+    """
+    conn = connect_queue(queue_filename)
+    now = time.time()
+    try:
+        conn.execute('BEGIN IMMEDIATE;')
+        requeue_expired_leases(conn)
+        row = conn.execute(
+            "SELECT id, site_id, website, test_types FROM queue "
+            "WHERE status='queued' ORDER BY id LIMIT 1;").fetchone()
+        if row is None:
+            conn.execute('COMMIT;')
+            return None
+
+        conn.execute(
+            "UPDATE queue SET status='leased', lease_owner=?, lease_expires=?, "
+            "attempts=attempts+1, updated=? WHERE id=?;",
+            (worker_id, now + lease_seconds, now, row[0]))
+        conn.execute('COMMIT;')
+    finally:
+        conn.close()
+
+    return (row[0], [row[1], row[2]], json.loads(row[3]))
+
+
+def renew_lease(queue_filename, job_id, worker_id, lease_seconds):
+    """
+    Renews the lease of a site (heartbeat), telling other workers we are still working on it.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+        job_id (int): Id of the leased queue item.
+        worker_id (str): Unique name of the worker owning the lease.
+        lease_seconds (int): Number of seconds until the lease expires.
+
+    Returns:
+        bool: True if the lease was renewed, False if the worker no longer owns the lease.
+    """
+    conn = connect_queue(queue_filename)
+    now = time.time()
+    cursor = conn.execute(
+        "UPDATE queue SET lease_expires=?, updated=? "
+        "WHERE id=? AND lease_owner=? AND status='leased';",
+        (now + lease_seconds, now, job_id, worker_id))
+    renewed = cursor.rowcount > 0
+    conn.close()
+    return renewed
+
+
+def complete_site(queue_filename, job_id, worker_id, site_tests):
+    """
+    Writes the test results of a leased site back to the queue and marks it as done.
+    If the site has already been completed by another worker
+    (after our lease expired) the results are ignored.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+        job_id (int): Id of the leased queue item.
+        worker_id (str): Unique name of the worker owning the lease.
+        site_tests (list): The test results for the site.
+
+    Returns:
+        bool: True if the results were stored.
+    """
+    conn = connect_queue(queue_filename)
+    cursor = conn.execute(
+        "UPDATE queue SET status='done', lease_owner=?, lease_expires=NULL, "
+        "result=?, updated=? WHERE id=? AND status!='done';",
+        (worker_id, json.dumps(site_tests), time.time(), job_id))
+    completed = cursor.rowcount > 0
+    conn.close()
+    return completed
+
+
+def get_queue_status(queue_filename):
+    """
+    Returns the number of sites in the queue for every status.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+
+    Returns:
+        dict: Number of sites with status as key (queued, leased, done and failed).
+    """
+    status = {
+        'queued': 0,
+        'leased': 0,
+        'done': 0,
+        'failed': 0
+    }
+    conn = connect_queue(queue_filename)
+    for row in conn.execute("SELECT status, COUNT(*) FROM queue GROUP BY status;"):
+        status[row[0]] = row[1]
+    conn.close()
+    return status
+
+
+def read_queue_results(queue_filename):
+    """
+    Reads test results written back by workers, in the order the sites were queued.
+
+    Args:
+        queue_filename (str): The name of the SQLite queue database file.
+
+    Returns:
+        tuple: (sites, site_tests) - the tested sites and all their test results.
+    """
+    sites = []
+    site_tests = []
+    conn = connect_queue(queue_filename)
+    for row in conn.execute(
+            "SELECT site_id, website, result FROM queue WHERE status='done' ORDER BY id;"):
+        sites.append([row[0], row[1]])
+        site_tests.extend(json.loads(row[2]))
+    conn.close()
+    return (sites, site_tests)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import hashlib
 
 
 def use_item(current_index, skip, take):
@@ -26,3 +27,50 @@ def use_item(current_index, skip, take):
         return False
 
     return True
+
+def parse_shard(shard_text):
+    """
+    Parses a shard argument in the format k/n, where n is the number of shards
+    and k (1 to n) is the shard to use.
+
+    Parameters:
+    shard_text (str): The shard argument, for example '2/4'.
+
+    Returns:
+    tuple: (k, n) as integers.
+
+    Raises:
+    ValueError: If shard_text is not in the format k/n or k is not between 1 and n.
+    """
+    pair = shard_text.split('/')
+    if len(pair) != 2:
+        raise ValueError(f'Invalid shard: {shard_text}, expected format k/n')
+
+    shard_index = int(pair[0])
+    nof_shards = int(pair[1])
+    if nof_shards < 1 or shard_index < 1 or shard_index > nof_shards:
+        raise ValueError(f'Invalid shard: {shard_text}, k must be between 1 and n')
+
+    return (shard_index, nof_shards)
+
+def use_site(url, shard):
+    """
+    Determines whether a site belongs to the given shard.
+
+    The shard is picked from a hash of the url (and not from its position in the input),
+    this so every site stays in the same shard even when sites are added or removed.
+    Python's built-in hash() is not used as it differs between processes.
+
+    Parameters:
+    url (str): The website url.
+    shard (tuple): (k, n) as returned by parse_shard, or None to use all sites.
+
+    Returns:
+    bool: True if the site should be used, False otherwise.
+    """
+    if shard is None:
+        return True
+
+    shard_index, nof_shards = shard
+    digest = hashlib.sha256(url.strip().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % nof_shards == shard_index - 1
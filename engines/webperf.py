@@ -1,13 +1,10 @@
 # -*- coding: utf-8 -*-
-from datetime import timedelta
 import json
 import re
-import time
-from engines.utils import use_item
-from helpers.setting_helper import get_config
-from tests.utils import get_http_content, has_cache_file
+from engines.utils import use_item, use_site
+from tests.utils import get_http_content
 
-def read_sites(input_url, input_skip, input_take):
+def read_sites(input_url, input_skip, input_take, input_shard=None):
     """
     This function reads site data from a specific category
     on https://webperf.se and returns the sites.
@@ -23,6 +20,9 @@ def read_sites(input_url, input_skip, input_take):
     - 'webbyraer'.
     input_skip (int): The number of lines to skip in the input file.
     input_take (int): The number of lines to take from the input file after skipping.
+    input_shard (tuple, optional): (k, n), only take sites belonging to shard k of n.
+        Sites are sharded on their webperf.se detail url,
+        this so we don't need to fetch details for sites in other shards.
     
     Returns:
     list: The list of sites read from the specified category on https://webperf.se.
@@ -65,7 +65,8 @@ def read_sites(input_url, input_skip, input_take):
 
     if not found and ('all' in input_url or 'alla' in input_url):
         for category_name, category_url in categories.items():
-            sites.extend(get_category_sites(f'https://webperf.se{category_url}', input_skip, input_take))
+            sites.extend(get_category_sites(
+                f'https://webperf.se{category_url}', input_skip, input_take, input_shard))
         return sites
 
     if not found:
@@ -84,10 +85,10 @@ def read_sites(input_url, input_skip, input_take):
             print(f'-i {category_name}.webprf')
         return sites
 
-    sites.extend(get_category_sites(input_url, input_skip, input_take))
+    sites.extend(get_category_sites(input_url, input_skip, input_take, input_shard))
     return sites
 
-def get_category_sites(input_url, input_skip, input_take):
+def get_category_sites(input_url, input_skip, input_take, input_shard=None):
     print(f'Retrieving sites from {input_url}')
     sites = []
     category_content = get_http_content(input_url)
@@ -101,21 +102,15 @@ def get_category_sites(input_url, input_skip, input_take):
         detail_url = match.group('detail_url')
         if detail_url.startswith('/'):
             detail_url = f'https://webperf.se{detail_url}'
-        if use_item(current_index, input_skip, input_take):
+        if use_item(current_index, input_skip, input_take) and use_site(detail_url, input_shard):
             detailed_urls.append(detail_url)
         current_index += 1
 
     detail_regex = r"Webbplats:<\/th>[ \r\n\t]+<td><a href=\"(?P<item_url>[^\"]+)\""
     current_index = 0
-    use_text_instead_of_content = True
     for detail_url in detailed_urls:
-        is_cached = has_cache_file(detail_url,
-                                   use_text_instead_of_content,
-                                   timedelta(minutes=get_config('general.cache.max-age')))
-        
+        # get_http_content waits for its turn against webperf.se (see politeness_helper)
         detail_content = get_http_content(detail_url)
-        if not is_cached:
-            time.sleep(10)
         detail_match = re.search(detail_regex, detail_content, re.MULTILINE)
         item_url = detail_match.group('item_url')
         print(f'- {item_url}')
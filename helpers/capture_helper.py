@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import threading
+from helpers.setting_helper import get_config
+
+# Browser captures (HAR with response bodies) of the site being tested, keyed by url,
+# shared by the HAR based tests (software, tracking, energy efficiency and HTTP)
+# so they cost one browser run instead of one each.
+# Removed when the site is done (see clear_shared_captures),
+# except captures made in advance for sites not tested yet (see set_shared_captures).
+SHARED_CAPTURES = {
+    'entries': {},
+    'lock': threading.Lock()
+}
+
+def clear_shared_captures():
+    """
+    Removes all shared captures, called when all tests for a site are done.
+    Captures made in advance (see set_shared_captures) are kept until they are used.
+    """
+    with SHARED_CAPTURES['lock']:
+        SHARED_CAPTURES['entries'] = {
+            url: entry for url, entry in SHARED_CAPTURES['entries'].items()
+            if entry['in-advance']}
+
+def set_shared_captures(captures):
+    """
+    Replaces all shared captures with captures made in advance,
+    for example when urls of the same host are captured in one browser run.
+
+    Args:
+        captures (dict): The capture for every url.
+    """
+    with SHARED_CAPTURES['lock']:
+        SHARED_CAPTURES['entries'] = {
+            url: {
+                'capture': capture,
+                'in-advance': True,
+                'lock': threading.Lock()
+            } for url, capture in captures.items()}
+
+def get_shared_capture(url, create_capture):
+    """
+    Returns the shared capture for url,
+    calling create_capture (and sharing its result) if there is none.
+    Tests asking for the same url at the same time wait for the first capture.
+
+    Args:
+        url (str): The captured URL.
+        create_capture (function): Called without arguments to create the capture.
+
+    Returns:
+        The capture, create_capture is always called if tests.sitespeed.shared-capture
+        is not set.
+    """
+    if not get_config('tests.sitespeed.shared-capture'):
+        return create_capture()
+
+    with SHARED_CAPTURES['lock']:
+        entry = SHARED_CAPTURES['entries'].setdefault(url, {
+            'capture': None,
+            'in-advance': False,
+            'lock': threading.Lock()
+        })
+        # Used by the site being tested, removed when it is done
+        entry['in-advance'] = False
+
+    with entry['lock']:
+        if entry['capture'] is None:
+            entry['capture'] = create_capture()
+        return entry['capture']
@@ -6,6 +6,7 @@ import urllib
 import urllib.parse
 from helpers.data_helper import append_domain_entry, extend_domain_entry_with_key
 from helpers.hash_helper import create_sha256_hash
+from helpers.memo_helper import get_resource_memo_value
 from helpers.setting_helper import get_config
 from helpers.models import Rating
 from tests.utils import get_http_content
@@ -1517,8 +1518,7 @@ def append_csp_data_for_fonts(req_url, req_domain, res, org_domain, result):
             elif get_config('tests.http.csp-generate-font-hashes') or\
                   get_config('tests.http.csp-generate-strict-recommended-hashes') or\
                   get_config('tests.http.csp-generate-hashes'):
-                font_content = get_http_content(req_url, True, False)
-                font_hash = create_sha256_hash(font_content)
+                font_hash = get_resource_sha256_hash(req_url)
                 key2 = f"'{f'sha256-{font_hash}'}'|{element_name}"
                 if key not in result[org_domain]['csp-findings']['font-sources']:
                     result[org_domain]['csp-findings']['quotes'].append(key2)
@@ -1541,6 +1541,18 @@ def append_csp_data_for_fonts(req_url, req_domain, res, org_domain, result):
 
     return csp_findings_match
 
+def get_resource_sha256_hash(req_url):
+    """
+    Returns base64 encoded SHA-256 hash of the content for req_url.
+    Memoized by host and url as the same resources (for example fonts and scripts
+    from CDNs) are used by many sites.
+    """
+    return get_resource_memo_value(
+        'csp-hash',
+        urllib.parse.urlparse(req_url).hostname,
+        req_url,
+        lambda: create_sha256_hash(get_http_content(req_url, True, False)))
+
 def append_csp_data_for_images(req_url, req_domain, org_domain, result):
     """
     Appends Content Security Policy (CSP) data for image content.
@@ -1564,8 +1576,7 @@ def append_csp_data_for_images(req_url, req_domain, org_domain, result):
 
     if get_config('tests.http.csp-generate-img-hashes') or\
             get_config('tests.http.csp-generate-hashes'):
-        font_content = get_http_content(req_url, True, False)
-        font_hash = create_sha256_hash(font_content)
+        font_hash = get_resource_sha256_hash(req_url)
         key2 = f"'{f'sha256-{font_hash}'}'|{element_name}"
         if key2 not in result[org_domain]['csp-findings']['quotes']:
             result[org_domain]['csp-findings']['quotes'].append(key2)
@@ -1621,8 +1632,7 @@ def append_csp_data_for_js(req_url, req_domain, res, org_domain, result):
             get_config('tests.http.csp-generate-strict-recommended-hashes') or\
             get_config('tests.http.csp-generate-hashes'):
         key = f'{req_url}|{element_name}'
-        font_content = get_http_content(req_url, True, False)
-        font_hash = create_sha256_hash(font_content)
+        font_hash = get_resource_sha256_hash(req_url)
         key2 = f"'{f'sha256-{font_hash}'}'|{element_name}"
         if key not in result[org_domain]['csp-findings']['quotes']:
             result[org_domain]['csp-findings']['quotes'].append(key2)
@@ -1674,8 +1684,7 @@ def append_csp_data_for_css(req_url, req_domain, res, org_domain, result):
     if get_config('tests.http.csp-generate-css-hashes') or\
             get_config('tests.http.csp-generate-strict-recommended-hashes') or\
             get_config('tests.http.csp-generate-hashes'):
-        font_content = get_http_content(req_url, True, False)
-        font_hash = create_sha256_hash(font_content)
+        font_hash = get_resource_sha256_hash(req_url)
         key2 = f"'{f'sha256-{font_hash}'}'|{element_name}"
         if key2 not in result[org_domain]['csp-findings']['quotes']:
             result[org_domain]['csp-findings']['quotes'].append(key2)
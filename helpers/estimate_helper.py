@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from helpers.stats_helper import get_estimated_site_duration, get_estimated_test_cost,\
+    get_test_types_key
+from helpers.test_helper import get_site_test_plan, get_site_test_types
+
+# Costs counted for every test, see helpers/stats_helper.py (add_test_cost)
+ESTIMATE_COSTS = ('sitespeed', 'firefox', 'pa11y', 'dns', 'http', 'disk', 'seconds')
+
+def get_site_cost_estimate(test_types):
+    """
+    Returns the estimated costs of testing one site, based on the timing history.
+    Tests are grouped the same way as when testing (see get_site_test_plan),
+    so all tests using sitespeed.io plugins count as one sitespeed.io run.
+
+    Args:
+        test_types (list): The test types to run on the site.
+
+    Returns:
+        tuple: Estimated costs (dict with every name in ESTIMATE_COSTS) and
+               list of tests ('sitespeed' or test type) without history.
+    """
+    costs = dict.fromkeys(ESTIMATE_COSTS, 0)
+    missing_tests = []
+    if len(test_types) == 0:
+        return costs, missing_tests
+
+    (sitespeed_plugins, _, other_tests) = get_site_test_plan(test_types)
+    test_keys = [str(test_type) for test_type in other_tests]
+    if len(sitespeed_plugins) > 0:
+        test_keys.insert(0, 'sitespeed')
+
+    for test_key in test_keys:
+        test_cost = get_estimated_test_cost(test_key)
+        if test_cost is None:
+            missing_tests.append(test_key)
+            if test_key == 'sitespeed':
+                # We always know the merged sitespeed.io run is one launch
+                costs['sitespeed'] += 1
+            continue
+        for name in ESTIMATE_COSTS:
+            costs[name] += test_cost.get(name, 0)
+
+    site_duration = get_estimated_site_duration(test_types)
+    if site_duration is not None:
+        costs['seconds'] = site_duration
+    return costs, missing_tests
+
+def get_estimate(sites, test_types, workers=1, fresh_site_tests=None):
+    """
+    Returns the estimated costs of testing sites, without testing them.
+
+    Args:
+        sites (list): A list of tuples, each containing the site ID and the website URL.
+        test_types (list): The test types to run.
+        workers (int): Number of sites tested in parallel.
+        fresh_site_tests (dict): Fresh test types for every site (see get_fresh_site_tests).
+
+    Returns:
+        dict: Total of every cost in ESTIMATE_COSTS, 'wall-seconds' (seconds divided
+              on workers), 'sites' and 'missing' (tests without history).
+    """
+    estimate = dict.fromkeys(ESTIMATE_COSTS, 0)
+    missing_tests = set()
+    site_estimates = {}
+    for site in sites:
+        site_test_types = get_site_test_types(site, test_types, fresh_site_tests)
+        key = get_test_types_key(site_test_types)
+        if key not in site_estimates:
+            site_estimates[key] = get_site_cost_estimate(site_test_types)
+        (costs, site_missing_tests) = site_estimates[key]
+        missing_tests.update(site_missing_tests)
+        for name in ESTIMATE_COSTS:
+            estimate[name] += costs[name]
+
+    estimate['wall-seconds'] = estimate['seconds'] / max(workers, 1)
+    estimate['sites'] = len(sites)
+    estimate['missing'] = sorted(missing_tests)
+    return estimate
+
+def print_estimate(sites, test_types, workers=1, fresh_site_tests=None):
+    """
+    Prints the estimated browser launches, DNS queries, HTTP fetches,
+    wall time and peak disk usage of testing sites (used by --estimate).
+    Temporary sitespeed.io results are kept until the run is done,
+    so peak disk usage is the disk usage of all sites.
+    """
+    estimate = get_estimate(sites, test_types, workers, fresh_site_tests)
+    print(f"Estimate for {estimate['sites']} site(s), {workers} worker(s):")
+    print(f"- Browser launches: {round(estimate['sitespeed'])} sitespeed.io, "
+          f"{round(estimate['firefox'])} sitespeed.io using Firefox, "
+          f"{round(estimate['pa11y'])} Pa11y")
+    print(f"- DNS queries: {round(estimate['dns'])}")
+    print(f"- HTTP fetches: {round(estimate['http'])}")
+    print(f"- Wall time: {timedelta(seconds=round(estimate['wall-seconds']))}")
+    print(f"- Peak disk usage: {estimate['disk'] / 1024 / 1024:.1f} MB")
+    if len(estimate['missing']) > 0:
+        print(f"Warning: No history for test(s) {', '.join(estimate['missing'])}, "
+              "they are not included in the estimate (see general.stats.file)")
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+def get_journal_filename(output_filename):
+    """
+    Returns the filename of the journal belonging to an output file,
+    the journal is placed next to the output file.
+
+    Args:
+        output_filename (str): The name of the output file.
+
+    Returns:
+        str: The journal filename or None if there is no output file.
+    """
+    if output_filename is None or len(output_filename) == 0:
+        return None
+    return f'{output_filename}.journal.ndjson'
+
+def restart_journal(journal_filename):
+    """
+    Removes all content in the journal, this is so we always start fresh
+    when not resuming a previous run.
+    """
+    if journal_filename is None:
+        return
+    with open(journal_filename, 'w', encoding='utf-8') as outfile:
+        outfile.write('')
+
+def remove_journal(journal_filename):
+    """
+    Removes the journal, used when the output file has been written successfully.
+    """
+    if journal_filename is None:
+        return
+    if os.path.exists(journal_filename):
+        os.remove(journal_filename)
+
+def append_journal_entry(journal_filename, site, site_results):
+    """
+    Appends the results of one site to the journal as a single line of JSON.
+    The line is flushed to disk directly so it survives a crash of the process.
+
+    Args:
+        journal_filename (str): The journal filename.
+        site (list): The site ID and the website URL.
+        site_results (list): The test results for the site.
+    """
+    if journal_filename is None:
+        return
+
+    entry = {
+        'site_id': site[0],
+        'url': site[1],
+        'tests': site_results
+    }
+    with open(journal_filename, 'a', encoding='utf-8') as outfile:
+        outfile.write(json.dumps(entry))
+        outfile.write('\n')
+        outfile.flush()
+        os.fsync(outfile.fileno())
+
+def read_journal(journal_filename):
+    """
+    Reads all entries in the journal.
+    A line that is not valid JSON (for example when the process was killed
+    in the middle of writing it) is ignored, that site will simply be tested again.
+
+    Args:
+        journal_filename (str): The journal filename.
+
+    Returns:
+        dict: Test results for every journaled site, with the website URL as key.
+    """
+    entries = {}
+    if journal_filename is None or not os.path.exists(journal_filename):
+        return entries
+
+    with open(journal_filename, encoding='utf-8') as infile:
+        for line in infile:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry['url']] = entry['tests']
+    return entries
+
+def resume_journal(journal_filename):
+    """
+    Prepares the journal for a resumed run.
+    Only valid entries are kept, this so a partially written last line
+    (from a crashed run) doesn't corrupt the entries appended from now on.
+
+    Args:
+        journal_filename (str): The journal filename.
+
+    Returns:
+        dict: Test results for every journaled site, with the website URL as key.
+    """
+    if journal_filename is None or not os.path.exists(journal_filename):
+        return {}
+
+    entries = []
+    with open(journal_filename, encoding='utf-8') as infile:
+        for line in infile:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+    with open(journal_filename, 'w', encoding='utf-8') as outfile:
+        for entry in entries:
+            outfile.write(json.dumps(entry))
+            outfile.write('\n')
+
+    return read_journal(journal_filename)
+
+def get_journal_results(journal_filename, sites):
+    """
+    Rebuilds the test results from the journal,
+    in the same order as the sites.
+
+    Args:
+        journal_filename (str): The journal filename.
+        sites (list): A list of site IDs and website URLs.
+
+    Returns:
+        list: The test results of all sites found in the journal.
+    """
+    entries = read_journal(journal_filename)
+    results = []
+    for site in sites:
+        if site[1] in entries:
+            results.extend(entries[site[1]])
+    return results
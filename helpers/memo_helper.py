@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import threading
+from helpers.setting_helper import get_config
+from helpers.worker_helper import get_worker_index
+
+# Results of checks only depending on the hostname (for example e-mail, TLS and DNS),
+# kept for the length of a run so every url on the same host doesn't redo them.
+# Every worker process (see --workers) has its own, hits and misses are sent to
+# the main process with the site results (see pop_memo_counters and add_memo_counters).
+MEMO = {
+    'entries': {},
+    'hits': 0,
+    'misses': 0,
+    'lock': threading.Lock()
+}
+
+# Results for resources seen on many sites (for example analytics, CDN and font hosts),
+# keyed by kind, host and content hash. Least recently used entries are removed
+# when there are more than general.memo.max-resources.
+RESOURCE_MEMO = {
+    'entries': OrderedDict(),
+    'counters': {},
+    'lock': threading.Lock()
+}
+
+def clear_memo():
+    """
+    Removes all memoized results, for example when a new service job starts.
+    """
+    with MEMO['lock']:
+        MEMO['entries'] = {}
+        MEMO['hits'] = 0
+        MEMO['misses'] = 0
+    with RESOURCE_MEMO['lock']:
+        RESOURCE_MEMO['entries'] = OrderedDict()
+        RESOURCE_MEMO['counters'] = {}
+
+def get_memo_value(kind, hostname, create_value):
+    """
+    Returns memoized value for kind and hostname,
+    calling create_value (and memoizing its result) if there is none.
+    The value is shared between callers, use copy.deepcopy before changing it.
+
+    Args:
+        kind (str): What is memoized, for example 'email' or 'dns-A'.
+        hostname (str): The hostname the value depends on.
+        create_value (function): Called without arguments to create the value.
+
+    Returns:
+        tuple: The value and memo info (dict with 'hostname', 'hit' and 'created'),
+               memo info is None if general.memo.use is not set.
+    """
+    if not get_config('general.memo.use') or hostname is None:
+        return create_value(), None
+
+    key = (kind, hostname.lower())
+    with MEMO['lock']:
+        entry = MEMO['entries'].get(key)
+        if entry is not None:
+            MEMO['hits'] += 1
+
+    if entry is None:
+        entry = {
+            'value': create_value(),
+            'created': datetime.now().isoformat()
+        }
+        with MEMO['lock']:
+            MEMO['misses'] += 1
+            MEMO['entries'][key] = entry
+        hit = False
+    else:
+        hit = True
+
+    return entry['value'], {
+        'hostname': hostname,
+        'hit': hit,
+        'created': entry['created']
+    }
+
+def get_content_hash(content):
+    """
+    Returns SHA-256 hex digest of content (str or bytes).
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8', errors='surrogatepass')
+    return hashlib.sha256(content).hexdigest()
+
+def get_resource_memo_value(kind, host, content, create_value):
+    """
+    Returns memoized value for kind, host and content,
+    calling create_value (and memoizing its result) if there is none.
+    The value is shared between callers (and sites), don't change it.
+
+    Args:
+        kind (str): What is memoized, for example 'analytics' or 'software'.
+        host (str): Host the resource is from.
+        content (str or bytes): What the value depends on, for example the response content.
+        create_value (function): Called without arguments to create the value.
+
+    Returns:
+        The value.
+    """
+    if not get_config('general.memo.use'):
+        return create_value()
+
+    key = (kind, host, get_content_hash(content))
+    with RESOURCE_MEMO['lock']:
+        counters = RESOURCE_MEMO['counters'].setdefault(kind, {'hits': 0, 'misses': 0})
+        if key in RESOURCE_MEMO['entries']:
+            RESOURCE_MEMO['entries'].move_to_end(key)
+            counters['hits'] += 1
+            return RESOURCE_MEMO['entries'][key]
+
+    value = create_value()
+
+    max_entries = get_config('general.memo.max-resources')
+    with RESOURCE_MEMO['lock']:
+        counters['misses'] += 1
+        RESOURCE_MEMO['entries'][key] = value
+        while len(RESOURCE_MEMO['entries']) > max(max_entries, 0):
+            RESOURCE_MEMO['entries'].popitem(last=False)
+    return value
+
+def pop_memo_counters():
+    """
+    Returns (and resets) hits and misses counted in this worker process since last call,
+    so they can be added to the counters of the main process (see add_memo_counters).
+
+    Returns:
+        dict: 'hits', 'misses' and 'kinds' (hits and misses for every resource kind),
+              None in the main process or if nothing was memoized since last call.
+    """
+    if get_worker_index() is None:
+        return None
+    with MEMO['lock']:
+        counters = {
+            'hits': MEMO['hits'],
+            'misses': MEMO['misses']
+        }
+        MEMO['hits'] = 0
+        MEMO['misses'] = 0
+    with RESOURCE_MEMO['lock']:
+        counters['kinds'] = RESOURCE_MEMO['counters']
+        RESOURCE_MEMO['counters'] = {}
+    if counters['hits'] + counters['misses'] == 0 and len(counters['kinds']) == 0:
+        return None
+    return counters
+
+def add_memo_counters(counters):
+    """
+    Adds hits and misses counted in a worker process (see pop_memo_counters).
+    """
+    with MEMO['lock']:
+        MEMO['hits'] += counters['hits']
+        MEMO['misses'] += counters['misses']
+    with RESOURCE_MEMO['lock']:
+        for kind, kind_counters in counters['kinds'].items():
+            total = RESOURCE_MEMO['counters'].setdefault(kind, {'hits': 0, 'misses': 0})
+            total['hits'] += kind_counters['hits']
+            total['misses'] += kind_counters['misses']
+
+def get_memo_stats():
+    """
+    Returns number of memoized values, hits and misses so far in this run,
+    resource hits and misses are given for every kind.
+    """
+    with MEMO['lock']:
+        stats = {
+            'entries': len(MEMO['entries']),
+            'hits': MEMO['hits'],
+            'misses': MEMO['misses']
+        }
+    with RESOURCE_MEMO['lock']:
+        stats['resources'] = {
+            'entries': len(RESOURCE_MEMO['entries']),
+            'kinds': {kind: dict(counters)
+                      for kind, counters in RESOURCE_MEMO['counters'].items()}
+        }
+    return stats
+
+def print_memo_stats():
+    """
+    Prints memo hits and misses, if anything was memoized in this run.
+    """
+    stats = get_memo_stats()
+    if stats['hits'] + stats['misses'] > 0:
+        print(f"Memo, hostnames: {stats['hits']} hits, {stats['misses']} misses")
+    for kind, counters in sorted(stats['resources']['kinds'].items()):
+        print(f"Memo, {kind}: {counters['hits']} hits, {counters['misses']} misses")
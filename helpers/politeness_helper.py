@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+from helpers.setting_helper import get_config
+from helpers.worker_helper import get_worker_count
+
+# Second level labels used under country code top level domains,
+# for example example.co.uk where the registrable domain is 3 labels long.
+SECOND_LEVEL_LABELS = ('ac', 'co', 'com', 'edu', 'gov', 'net', 'org')
+
+# Token buckets for every host (registrable domain) and DNS resolver,
+# shared by all threads in the current process.
+POLITENESS = {
+    'buckets': {},
+    'lock': threading.Lock()
+}
+
+def get_registrable_domain(hostname):
+    """
+    Returns the registrable domain for a hostname, for example webperf.se for www.webperf.se.
+
+    No public suffix list is used, the domain is the last two labels of the hostname
+    (or three for common second level domains like co.uk).
+
+    Args:
+        hostname (str): The hostname.
+
+    Returns:
+        str: The registrable domain.
+    """
+    if hostname is None:
+        return ''
+    labels = hostname.lower().strip('.').split('.')
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def take_token(key, requests_per_minute, burst):
+    """
+    Takes one token from the token bucket for key, if it has one.
+
+    Every bucket is refilled with requests_per_minute tokens per minute
+    (divided between worker processes) and can hold at most burst tokens.
+
+    Args:
+        key (str): The bucket to take a token from.
+        requests_per_minute (int): Number of requests allowed per minute, 0 or less disables.
+        burst (int): Number of requests that can be made at once after being idle.
+
+    Returns:
+        float: 0.0 if a token was taken, otherwise number of seconds until there is one.
+    """
+    if requests_per_minute is None or requests_per_minute <= 0:
+        return 0.0
+
+    rate = requests_per_minute / 60.0 / get_worker_count()
+    burst = max(1, burst)
+    with POLITENESS['lock']:
+        now = time.monotonic()
+        bucket = POLITENESS['buckets'].get(key)
+        if bucket is None:
+            bucket = {'tokens': float(burst), 'updated': now}
+            POLITENESS['buckets'][key] = bucket
+
+        bucket['tokens'] = min(
+            float(burst),
+            bucket['tokens'] + (now - bucket['updated']) * rate)
+        bucket['updated'] = now
+        if bucket['tokens'] >= 1.0:
+            bucket['tokens'] -= 1.0
+            return 0.0
+        return (1.0 - bucket['tokens']) / rate
+
+def wait_for_token(key, requests_per_minute, burst):
+    """
+    Waits until the token bucket for key allows one more request (see take_token).
+
+    Returns:
+        float: Number of seconds waited.
+    """
+    waited = 0.0
+    while True:
+        wait_time = take_token(key, requests_per_minute, burst)
+        if wait_time <= 0.0:
+            return waited
+        time.sleep(wait_time)
+        waited += wait_time
+
+async def wait_for_token_async(key, requests_per_minute, burst):
+    """
+    Same as wait_for_token but lets other tasks on the event loop run while waiting.
+
+    Returns:
+        float: Number of seconds waited.
+    """
+    waited = 0.0
+    while True:
+        wait_time = take_token(key, requests_per_minute, burst)
+        if wait_time <= 0.0:
+            return waited
+        await asyncio.sleep(wait_time)
+        waited += wait_time
+
+def wait_for_host(url_or_hostname):
+    """
+    Waits until we are allowed to make a request (or launch a browser) against a host.
+    All hosts sharing the same registrable domain share the same limit,
+    see general.politeness.host-rpm and general.politeness.host-burst.
+
+    Args:
+        url_or_hostname (str): Url or hostname we are about to make a request to.
+
+    Returns:
+        float: Number of seconds waited.
+    """
+    hostname = url_or_hostname
+    if '://' in url_or_hostname:
+        hostname = urlparse(url_or_hostname).hostname
+
+    return wait_for_token(
+        f'host://{get_registrable_domain(hostname)}',
+        get_config('general.politeness.host-rpm'),
+        get_config('general.politeness.host-burst'))
+
+def wait_for_resolver(resolver_address):
+    """
+    Waits until we are allowed to send a DNS query to resolver,
+    see general.politeness.dns-rpm and general.politeness.dns-burst.
+
+    Args:
+        resolver_address (str): Address of the DNS resolver.
+
+    Returns:
+        float: Number of seconds waited.
+    """
+    return wait_for_token(
+        f'dns://{resolver_address}',
+        get_config('general.politeness.dns-rpm'),
+        get_config('general.politeness.dns-burst'))
+
+async def wait_for_resolver_async(resolver_address):
+    """
+    Same as wait_for_resolver but lets other tasks on the event loop run while waiting.
+    """
+    return await wait_for_token_async(
+        f'dns://{resolver_address}',
+        get_config('general.politeness.dns-rpm'),
+        get_config('general.politeness.dns-burst'))
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import signal
+import subprocess
+import threading
+
+# External tools (sitespeed.io, Pa11y, webbkoll-backend) started by this process,
+# each in its own process group so browsers (and drivers) they start can be stopped
+# together with them, even after the tool itself has exited (see stop_process).
+# Every worker process (see --workers) has its own.
+PROCESS_GROUPS = {
+    'processes': {},
+    'reaped': 0,
+    'exit-registered': False,
+    'lock': threading.Lock()
+}
+
+def start_process(command, **kwargs):
+    """
+    Starts command (list) in its own process group, arguments are given to subprocess.Popen.
+    The process group is stopped by stop_process, or when this process exits.
+
+    Returns:
+        subprocess.Popen: The started process.
+    """
+    if os.name == 'nt':
+        kwargs['creationflags'] = kwargs.get('creationflags', 0) |\
+            subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+
+    process = subprocess.Popen(command, **kwargs) # pylint: disable=consider-using-with
+    with PROCESS_GROUPS['lock']:
+        PROCESS_GROUPS['processes'][process.pid] = process
+        if not PROCESS_GROUPS['exit-registered']:
+            atexit.register(stop_processes)
+            PROCESS_GROUPS['exit-registered'] = True
+    return process
+
+def get_process_group_members(group_id):
+    """
+    Returns ids of the running processes in a process group,
+    empty if it can't be told (no /proc).
+    """
+    members = []
+    if not os.path.isdir('/proc'):
+        return members
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r', encoding='utf-8') as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # Fields after the command name (which may contain spaces):
+        # state, parent id and process group id
+        fields = stat[stat.rfind(')') + 2:].split()
+        if len(fields) > 2 and fields[0] != 'Z' and fields[2] == str(group_id):
+            members.append(int(name))
+    return members
+
+def signal_process_group(process, sig):
+    """
+    Sends sig to every process in the process group of process (see start_process).
+    """
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           capture_output=True, check=False)
+        else:
+            os.killpg(process.pid, sig)
+    except OSError:
+        # No process left in the group
+        pass
+
+def stop_process(process, timeout=10):
+    """
+    Stops a process started by start_process together with everything left
+    in its process group, asking nicely first and killing after timeout seconds.
+    Every process in the group other than the process itself (for example browsers
+    left by a timed out or crashed sitespeed.io) is counted as a reaped orphan.
+
+    Returns:
+        int: Number of orphans reaped.
+    """
+    with PROCESS_GROUPS['lock']:
+        PROCESS_GROUPS['processes'].pop(process.pid, None)
+
+    orphans = [pid for pid in get_process_group_members(process.pid) if pid != process.pid]
+    # Without /proc we can't tell if anything is left, so always signal the group
+    if process.poll() is None or len(orphans) > 0 or not os.path.isdir('/proc'):
+        signal_process_group(process, signal.SIGTERM)
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            pass
+        if process.poll() is None or len(get_process_group_members(process.pid)) > 0:
+            signal_process_group(process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            process.wait()
+
+    if len(orphans) > 0:
+        with PROCESS_GROUPS['lock']:
+            PROCESS_GROUPS['reaped'] += len(orphans)
+        print(f'Reaped {len(orphans)} orphaned process(es) left by {" ".join(process.args[:2])}')
+    return len(orphans)
+
+def run_process(command, timeout, **kwargs):
+    """
+    Runs command (list) in its own process group and returns its output,
+    everything left in the process group is stopped when it is done.
+
+    Args:
+        command (list): The command to run.
+        timeout (int): Maximum number of seconds to wait for the command.
+
+    Returns:
+        bytes: Output of the command.
+
+    Raises:
+        subprocess.TimeoutExpired: If the command timed out, its process group is then stopped.
+    """
+    process = start_process(command, stdout=subprocess.PIPE, **kwargs)
+    # Read in a thread, browsers left in the process group keep the output open
+    # after the command has exited (until they are stopped)
+    output = []
+    reader = threading.Thread(
+        target=lambda: output.append(process.stdout.read()), daemon=True)
+    reader.start()
+    try:
+        process.wait(timeout=timeout)
+    finally:
+        stop_process(process)
+        reader.join()
+        process.stdout.close()
+    return output[0] if len(output) > 0 else b''
+
+def stop_processes():
+    """
+    Stops all process groups started by this process (see start_process),
+    called when webperf_core (or a worker process) exits.
+    """
+    with PROCESS_GROUPS['lock']:
+        processes = list(PROCESS_GROUPS['processes'].values())
+    for process in processes:
+        stop_process(process, timeout=5)
+
+    with PROCESS_GROUPS['lock']:
+        reaped = PROCESS_GROUPS['reaped']
+        PROCESS_GROUPS['reaped'] = 0
+    if reaped > 0:
+        print(f'Reaped {reaped} orphaned process(es) in total')
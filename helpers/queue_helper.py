@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import os
+import socket
+import threading
+import time
+from engines.sqlite import complete_site, get_queue_status, lease_site, renew_lease
+from helpers.test_helper import test_site
+
+# How long a lease is valid, workers renew it (heartbeat) every third of this time
+QUEUE_LEASE_SECONDS = 300
+# How long an idle worker waits before asking the queue again
+# while other workers still have leased sites (that may expire and be re-queued)
+QUEUE_POLL_SECONDS = 30
+
+def get_worker_id():
+    """
+    Returns a name for the current worker that is unique
+    even when many containers share the same queue file.
+    """
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+def keep_lease_alive(queue_filename, job_id, worker_id, stop_event):
+    """
+    Renews the lease of a site until stop_event is set.
+    Runs in a background thread while the site is being tested.
+    """
+    while not stop_event.wait(QUEUE_LEASE_SECONDS / 3):
+        if not renew_lease(queue_filename, job_id, worker_id, QUEUE_LEASE_SECONDS):
+            print(f'Warning: Lost lease for queue item {job_id}, '
+                  'it may be tested by another worker')
+            return
+
+def run_queue_worker(global_translation, queue_filename):
+    """
+    Tests sites from a SQLite queue until there are no more sites to test.
+
+    Sites are leased one at a time and the lease is kept alive with a heartbeat
+    while the site is tested. When done, the results are written back to the queue.
+    If this worker dies, the lease expires and the site is given to another worker.
+
+    Parameters:
+    global_translation : GNUTranslations
+        An object that handles the translation of text in the context of internationalization.
+    queue_filename : str
+        The name of the SQLite queue database file.
+
+    Returns:
+    int
+        Number of sites tested by this worker.
+    """
+    worker_id = get_worker_id()
+    nof_tested_sites = 0
+    print(f'Worker {worker_id} using queue {queue_filename}')
+
+    while True:
+        job = lease_site(queue_filename, worker_id, QUEUE_LEASE_SECONDS)
+        if job is None:
+            status = get_queue_status(queue_filename)
+            if status['leased'] == 0:
+                break
+            # Other workers are still testing sites, if they die their sites are re-queued
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+
+        job_id, site, test_types = job
+        print(global_translation('TEXT_TEST_START_HEADER'))
+        print(global_translation('TEXT_TESTING_SITE').format(site[1]))
+
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(
+            target=keep_lease_alive,
+            args=(queue_filename, job_id, worker_id, stop_event),
+            daemon=True)
+        heartbeat.start()
+        try:
+            site_tests = test_site(global_translation, site, test_types)
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        complete_site(queue_filename, job_id, worker_id, site_tests)
+        nof_tested_sites += 1
+
+    status = get_queue_status(queue_filename)
+    print(f'Worker {worker_id} done, tested {nof_tested_sites} site(s). '
+          f"Queue: {status['done']} done, {status['failed']} failed.")
+    return nof_tested_sites
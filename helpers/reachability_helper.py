@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+import socket
+import time
+from urllib.parse import urlparse
+import dns.rdatatype
+import requests
+from helpers.setting_helper import get_config
+from tests.utils import dns_lookup, get_url_headers
+
+# Response headers set by domain parking services
+PARKED_HEADERS = ('x-adblock-key',)
+# Parts of server header values used by domain parking services
+PARKED_HEADER_VALUES = ('sedoparking', 'parkingcrew', 'bodis', 'above.com',
+                        'parklogic', 'domainparking', 'hugedomains', 'afternic', 'dan.com')
+# Domains of domain parking services parked domains redirect to (location header)
+PARKED_LOCATION_DOMAINS = ('sedoparking.com', 'parkingcrew.net', 'bodis.com', 'above.com',
+                           'parklogic.com', 'hugedomains.com', 'afternic.com', 'dan.com')
+
+def get_unreachable_verdict(reason, error, start_time):
+    """
+    Returns verdict for an unreachable site.
+
+    Args:
+        reason (str): Short reason, for example 'dns', 'connection' or 'parked'.
+        error (str): The original error.
+        start_time (float): time.monotonic() when the check started.
+
+    Returns:
+        dict: The verdict.
+    """
+    return {
+        'reachable': False,
+        'reason': reason,
+        'error': error,
+        'seconds': round(time.monotonic() - start_time, 2)
+    }
+
+def has_address(hostname):
+    """
+    Returns True if hostname resolves to at least one IPv4 or IPv6 address.
+    The DNS server in general.dns.address is asked first, the system resolver is only
+    asked if it doesn't answer (so a DNS timeout is not mistaken for a missing domain).
+    """
+    if len(dns_lookup(hostname, dns.rdatatype.A)) > 0:
+        return True
+    if len(dns_lookup(hostname, dns.rdatatype.AAAA)) > 0:
+        return True
+    try:
+        return len(socket.getaddrinfo(hostname, None)) > 0
+    except socket.gaierror:
+        return False
+
+def get_connection_error(hostname, port):
+    """
+    Tries to open a TCP connection to hostname and port.
+
+    Returns:
+        str: The error or None if a connection could be opened.
+    """
+    try:
+        with socket.create_connection((hostname, port), timeout=get_config('general.request.timeout')):
+            return None
+    except OSError as ex:
+        return f'{hostname}:{port}, {ex}'
+
+def is_parked_location(location):
+    """
+    Returns True if location (a redirect url) goes to a domain parking service,
+    that is if its hostname is (or is a subdomain of) one of PARKED_LOCATION_DOMAINS.
+    """
+    hostname = urlparse(location.strip()).hostname
+    if hostname is None:
+        return False
+    hostname = hostname.rstrip('.')
+    for domain in PARKED_LOCATION_DOMAINS:
+        if hostname == domain or hostname.endswith(f'.{domain}'):
+            return True
+    return False
+
+def get_parked_signature(headers):
+    """
+    Returns the response header showing that the site is a parked domain, or None.
+    """
+    for name, value in headers.items():
+        lower_name = name.lower()
+        if lower_name in PARKED_HEADERS:
+            return name
+        if not isinstance(value, str):
+            continue
+        if lower_name == 'location' and is_parked_location(value):
+            return f'{name}: {value}'
+        if lower_name == 'server':
+            lower_value = value.lower()
+            for signature in PARKED_HEADER_VALUES:
+                if signature in lower_value:
+                    return f'{name}: {value}'
+    return None
+
+def get_site_reachability(url):
+    """
+    Checks (without starting a browser) if a site can be tested at all.
+
+    A site is unreachable when:
+    - its hostname doesn't resolve (NXDOMAIN or no address),
+    - connecting to it is refused or times out,
+    - it is a parked domain (based on response headers from parking services).
+
+    Args:
+        url (str): The url of the site.
+
+    Returns:
+        dict: Verdict with 'reachable' (bool) and, if unreachable,
+              'reason', 'error' and 'seconds' (time the check took).
+    """
+    start_time = time.monotonic()
+    parsed_url = urlparse(url)
+    hostname = parsed_url.hostname
+    if hostname is None:
+        return get_unreachable_verdict('url', f'No hostname in url: {url}', start_time)
+
+    if not has_address(hostname):
+        return get_unreachable_verdict(
+            'dns', f'{hostname} has no IPv4 or IPv6 address (NXDOMAIN?)', start_time)
+
+    try:
+        headers = get_url_headers(
+            url, timedelta(minutes=get_config('general.cache.max-age')))
+    except requests.exceptions.RequestException as ex:
+        headers = {}
+        print(f'get_site_reachability, {ex}')
+
+    if len(headers) == 0:
+        port = parsed_url.port
+        if port is None:
+            port = 443 if parsed_url.scheme == 'https' else 80
+        connection_error = get_connection_error(hostname, port)
+        if connection_error is not None:
+            return get_unreachable_verdict('connection', connection_error, start_time)
+        # We can connect but the request failed (for example a certificate error),
+        # let the tests decide what that means.
+        return {'reachable': True}
+
+    parked_signature = get_parked_signature(headers)
+    if parked_signature is not None:
+        return get_unreachable_verdict(
+            'parked', f'Parked domain, found header: {parked_signature}', start_time)
+
+    return {'reachable': True}
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import atexit
+import importlib
+import sys
+import threading
+import time
+from helpers.setting_helper import get_config
+
+# Keeps track of when the process started (when this module was first imported)
+# and how long every lazily imported module took to import.
+REGISTRY = {
+    'started': time.perf_counter(),
+    'ready': None,
+    'imports': {},
+    'lock': threading.Lock()
+}
+
+# Input engines by file ending, first matching ending is used (json if none match).
+# Every entry has the functions the engine supports,
+# get_sites is a generator reading sites while testing (see general.input.read-ahead).
+INPUT_ENGINES = (
+    (('.sqlite',), 'engines.sqlite', ('read_sites', 'add_site', 'delete_site')),
+    (('.csv',), 'engines.csv_engine', ('read_sites', 'add_site', 'delete_site')),
+    (('.xml', '.xml.gz'), 'engines.sitemap', ('read_sites', 'get_sites')),
+    (('.result',), 'engines.sitespeed_result', ('read_sites',)),
+    (('.webprf',), 'engines.webperf', ('read_sites', 'add_site', 'delete_site')),
+    ((), 'engines.json_engine', ('read_sites', 'add_site', 'delete_site'))
+)
+
+# Output engines by file ending, first matching ending is used (json if none match).
+OUTPUT_ENGINES = (
+    (('.csv',), 'engines.csv_engine', ('write_tests', 'merge_tests')),
+    (('.gov',), 'engines.gov', ('write_tests',)),
+    (('.sql',), 'engines.sql', ('write_tests',)),
+    (('.sqlite',), 'engines.sqlite',
+        ('write_tests', 'merge_tests', 'get_fresh_site_tests', 'get_latest_test_dates')),
+    (('.md',), 'engines.markdown_engine', ('write_tests',)),
+    ((), 'engines.json_engine', ('write_tests', 'merge_tests', 'get_latest_test_dates'))
+)
+
+def import_function(module_name, function_name):
+    """
+    Imports module (if not already imported) and returns function from it.
+    Time spent importing is kept for the startup report.
+
+    Args:
+        module_name (str): Dotted name of module, for example 'tests.software'.
+        function_name (str): Name of function in module.
+
+    Returns:
+        function: The function.
+    """
+    module = sys.modules.get(module_name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        with REGISTRY['lock']:
+            REGISTRY['imports'][module_name] = time.perf_counter() - start
+    return getattr(module, function_name)
+
+def get_lazy_function(module_name, function_name):
+    """
+    Returns a function that imports module the first time it is called
+    and then calls function_name in it with the same arguments.
+
+    This so commands not using a test or engine (for example --help or -t 21)
+    don't have to pay for importing it and all of its dependencies.
+
+    Args:
+        module_name (str): Dotted name of module, for example 'tests.software'.
+        function_name (str): Name of function in module.
+
+    Returns:
+        function: The lazy function.
+    """
+    def lazy_function(*args, **kwargs):
+        return import_function(module_name, function_name)(*args, **kwargs)
+    lazy_function.__name__ = function_name
+    lazy_function.__qualname__ = f'{module_name}.{function_name}'
+    return lazy_function
+
+def get_engine_module_name(engines, filename):
+    """
+    Returns module name and supported functions for the engine
+    handling filename, based on its file ending.
+
+    Args:
+        engines (tuple): INPUT_ENGINES or OUTPUT_ENGINES.
+        filename (str): The input or output filename.
+
+    Returns:
+        tuple: Module name and the function names it supports.
+    """
+    lower_filename = filename.lower()
+    for file_endings, module_name, function_names in engines:
+        for file_ending in file_endings:
+            if lower_filename.endswith(file_ending):
+                return module_name, function_names
+    return engines[-1][1], engines[-1][2]
+
+def get_engine_function(engines, filename, function_name):
+    """
+    Returns a lazy function for the engine handling filename.
+
+    Args:
+        engines (tuple): INPUT_ENGINES or OUTPUT_ENGINES.
+        filename (str): The input or output filename.
+        function_name (str): For example 'read_sites' or 'write_tests'.
+
+    Returns:
+        function: The lazy function or None if engine doesn't support it.
+    """
+    module_name, function_names = get_engine_module_name(engines, filename)
+    if function_name not in function_names:
+        return None
+    return get_lazy_function(module_name, function_name)
+
+def set_startup_done():
+    """
+    Marks the point where startup is done (command line is handled and work begins).
+    """
+    REGISTRY['ready'] = time.perf_counter()
+
+def register_startup_report():
+    """
+    Makes sure the startup report is printed when the program exits
+    (if general.startup-report is set at that point).
+    """
+    atexit.register(print_startup_report)
+
+def print_startup_report():
+    """
+    Prints how long startup took and how long every lazily imported module took to import,
+    see general.startup-report.
+    """
+    if not get_config('general.startup-report'):
+        return
+
+    ready = REGISTRY['ready']
+    if ready is None:
+        ready = time.perf_counter()
+    print('Startup report:')
+    print(f"- Startup: {(ready - REGISTRY['started']) * 1000:.0f} ms")
+    print(f"- Total: {(time.perf_counter() - REGISTRY['started']) * 1000:.0f} ms")
+    print(f'- Loaded modules: {len(sys.modules)}')
+    with REGISTRY['lock']:
+        imports = sorted(REGISTRY['imports'].items(), key=lambda item: -item[1])
+    for module_name, import_time in imports:
+        print(f'- Lazy import {module_name}: {import_time * 1000:.0f} ms')
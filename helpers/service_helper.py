@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import queue
+import threading
+import time
+import traceback
+from helpers.memo_helper import clear_memo
+from helpers.setting_helper import get_config, get_setting_name, get_used_configuration,\
+    handle_cmd_bool_value, handle_cmd_int_value, restore_used_configuration,\
+    set_runtime_config_only
+from helpers.test_helper import test_site, validate_test_type
+
+# Jobs are run one at a time (in the order they were added) by a single executor thread,
+# this as tests and settings overrides are not safe to run side by side in one process.
+# Finished jobs are kept for general.service.keep-seconds, at most general.service.keep-jobs of them
+# (see remove_finished_jobs).
+SERVICE = {
+    'jobs': {},
+    'queue': queue.Queue(),
+    'running': None,
+    'next_id': 1,
+    'lock': threading.Lock(),
+    'translation': None
+}
+
+def get_queue_depth():
+    """
+    Returns number of jobs waiting to be run (not counting the running job).
+    """
+    with SERVICE['lock']:
+        return len([job for job in SERVICE['jobs'].values() if job['status'] == 'queued'])
+
+def remove_finished_jobs():
+    """
+    Removes finished jobs (and their results) done more than general.service.keep-seconds ago
+    and the oldest finished jobs when there are more than general.service.keep-jobs.
+    """
+    oldest_kept = time.monotonic() - get_config('general.service.keep-seconds')
+    with SERVICE['lock']:
+        finished_jobs = sorted(
+            (job for job in SERVICE['jobs'].values() if job['finished'] is not None),
+            key=lambda job: job['finished'])
+        nof_to_remove = len(finished_jobs) - max(get_config('general.service.keep-jobs'), 0)
+        for index, job in enumerate(finished_jobs):
+            if index < nof_to_remove or job['finished'] < oldest_kept:
+                del SERVICE['jobs'][job['id']]
+
+def get_settings_overrides(settings):
+    """
+    Validates settings overrides for a job.
+
+    Args:
+        settings (dict): Setting name (or alias) as key and the value to use.
+
+    Returns:
+        dict: Validated settings with full setting name as key.
+
+    Raises:
+        ValueError: If a setting is unknown or has an invalid value.
+    """
+    overrides = {}
+    if settings is None:
+        return overrides
+    if not isinstance(settings, dict):
+        raise ValueError('settings has to be an object')
+
+    for name, value in settings.items():
+        config_name = get_setting_name(name.lower())
+        if config_name is None:
+            raise ValueError(f'Unknown setting: {name}')
+        config_type, config_name = config_name.split('|')
+        if isinstance(value, str):
+            if config_type == 'bool':
+                value = handle_cmd_bool_value(config_name, value)
+            elif config_type == 'int':
+                value = handle_cmd_int_value(config_name, value)
+        if value is None:
+            raise ValueError(f'Invalid value for setting: {name}')
+        overrides[config_name] = value
+    return overrides
+
+def create_job(request_data):
+    """
+    Creates a job from a request and adds it to the queue.
+
+    Args:
+        request_data (dict): Job request, containing 'url' or 'urls',
+            optionally 'tests' (list of test ids) and
+            'settings' (object with settings overrides).
+
+    Returns:
+        dict: The created job.
+
+    Raises:
+        ValueError: If the request is not valid.
+    """
+    urls = request_data.get('urls', [])
+    if 'url' in request_data:
+        urls = [request_data['url']] + urls
+    if not isinstance(urls, list) or len(urls) == 0:
+        raise ValueError('url or urls is required')
+
+    tests = request_data.get('tests', [])
+    if not isinstance(tests, list):
+        tests = [tests]
+    test_types = validate_test_type([int(test_id) for test_id in tests])
+    if len(test_types) == 0:
+        raise ValueError('No valid test ids')
+
+    with SERVICE['lock']:
+        job_id = SERVICE['next_id']
+        SERVICE['next_id'] += 1
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'created': datetime.now().isoformat(),
+            'urls': urls,
+            'tests': test_types,
+            'settings': get_settings_overrides(request_data.get('settings')),
+            'results': [],
+            'error': None,
+            'finished': None,
+            'condition': threading.Condition()
+        }
+        SERVICE['jobs'][job_id] = job
+    SERVICE['queue'].put(job_id)
+    return job
+
+def get_job_info(job):
+    """
+    Returns the public information about a job (everything except internal state).
+    """
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'created': job['created'],
+        'urls': job['urls'],
+        'tests': job['tests'],
+        'settings': job['settings'],
+        'results': job['results'],
+        'error': job['error']
+    }
+
+def run_job(global_translation, job):
+    """
+    Tests every url in a job, results are added to the job as soon as a site is done.
+    Settings overrides only apply while running the job.
+    Memoized hostname results are only reused within the job.
+    """
+    used_configuration = get_used_configuration()
+    clear_memo()
+    try:
+        for name, value in job['settings'].items():
+            set_runtime_config_only(name, value)
+
+        for site_index, url in enumerate(job['urls']):
+            site_tests = test_site(global_translation, [site_index, url], job['tests'])
+            with job['condition']:
+                job['results'].append({
+                    'url': url,
+                    'tests': site_tests
+                })
+                job['condition'].notify_all()
+        job['status'] = 'done'
+    except Exception as ex: # pylint: disable=broad-exception-caught
+        job['status'] = 'failed'
+        job['error'] = ''.join(traceback.format_exception(ex, ex, ex.__traceback__))
+    finally:
+        restore_used_configuration(used_configuration)
+        with job['condition']:
+            job['finished'] = time.monotonic()
+            job['condition'].notify_all()
+
+def run_job_executor(global_translation):
+    """
+    Runs queued jobs one by one, forever.
+    """
+    while True:
+        job_id = SERVICE['queue'].get()
+        job = SERVICE['jobs'][job_id]
+        SERVICE['running'] = job_id
+        job['status'] = 'running'
+        run_job(global_translation, job)
+        SERVICE['running'] = None
+        remove_finished_jobs()
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP job API:
+    - POST /jobs                : add job ({"url": "...", "tests": [21], "settings": {...}})
+    - GET  /jobs/<id>           : job status and results so far
+    - GET  /jobs/<id>/results   : results streamed as NDJSON, one line per site when done
+    - GET  /status              : queue depth and running job
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status_code, data):
+        """
+        Sends data as a JSON response.
+        """
+        content = json.dumps(data).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_chunk(self, data):
+        """
+        Sends data as one line (and chunk) in a streamed NDJSON response.
+        """
+        content = (json.dumps(data) + '\n').encode('utf-8')
+        self.wfile.write(f'{len(content):X}\r\n'.encode('ascii') + content + b'\r\n')
+        self.wfile.flush()
+
+    def get_job(self, job_id_text):
+        """
+        Returns job for id in path or None (after sending 404) if it doesn't exist.
+        """
+        job = None
+        remove_finished_jobs()
+        if job_id_text.isdigit():
+            job = SERVICE['jobs'].get(int(job_id_text))
+        if job is None:
+            self.send_json(404, {'error': 'Job not found'})
+        return job
+
+    def do_POST(self): # pylint: disable=invalid-name
+        """
+        Handles POST requests.
+        """
+        if self.path.rstrip('/') != '/jobs':
+            self.send_json(404, {'error': 'Not found'})
+            return
+
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            request_data = json.loads(self.rfile.read(content_length))
+            if not isinstance(request_data, dict):
+                raise ValueError('Request has to be a JSON object')
+            job = create_job(request_data)
+        except (ValueError, TypeError) as ex:
+            self.send_json(400, {'error': str(ex)})
+            return
+
+        info = get_job_info(job)
+        info['queue'] = get_queue_depth()
+        self.send_json(202, info)
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """
+        Handles GET requests.
+        """
+        parts = [part for part in self.path.split('?')[0].split('/') if part != '']
+        if parts == ['status']:
+            remove_finished_jobs()
+            self.send_json(200, {
+                'queue': get_queue_depth(),
+                'running': SERVICE['running'],
+                'jobs': len(SERVICE['jobs'])
+            })
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self.get_job(parts[1])
+            if job is not None:
+                self.send_json(200, get_job_info(job))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'results':
+            job = self.get_job(parts[1])
+            if job is not None:
+                self.stream_results(job)
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def stream_results(self, job):
+        """
+        Streams results of job as NDJSON, one line for every site as soon as it is tested.
+        The response ends when the job is done.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        nof_sent = 0
+        while True:
+            with job['condition']:
+                while nof_sent == len(job['results']) and job['status'] in ('queued', 'running'):
+                    job['condition'].wait()
+                results = job['results'][nof_sent:]
+                is_finished = job['status'] not in ('queued', 'running')
+            for result in results:
+                self.send_chunk(result)
+            nof_sent += len(results)
+            if is_finished and nof_sent == len(job['results']):
+                break
+
+        self.send_chunk({'id': job['id'], 'status': job['status'], 'error': job['error']})
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        print(f'Service: {self.address_string()} - {format % args}')
+
+def run_service(global_translation, port):
+    """
+    Runs webperf_core as a long running service with a HTTP job API on localhost,
+    keeping test modules, software definitions, translations and settings loaded
+    between jobs. Runs until interrupted.
+
+    Args:
+        global_translation (function): The translation function.
+        port (int): Port to listen on (localhost only).
+    """
+    SERVICE['translation'] = global_translation
+    executor = threading.Thread(
+        target=run_job_executor,
+        args=(global_translation,),
+        daemon=True)
+    executor.start()
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), ServiceRequestHandler)
+    server.daemon_threads = True
+    print(f'Service listening on http://127.0.0.1:{port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -72,6 +72,12 @@ config_mapping = {
         "tests.sitespeed.docker.use",
         "sitespeed_use_docker",
         "SITESPEED_USE_DOCKER"): "bool|tests.sitespeed.docker.use",
+    (
+        "sitespeeddockerreuse",
+        "tests.sitespeed.docker.reuse"): "bool|tests.sitespeed.docker.reuse",
+    (
+        "sitespeeddockermaxruns",
+        "tests.sitespeed.docker.max-runs"): "int|tests.sitespeed.docker.max-runs",
     (
         "mobile",
         "tests.sitespeed.mobile"): "bool|tests.sitespeed.mobile",
@@ -88,6 +94,18 @@ config_mapping = {
     (
         "sitespeedxvfb",
         "tests.sitespeed.xvfb"): "bool|tests.sitespeed.xvfb",
+    (
+        "sitespeedsharedcapture",
+        "tests.sitespeed.shared-capture"): "bool|tests.sitespeed.shared-capture",
+    (
+        "sitespeedbatchsize",
+        "tests.sitespeed.batch-size"): "int|tests.sitespeed.batch-size",
+    (
+        "sitespeedworker",
+        "tests.sitespeed.worker.use"): "bool|tests.sitespeed.worker.use",
+    (
+        "sitespeedworkermaxjobs",
+        "tests.sitespeed.worker.max-jobs"): "int|tests.sitespeed.worker.max-jobs",
     (
         "sitespeedcustomcache",
         "general.cache.folder",
@@ -135,7 +153,67 @@ config_mapping = {
         "EMAIL_NETWORK_SUPPORT_IPV6_TRAFFIC"): "bool|tests.email.support.ipv6",
     (
         "404url",
-        "tests.page-not-found.override-url"): "bool|tests.page-not-found.override-url"
+        "tests.page-not-found.override-url"): "bool|tests.page-not-found.override-url",
+    (
+        "concurrency",
+        "general.concurrency.use"): "bool|general.concurrency.use",
+    (
+        "concurrency-network",
+        "general.concurrency.network"): "int|general.concurrency.network",
+    (
+        "async",
+        "general.concurrency.async"): "int|general.concurrency.async",
+    (
+        "host-rpm",
+        "general.politeness.host-rpm"): "int|general.politeness.host-rpm",
+    (
+        "host-burst",
+        "general.politeness.host-burst"): "int|general.politeness.host-burst",
+    (
+        "dns-rpm",
+        "general.politeness.dns-rpm"): "int|general.politeness.dns-rpm",
+    (
+        "dns-burst",
+        "general.politeness.dns-burst"): "int|general.politeness.dns-burst",
+    (
+        "startup-report",
+        "general.startup-report"): "bool|general.startup-report",
+    (
+        "skip-fresh",
+        "general.skip-fresh"): "int|general.skip-fresh",
+    (
+        "stats-file",
+        "general.stats.file"): "string|general.stats.file",
+    (
+        "preflight",
+        "general.preflight.use"): "bool|general.preflight.use",
+    (
+        "memo",
+        "general.memo.use"): "bool|general.memo.use",
+    (
+        "memo-max-resources",
+        "general.memo.max-resources"): "int|general.memo.max-resources",
+    (
+        "read-ahead",
+        "general.input.read-ahead"): "int|general.input.read-ahead",
+    (
+        "retry",
+        "general.retry.max"): "int|general.retry.max",
+    (
+        "retry-delay",
+        "general.retry.delay"): "int|general.retry.delay",
+    (
+        "worker-max-sites",
+        "general.worker.max-sites"): "int|general.worker.max-sites",
+    (
+        "worker-max-memory",
+        "general.worker.max-memory"): "int|general.worker.max-memory",
+    (
+        "service-keep-jobs",
+        "general.service.keep-jobs"): "int|general.service.keep-jobs",
+    (
+        "service-keep-seconds",
+        "general.service.keep-seconds"): "int|general.service.keep-seconds"
 }
 
 
@@ -464,3 +542,14 @@ def get_used_configuration():
         dict: A shallow copy of the configuration dictionary.
     """
     return config.copy()
+
+def restore_used_configuration(used_configuration):
+    """
+    Restores configuration to a copy returned by `get_used_configuration`,
+    removing any setting changed with `set_runtime_config_only` since the copy was made.
+
+    Args:
+        used_configuration (dict): The configuration to restore.
+    """
+    config.clear()
+    config.update(used_configuration)
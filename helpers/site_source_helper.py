@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+
+# Put in the queue by the reader thread when there are no more sites
+SITE_SOURCE_END = ('end', None)
+
+def read_sites_ahead(sites, queue_size):
+    """
+    Reads sites in a background thread into a queue holding at most queue_size sites,
+    yielding them as they are read. This so testing can start with the first site
+    while the rest are still being read (for example child sitemaps being downloaded),
+    without ever having more than queue_size unread sites in memory.
+
+    Args:
+        sites (iterable): Site source, for example engines.sitemap.get_sites(...).
+        queue_size (int): Maximum number of sites read ahead.
+
+    Yields:
+        tuple: Site id and website url.
+
+    Raises:
+        Exception: Any error raised while reading sites, when the site it failed on is reached.
+    """
+    site_queue = queue.Queue(maxsize=max(queue_size, 1))
+    stop_event = threading.Event()
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                site_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_sites():
+        try:
+            for site in sites:
+                if not put(('site', site)):
+                    return
+            put(SITE_SOURCE_END)
+        except Exception as ex: # pylint: disable=broad-exception-caught
+            put(('error', ex))
+
+    reader = threading.Thread(target=read_sites, daemon=True)
+    reader.start()
+    try:
+        while True:
+            item_type, item = site_queue.get()
+            if item_type == 'end':
+                return
+            if item_type == 'error':
+                raise item
+            yield item
+    finally:
+        # Stops the reader if we are not reading all sites (for example --deadline)
+        stop_event.set()
+
+def collect_sites(sites, collected_sites):
+    """
+    Yields every site in sites, adding them to collected_sites as they are used.
+    Used to know what sites were tested when writing results.
+
+    Args:
+        sites (iterable): The sites.
+        collected_sites (list): List every site is appended to.
+
+    Yields:
+        tuple: Site id and website url.
+    """
+    for site in sites:
+        collected_sites.append(site)
+        yield site
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import subprocess
+import threading
+import time
+from helpers.process_helper import run_process, start_process, stop_process
+from helpers.setting_helper import get_config
+
+# The sitespeed.io container used by this process when tests.sitespeed.docker.reuse is set,
+# started the first time it is used and replaced after tests.sitespeed.docker.max-runs runs.
+# Every worker process (see --workers) has its own.
+SITESPEED_CONTAINER = {
+    'name': None,
+    'process': None,
+    'runs': 0,
+    'exit-registered': False,
+    'lock': threading.Lock()
+}
+
+def start_sitespeed_container(data_dir, image):
+    """
+    Starts a sitespeed.io container that waits for runs (see run_in_sitespeed_container).
+
+    The container runs `cat` attached to our stdin, so it stops (and is removed)
+    as soon as we close it or this process exits, even if it is killed.
+
+    Returns:
+        bool: True if the container is running.
+    """
+    name = f'webperf-core-sitespeed-{os.getpid()}-{int(time.time())}'
+    process = start_process(
+        ['docker', 'run', '-i', '--rm', '--name', name,
+         '-v', f'{data_dir}:/sitespeed.io', '--entrypoint', 'cat', image],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL)
+    SITESPEED_CONTAINER['name'] = name
+    SITESPEED_CONTAINER['process'] = process
+    SITESPEED_CONTAINER['runs'] = 0
+    if not SITESPEED_CONTAINER['exit-registered']:
+        atexit.register(stop_sitespeed_container)
+        SITESPEED_CONTAINER['exit-registered'] = True
+
+    # Pulling the image may take a while the first time
+    end_time = time.monotonic() + get_config('general.request.timeout') * 10
+    while time.monotonic() < end_time and process.poll() is None:
+        state = subprocess.run(
+            ['docker', 'inspect', '-f', '{{.State.Running}}', name],
+            capture_output=True, check=False)
+        if state.stdout.strip() == b'true':
+            return True
+        time.sleep(0.5)
+
+    print(f'Warning: Unable to start sitespeed.io container {name}')
+    stop_sitespeed_container()
+    return False
+
+def stop_sitespeed_container():
+    """
+    Stops the sitespeed.io container (if started), it is removed when stopped.
+    """
+    process = SITESPEED_CONTAINER['process']
+    if process is None:
+        return
+    name = SITESPEED_CONTAINER['name']
+    SITESPEED_CONTAINER['process'] = None
+    SITESPEED_CONTAINER['name'] = None
+    try:
+        process.stdin.close()
+    except OSError:
+        pass
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        subprocess.run(['docker', 'rm', '-f', name], capture_output=True, check=False)
+    stop_process(process)
+
+def run_in_sitespeed_container(data_dir, image, args, timeout):
+    """
+    Runs sitespeed.io with args using `docker exec` in the sitespeed.io container
+    of this process, starting (or replacing) the container if needed.
+
+    Args:
+        data_dir (str): Folder mounted as /sitespeed.io (the webperf-core folder).
+        image (str): The sitespeed.io image, for example sitespeedio/sitespeed.io:41.4.1.
+        args (list): The sitespeed.io arguments.
+        timeout (int): Maximum number of seconds to wait for the run.
+
+    Returns:
+        str: Output of sitespeed.io, in the same format as get_result_using_no_cache.
+    """
+    with SITESPEED_CONTAINER['lock']:
+        process = SITESPEED_CONTAINER['process']
+        max_runs = get_config('tests.sitespeed.docker.max-runs')
+        if process is not None and (
+                process.poll() is not None or
+                (max_runs > 0 and SITESPEED_CONTAINER['runs'] >= max_runs)):
+            stop_sitespeed_container()
+        if SITESPEED_CONTAINER['process'] is None and\
+                not start_sitespeed_container(data_dir, image):
+            return ''
+
+        SITESPEED_CONTAINER['runs'] += 1
+        command = ['docker', 'exec', '-w', '/sitespeed.io',
+                   SITESPEED_CONTAINER['name'], '/start.sh'] + args
+        try:
+            output = run_process(command, timeout)
+        except subprocess.TimeoutExpired:
+            print('TIMEOUT!')
+            # sitespeed.io is still running inside the container
+            stop_sitespeed_container()
+            return ''
+        return str(output)
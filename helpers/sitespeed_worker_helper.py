@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import atexit
+import json
+import queue
+import subprocess
+import threading
+import time
+from helpers.process_helper import start_process, stop_process
+from helpers.setting_helper import get_config
+
+# Line written by sitespeed-worker.js when a job is done
+DONE_MARKER = b'WEBPERF-CORE-SITESPEED-WORKER-DONE'
+
+# The sitespeed.io worker (see sitespeed-worker.js) used by this process,
+# started the first time it is used and replaced after tests.sitespeed.worker.max-jobs
+# jobs or if it has died. Every worker process (see --workers) has its own.
+SITESPEED_WORKER = {
+    'process': None,
+    'lines': None,
+    'jobs': 0,
+    'exit-registered': False,
+    'lock': threading.Lock()
+}
+
+def read_output_lines(process, lines):
+    """
+    Puts every line the sitespeed.io worker writes in lines, followed by None when it exits.
+    """
+    for line in process.stdout:
+        lines.put(line)
+    lines.put(None)
+
+def start_sitespeed_worker():
+    """
+    Starts a new sitespeed.io worker.
+    """
+    process = start_process(
+        ['node', 'sitespeed-worker.js'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE)
+    lines = queue.Queue()
+    threading.Thread(target=read_output_lines, args=(process, lines), daemon=True).start()
+    SITESPEED_WORKER['process'] = process
+    SITESPEED_WORKER['lines'] = lines
+    SITESPEED_WORKER['jobs'] = 0
+    if not SITESPEED_WORKER['exit-registered']:
+        atexit.register(stop_sitespeed_worker)
+        SITESPEED_WORKER['exit-registered'] = True
+
+def stop_sitespeed_worker(kill=False):
+    """
+    Stops the sitespeed.io worker (if started), it exits when its stdin is closed.
+    Browsers it leaves are stopped together with it (see helpers/process_helper.py).
+
+    Args:
+        kill (bool): Kill it right away, for example when a job timed out.
+    """
+    process = SITESPEED_WORKER['process']
+    if process is None:
+        return
+    SITESPEED_WORKER['process'] = None
+    SITESPEED_WORKER['lines'] = None
+    try:
+        process.stdin.close()
+    except OSError:
+        pass
+    if not kill:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            pass
+    stop_process(process, timeout=0 if kill else 10)
+
+def run_sitespeed_job(args, timeout):
+    """
+    Runs sitespeed.io with args in the sitespeed.io worker of this process,
+    starting (or replacing) the worker if needed.
+
+    Args:
+        args (list): The sitespeed.io arguments.
+        timeout (int): Maximum number of seconds to wait for the job.
+
+    Returns:
+        str: Output of sitespeed.io, in the same format as get_result_using_no_cache.
+    """
+    with SITESPEED_WORKER['lock']:
+        process = SITESPEED_WORKER['process']
+        max_jobs = get_config('tests.sitespeed.worker.max-jobs')
+        if process is not None and (
+                process.poll() is not None or
+                (max_jobs > 0 and SITESPEED_WORKER['jobs'] >= max_jobs)):
+            stop_sitespeed_worker()
+        if SITESPEED_WORKER['process'] is None:
+            start_sitespeed_worker()
+
+        process = SITESPEED_WORKER['process']
+        lines = SITESPEED_WORKER['lines']
+        SITESPEED_WORKER['jobs'] += 1
+        try:
+            process.stdin.write(json.dumps({'args': args}).encode('utf-8') + b'\n')
+            process.stdin.flush()
+        except OSError as ex:
+            print(f'Warning: Unable to send job to sitespeed.io worker, {ex}')
+            stop_sitespeed_worker(kill=True)
+            return ''
+
+        output = []
+        end_time = time.monotonic() + timeout
+        while True:
+            try:
+                line = lines.get(timeout=max(end_time - time.monotonic(), 0.01))
+            except queue.Empty:
+                print('TIMEOUT!')
+                stop_sitespeed_worker(kill=True)
+                break
+            if line is None:
+                print('Warning: sitespeed.io worker exited unexpectedly, it will be restarted')
+                stop_sitespeed_worker()
+                break
+            if line.startswith(DONE_MARKER):
+                break
+            output.append(line)
+
+        return str(b''.join(output))
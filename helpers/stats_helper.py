@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+import atexit
+import contextvars
+import json
+import os
+from pathlib import Path
+import threading
+from helpers.setting_helper import get_config
+from helpers.worker_helper import get_worker_index
+
+# Number of samples kept for every combination of test types
+STATS_MAX_SAMPLES = 50
+
+# Number of tested sites after which the stats file is written during a run
+STATS_SAVE_INTERVAL = 25
+
+# Timing history, loaded from general.stats.file the first time it is used.
+# Changes are written every STATS_SAVE_INTERVAL sites and when the run is done (see save_changed_stats).
+# Worker processes don't write the stats file, they keep test costs in 'pending'
+# and the main process adds them (see pop_pending_test_costs and add_test_costs).
+STATS = {
+    'data': None,
+    'pending': [],
+    'changed': False,
+    'unsaved-sites': 0,
+    'lock': threading.Lock()
+}
+
+# Costs (browser launches, DNS queries, HTTP fetches and disk usage) of the test
+# currently run by a thread (or asyncio task), see start_test_cost and end_test_cost.
+CURRENT_TEST_COSTS = contextvars.ContextVar('current_test_costs', default=None)
+
+def get_stats_filename():
+    """
+    Returns the full path to the stats file (general.stats.file),
+    relative paths are relative to the webperf_core folder.
+
+    Returns:
+        str: The stats filename or None if general.stats.file is not set.
+    """
+    filename = get_config('general.stats.file')
+    if filename is None or len(filename) == 0:
+        return None
+    if os.path.isabs(filename):
+        return filename
+    base_directory = Path(os.path.dirname(os.path.realpath(__file__)) + os.path.sep).parent
+    return os.path.join(base_directory, filename)
+
+def get_test_types_key(test_types):
+    """
+    Returns key used for test types in the stats file, for example '15,21'.
+    """
+    return ','.join([str(test_type) for test_type in sorted(test_types)])
+
+def load_stats():
+    """
+    Returns the timing history, reading it from the stats file if not already read.
+    """
+    if STATS['data'] is not None:
+        return STATS['data']
+
+    data = {'sites': {}}
+    filename = get_stats_filename()
+    if filename is not None and os.path.exists(filename):
+        try:
+            with open(filename, encoding='utf-8') as stats_file:
+                data = json.load(stats_file)
+        except (OSError, json.JSONDecodeError) as ex:
+            print(f'Warning: Unable to read stats file {filename}, {ex}')
+    data.setdefault('sites', {})
+    data.setdefault('tests', {})
+    STATS['data'] = data
+    # Changes not written yet are written if the run is stopped
+    atexit.register(save_changed_stats)
+    return data
+
+def save_stats(data):
+    """
+    Writes the timing history to the stats file,
+    a temporary file is used so the stats file is never left half written.
+    """
+    STATS['changed'] = False
+    STATS['unsaved-sites'] = 0
+    filename = get_stats_filename()
+    if filename is None:
+        return
+    tmp_filename = f'{filename}.tmp'
+    try:
+        with open(tmp_filename, 'w', encoding='utf-8') as stats_file:
+            json.dump(data, stats_file)
+        os.replace(tmp_filename, filename)
+    except OSError as ex:
+        print(f'Warning: Unable to write stats file {filename}, {ex}')
+
+def add_site_duration(test_types, seconds):
+    """
+    Adds how long it took to test one site to the timing history.
+
+    Args:
+        test_types (list): The test types run on the site.
+        seconds (float): Number of seconds it took.
+    """
+    with STATS['lock']:
+        data = load_stats()
+        samples = data['sites'].setdefault(get_test_types_key(test_types), [])
+        samples.append(round(seconds, 1))
+        del samples[:-STATS_MAX_SAMPLES]
+        STATS['changed'] = True
+        STATS['unsaved-sites'] += 1
+        if STATS['unsaved-sites'] >= STATS_SAVE_INTERVAL:
+            save_stats(data)
+
+def save_changed_stats():
+    """
+    Writes the timing history to the stats file if it has changed since it was last written,
+    called when all sites are tested (and when webperf_core exits).
+    """
+    with STATS['lock']:
+        if STATS['changed']:
+            save_stats(STATS['data'])
+
+def get_estimated_site_duration(test_types):
+    """
+    Returns the estimated number of seconds it takes to test one site,
+    based on the average of the most recent sites tested with the same test types.
+
+    Args:
+        test_types (list): The test types to run on the site.
+
+    Returns:
+        float: Estimated number of seconds or None if there is no history.
+    """
+    with STATS['lock']:
+        samples = load_stats()['sites'].get(get_test_types_key(test_types), [])
+        if len(samples) == 0:
+            return None
+        return sum(samples) / len(samples)
+
+def start_test_cost():
+    """
+    Starts counting costs (see add_test_cost) for the test run by the current thread.
+    """
+    CURRENT_TEST_COSTS.set({})
+
+def add_test_cost(name, amount=1):
+    """
+    Adds to a cost of the test run by the current thread, ignored if no test is running.
+
+    Args:
+        name (str): 'sitespeed', 'firefox' or 'pa11y' (browser launches),
+                    'dns' (DNS queries), 'http' (HTTP fetches) or 'disk' (bytes written).
+        amount (int): Amount to add.
+    """
+    costs = CURRENT_TEST_COSTS.get()
+    if costs is not None:
+        costs[name] = costs.get(name, 0) + amount
+
+def end_test_cost(test_key, seconds):
+    """
+    Stops counting costs for the test run by the current thread and
+    adds them (and how long the test took) to the history for the test.
+
+    Args:
+        test_key (str): Test type (as str) or 'sitespeed' for the combined sitespeed.io run.
+        seconds (float): Number of seconds the test took.
+    """
+    costs = CURRENT_TEST_COSTS.get()
+    CURRENT_TEST_COSTS.set(None)
+    if costs is None:
+        return
+    costs['seconds'] = round(seconds, 1)
+    if get_worker_index() is not None:
+        with STATS['lock']:
+            STATS['pending'].append([test_key, costs])
+        return
+    add_test_costs([[test_key, costs]])
+
+def add_test_costs(test_costs):
+    """
+    Adds costs of tests to the history.
+
+    Args:
+        test_costs (list): Test key and costs for every test (see end_test_cost).
+    """
+    if len(test_costs) == 0:
+        return
+    with STATS['lock']:
+        data = load_stats()
+        for test_key, costs in test_costs:
+            samples = data['tests'].setdefault(test_key, [])
+            samples.append(costs)
+            del samples[:-STATS_MAX_SAMPLES]
+        STATS['changed'] = True
+
+def pop_pending_test_costs():
+    """
+    Returns (and forgets) costs of tests run in this worker process since last call,
+    so they can be added to the history by the main process.
+    """
+    with STATS['lock']:
+        test_costs = STATS['pending']
+        STATS['pending'] = []
+    return test_costs
+
+def get_folder_size(folder):
+    """
+    Returns number of bytes used by all files in folder (0 if it doesn't exist).
+    """
+    size = 0
+    for root, _, filenames in os.walk(folder):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                continue
+    return size
+
+def get_estimated_test_cost(test_key):
+    """
+    Returns the average costs of a test, based on the most recent runs of it.
+
+    Args:
+        test_key (str): Test type (as str) or 'sitespeed' for the combined sitespeed.io run.
+
+    Returns:
+        dict: Average of every cost (see add_test_cost) and 'seconds',
+              or None if there is no history.
+    """
+    with STATS['lock']:
+        samples = load_stats()['tests'].get(test_key, [])
+        if len(samples) == 0:
+            return None
+        names = set()
+        for sample in samples:
+            names.update(sample.keys())
+        return {name: sum(sample.get(name, 0) for sample in samples) / len(samples)
+                for name in names}
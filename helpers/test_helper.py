@@ -1,30 +1,46 @@
 # -*- coding: utf-8 -*-
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+import functools
 import os
+import time
 import traceback
+from urllib.parse import urlparse
 from helpers.models import Rating
 from helpers.setting_helper import get_config, get_used_configuration
 from helpers.models import SiteTests
-from tests.utils import get_translation, merge_dicts,\
-    sort_testresult_issues, calculate_rating
-from tests.sitespeed_base import create_webperf_json
-from tests.privacy_webbkollen import run_test as run_test_privacy_webbkollen
-from tests.privacy import run_test as run_test_privacy
-from tests.standard_files import run_test as run_test_standard_files
-from tests.performance_sitespeed_io import run_test as run_test_performance_sitespeed_io
-from tests.a11y_pa11y import run_test as run_test_a11y_pa11y
-from tests.http_validator import run_test as run_test_http_validator
-from tests.energy_efficiency import run_test as run_test_energy_efficiency
-from tests.tracking_validator import run_test as run_test_tracking_validator
-from tests.email_validator import run_test as run_test_email_validator
-from tests.software import run_test as run_test_software
-from engines.json_engine import write_tests as json_write_tests
-from engines.gov import write_tests as gov_write_tests
-from engines.sql import write_tests as sql_write_tests
-from engines.markdown_engine import write_tests as markdown_write_tests
-from engines.csv_engine import write_tests as csv_write_tests
-from engines.sqlite import write_tests as sqlite_write_tests
+from helpers.journal_helper import append_journal_entry
+from helpers.capture_helper import clear_shared_captures
+from helpers.memo_helper import add_memo_counters, pop_memo_counters, print_memo_stats
+from helpers.stats_helper import add_site_duration, add_test_costs,\
+    get_estimated_site_duration, pop_pending_test_costs, save_changed_stats,\
+    start_test_cost, end_test_cost
+from helpers.worker_helper import get_failures_log_filename, run_worker_pool,\
+    use_worker_processes
+from helpers.registry_helper import OUTPUT_ENGINES, get_engine_function, get_lazy_function
+
+# Tests and engines are imported the first time they are used,
+# this so running one test doesn't require importing all of them (and their dependencies).
+merge_dicts = get_lazy_function('tests.utils', 'merge_dicts')
+sort_testresult_issues = get_lazy_function('tests.utils', 'sort_testresult_issues')
+calculate_rating = get_lazy_function('tests.utils', 'calculate_rating')
+create_webperf_json = get_lazy_function('tests.sitespeed_base', 'create_webperf_json')
+capture_in_advance = get_lazy_function('tests.sitespeed_base', 'capture_in_advance')
+run_test_privacy_webbkollen = get_lazy_function('tests.privacy_webbkollen', 'run_test')
+run_test_privacy = get_lazy_function('tests.privacy', 'run_test')
+run_test_standard_files = get_lazy_function('tests.standard_files', 'run_test')
+run_test_performance_sitespeed_io = get_lazy_function('tests.performance_sitespeed_io', 'run_test')
+run_test_a11y_pa11y = get_lazy_function('tests.a11y_pa11y', 'run_test')
+run_test_http_validator = get_lazy_function('tests.http_validator', 'run_test')
+run_test_energy_efficiency = get_lazy_function('tests.energy_efficiency', 'run_test')
+run_test_tracking_validator = get_lazy_function('tests.tracking_validator', 'run_test')
+run_test_email_validator = get_lazy_function('tests.email_validator', 'run_test')
+run_test_email_validator_async = get_lazy_function('tests.email_validator', 'run_test_async')
+run_test_software = get_lazy_function('tests.software', 'run_test')
+get_site_reachability = get_lazy_function(
+    'helpers.reachability_helper', 'get_site_reachability')
 
 def run_dummy_test(global_translation, url):
     return []
@@ -98,10 +114,30 @@ TEST_USE_SITESPEED_TOMORROW = {
         TEST_SOFTWARE: run_test_software
     }
 
+# Tests using the shared browser capture of the site (see helpers/capture_helper.py),
+# HTTP only uses it for the tested url when tests.http.csp-only is set.
+TEST_USE_SHARED_CAPTURE = (TEST_SOFTWARE, TEST_TRACKING, TEST_ENERGY_EFFICIENCY)
+
+# Tests spending most of their time waiting on network (and not on a local browser),
+# these can run at the same time as browser based tests if general.concurrency.use is set.
+# Tests not listed here are considered 'browser' tests and run one at a time.
+TEST_CONCURRENCY = {
+        TEST_WEBBKOLL: 'network',
+        TEST_EMAIL: 'network',
+        TEST_PRIVACY: 'network'
+    }
+
+# Tests also implementing the optional async contract,
+# run_test_async(global_translation, url) returning the same as run_test.
+# Used when testing on an event loop (see general.concurrency.async),
+# other tests are then run in the executor of the event loop.
+TEST_ASYNC_FUNCS = {
+        TEST_EMAIL: run_test_email_validator_async
+    }
 
 CONFIG_WARNINGS = {}
 
-def test(global_translation, site, test_type=None):
+def test(global_translation, site, test_type=None, failed_tests=None):
     """
     This function runs a specific test on a website and returns the test results.
 
@@ -113,6 +149,8 @@ def test(global_translation, site, test_type=None):
     test_type : str, optional
         The type of test to be run. If the test type is not in the predefined test functions,
         the function will return an empty list.
+    failed_tests : dict, optional
+        If the test fails, the error is added with test type as key (so it can be retried).
 
     Returns:
     list
@@ -132,7 +170,12 @@ def test(global_translation, site, test_type=None):
             datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
 
         run_test = TEST_FUNCS[test_type]
-        the_test_result = run_test(global_translation, site[1])
+        start_time = time.monotonic()
+        start_test_cost()
+        try:
+            the_test_result = run_test(global_translation, site[1])
+        finally:
+            end_test_cost(str(test_type), time.monotonic() - start_time)
 
         print(global_translation('TEXT_TEST_END').format(
             datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
@@ -154,9 +197,63 @@ def test(global_translation, site, test_type=None):
         info = get_error_info(site[1], test_type, ex)
         print('\n'.join(info).replace('\n\n','\n'))
 
-        # write error to failure.log file
-        with open('failures.log', 'a', encoding='utf-8') as outfile:
-            outfile.writelines(info)
+        write_failure_info(info)
+        add_failed_tests(failed_tests, [test_type], get_error_summary(ex))
+
+    return []
+
+async def test_async(global_translation, site, test_type, failed_tests=None):
+    """
+    Same as test but for an event loop. Tests in TEST_ASYNC_FUNCS are awaited,
+    other tests are run using test in the default executor of the event loop.
+
+    Parameters:
+    global_translation : GNUTranslations
+        An object that handles the translation of text in the context of internationalization.
+    site : tuple
+        A tuple containing the site ID and the website URL.
+    test_type : int
+        The type of test to be run.
+    failed_tests : dict, optional
+        If the test fails, the error is added with test type as key (so it can be retried).
+
+    Returns:
+    list
+        A list containing the test results.
+    """
+    if test_type not in TEST_ASYNC_FUNCS:
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                test, global_translation, site, test_type=test_type, failed_tests=failed_tests))
+
+    try:
+        print(global_translation('TEXT_TEST_START').format(
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+        start_time = time.monotonic()
+        start_test_cost()
+        try:
+            the_test_result = await TEST_ASYNC_FUNCS[test_type](global_translation, site[1])
+        finally:
+            end_test_cost(str(test_type), time.monotonic() - start_time)
+
+        print(global_translation('TEXT_TEST_END').format(
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+        if the_test_result is not None:
+            return SiteTests(site_id=site[0], type_of_test=test_type,
+                             rating=the_test_result[0],
+                             test_date=datetime.now(),
+                             json_check_data=the_test_result[1]).todata()
+    except Exception as ex: # pylint: disable=broad-exception-caught
+        print(global_translation('TEXT_TEST_END').format(
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        info = get_error_info(site[1], test_type, ex)
+        print('\n'.join(info).replace('\n\n','\n'))
+
+        write_failure_info(info)
+        add_failed_tests(failed_tests, [test_type], get_error_summary(ex))
 
     return []
 
@@ -168,6 +265,50 @@ def restart_failures_log():
     with open('failures.log', 'w', encoding='utf-8') as outfile:
         outfile.writelines('')
 
+def write_failure_info(info):
+    """
+    Writes error information to failures log,
+    when running in a worker process the worker specific log is used.
+
+    Args:
+        info (list): A list of strings, as returned by `get_error_info`.
+    """
+    with open(get_failures_log_filename(), 'a', encoding='utf-8') as outfile:
+        outfile.writelines(info)
+
+def write_unreachable_site_info(site, test_types, verdict):
+    """
+    Writes why a site is unreachable to failures log, used instead of running its tests.
+
+    Args:
+        site (tuple): A tuple containing the site ID and the website URL.
+        test_types (list): The test types that are not run.
+        verdict (dict): Verdict from `get_site_reachability`.
+    """
+    info = get_error_info(
+        site[1],
+        test_types,
+        RuntimeError(
+            f"Site is unreachable ({verdict['reason']}, "
+            f"after {verdict['seconds']} seconds): {verdict['error']}"))
+    print('\n'.join(info).replace('\n\n','\n'))
+    write_failure_info(info)
+
+def get_error_summary(ex):
+    """
+    Returns a one line summary of an exception, for example for attempt history.
+    """
+    return f'{type(ex).__name__}: {ex}'
+
+def add_failed_tests(failed_tests, test_types, error):
+    """
+    Adds error for every test type to failed_tests (if set), so they can be retried.
+    """
+    if failed_tests is None:
+        return
+    for test_type in test_types:
+        failed_tests[test_type] = error
+
 def get_error_info(url, test_type, ex):
     """
     Generate error information for diagnostic purposes.
@@ -229,7 +370,8 @@ def get_versions():
             result.append("\n")
     return result
 
-def test_with_sitespeed(global_translation, site, sitespeed_plugins, sitespeed_test_types):
+def test_with_sitespeed(global_translation, site, sitespeed_plugins, sitespeed_test_types, # pylint: disable=too-many-arguments
+                        site_verdict=None, failed_tests=None):
     """
     Run sitespeed-based tests on a website.
 
@@ -242,6 +384,11 @@ def test_with_sitespeed(global_translation, site, sitespeed_plugins, sitespeed_t
         A string containing the sitespeed plugins to use.
     sitespeed_test_types : list
         A list of test type IDs that are being run via sitespeed.
+    site_verdict : dict, optional
+        Updated with the verdict (see helpers/reachability_helper.py)
+        if the page never loaded, so the remaining browser tests can be skipped.
+    failed_tests : dict, optional
+        If the tests fail, the error is added for every test type (so they can be retried).
 
     Returns:
     list
@@ -254,9 +401,26 @@ def test_with_sitespeed(global_translation, site, sitespeed_plugins, sitespeed_t
         print(global_translation('TEXT_TEST_START').format(
             datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
 
-        result_dict = create_webperf_json(site[1], sitespeed_plugins)
-        # TODO: Handle where result_dict is None
-        # TODO: Handle when unable to access website
+        start_time = time.monotonic()
+        start_test_cost()
+        try:
+            (result_dict, error) = create_webperf_json(site[1], sitespeed_plugins)
+        finally:
+            end_test_cost('sitespeed', time.monotonic() - start_time)
+        if result_dict is None:
+            print(global_translation('TEXT_TEST_END').format(
+                datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            verdict = {
+                'reachable': False,
+                'reason': 'sitespeed',
+                'error': error,
+                'seconds': round(time.monotonic() - start_time, 2)
+            }
+            if site_verdict is not None:
+                site_verdict.update(verdict)
+            write_unreachable_site_info(site, sitespeed_test_types, verdict)
+            add_failed_tests(failed_tests, sitespeed_test_types, error)
+            return []
 
         calculate_rating(global_translation, rating, result_dict)
 
@@ -286,39 +450,33 @@ def test_with_sitespeed(global_translation, site, sitespeed_plugins, sitespeed_t
         info = get_error_info(site[1], sitespeed_test_types, ex)
         print('\n'.join(info).replace('\n\n','\n'))
 
-        # write error to failure.log file
-        with open('failures.log', 'a', encoding='utf-8') as outfile:
-            outfile.writelines(info)
+        write_failure_info(info)
+        add_failed_tests(failed_tests, sitespeed_test_types, get_error_summary(ex))
 
     return []
 
 
-def test_site(global_translation, site, test_types):
+def get_site_test_plan(test_types):
     """
-    This function runs a series of tests on a website and returns a list of all the test results.
+    Returns how the test types are run on a site: tests using sitespeed.io plugins
+    (see TEST_USE_SITESPEED) are merged into one sitespeed.io run, the rest run one by one.
 
     Parameters:
-    global_translation : GNUTranslations
-        An object that handles the translation of text in the context of internationalization.
-    site : tuple
-        A tuple containing the site ID and the website URL.
     test_types : list
-        A list of test types to be run. If not provided, all tests will be run.
+        The test types to be run.
 
     Returns:
-    list
-        A list containing the results of all the tests run on the website.
+    tuple
+        The sitespeed.io plugin arguments (empty string if sitespeed.io is not used),
+        test types run by sitespeed.io and the other test types.
     """
-    tests = []
-
-    site_id = site[0]
     sitespeed_plugins = ''
     sitespeed_test_types = []
     other_tests = []
     for test_id in TEST_ALL_FUNCS:
         if test_id not in test_types:
             continue
-        
+
         if test_id in TEST_USE_SITESPEED.keys():
             sitespeed_plugins += f'--plugins.add {TEST_USE_SITESPEED[test_id]} '
             sitespeed_test_types.append(test_id)
@@ -327,16 +485,94 @@ def test_site(global_translation, site, test_types):
 
     if len(sitespeed_plugins) > 0:
         sitespeed_plugins += '--plugins.add plugin-webperf-core '
-        tests.extend(test_with_sitespeed(global_translation,
+    return (sitespeed_plugins, sitespeed_test_types, other_tests)
+
+def test_site(global_translation, site, test_types, failed_tests=None):
+    """
+    This function runs a series of tests on a website and returns a list of all the test results.
+
+    Parameters:
+    global_translation : GNUTranslations
+        An object that handles the translation of text in the context of internationalization.
+    site : tuple
+        A tuple containing the site ID and the website URL.
+    test_types : list
+        A list of test types to be run. If not provided, all tests will be run.
+    failed_tests : dict, optional
+        Filled with the error for every test type that failed (so it can be retried).
+
+    Returns:
+    list
+        A list containing the results of all the tests run on the website.
+    """
+    tests = []
+
+    if get_config('general.preflight.use'):
+        verdict = get_site_reachability(site[1])
+        if not verdict['reachable']:
+            write_unreachable_site_info(site, test_types, verdict)
+            return tests
+
+    site_id = site[0]
+    (sitespeed_plugins, sitespeed_test_types, other_tests) = get_site_test_plan(test_types)
+
+    site_jobs = []
+    # Set by the sitespeed pass if the page never loaded,
+    # the remaining browser tests for the site are then skipped
+    site_verdict = {}
+    if len(sitespeed_plugins) > 0:
+        site_jobs.append(('browser', functools.partial(
+            test_with_sitespeed,
+            global_translation,
             site,
             sitespeed_plugins,
-            sitespeed_test_types))
+            sitespeed_test_types,
+            site_verdict=site_verdict,
+            failed_tests=failed_tests)))
 
     for test_id in other_tests:
-        tests.extend(test(global_translation,
+        concurrency_class = TEST_CONCURRENCY.get(test_id, 'browser')
+        job = functools.partial(
+            test,
+            global_translation,
             site,
-            test_type=test_id))
+            test_type=test_id,
+            failed_tests=failed_tests)
+        if concurrency_class == 'browser':
+            job = functools.partial(
+                test_if_reachable, site_verdict, site, test_id, job, failed_tests=failed_tests)
+        site_jobs.append((concurrency_class, job))
 
+    try:
+        for test_result in run_site_jobs(site_jobs):
+            tests.extend(test_result)
+    finally:
+        # Captures are only shared by the tests of this site
+        clear_shared_captures()
+
+    return get_combined_site_test(global_translation, site_id, test_types, tests)
+
+def get_combined_site_test(global_translation, site_id, test_types, tests, attempts=None):
+    """
+    Combines the results of the tests run on a website into one result
+    (with type_of_test -1 if more than one test type was run).
+
+    Parameters:
+    global_translation : GNUTranslations
+        An object that handles the translation of text in the context of internationalization.
+    site_id : int
+        The site ID.
+    test_types : list
+        The test types run on the website.
+    tests : list
+        The results of the tests.
+    attempts : list, optional
+        Attempt history (see retry_failed_site_tests), added to the data if set.
+
+    Returns:
+    list
+        The combined result, or tests if there was nothing to combine.
+    """
     rating = Rating(global_translation)
     site_test = None
     big_data = {}
@@ -352,6 +588,8 @@ def test_site(global_translation, site, test_types):
 
     sort_testresult_issues(big_data)
     rating = calculate_rating(global_translation, rating, big_data)
+    if attempts is not None:
+        big_data['attempts'] = attempts
 
     if rating.isused():
         reviews = rating.get_reviews()
@@ -382,11 +620,175 @@ def test_site(global_translation, site, test_types):
 
         tests = []
         tests.append(site_test[0])
+    elif attempts is not None and len(tests) > 0 and isinstance(tests[-1].get('data'), dict):
+        tests[-1]['data']['attempts'] = attempts
 
     return tests
 
+def test_if_reachable(site_verdict, site, test_type, job, failed_tests=None):
+    """
+    Runs a browser test unless an earlier test found that the site is unreachable,
+    in that case the skipped test is written to failures log together with the verdict.
+
+    Parameters:
+    site_verdict (dict): Verdict for the site, empty if nothing is known yet.
+    site (tuple): A tuple containing the site ID and the website URL.
+    test_type (int): The test type of the job.
+    job (function): Function without arguments running the test.
+    failed_tests (dict, optional): If skipped, the verdict is added with test type as key.
 
-def test_sites(global_translation, sites, test_types):
+    Returns:
+    list: The test result, empty if skipped.
+    """
+    if site_verdict.get('reachable', True):
+        return job()
+    write_unreachable_site_info(site, [test_type], site_verdict)
+    add_failed_tests(
+        failed_tests, [test_type], f"Skipped, site unreachable: {site_verdict['error']}")
+    return []
+
+def run_site_jobs(site_jobs):
+    """
+    Runs the tests for a website and returns their results in the same order as site_jobs.
+
+    If general.concurrency.use is set, 'network' tests are started in background threads
+    (at most general.concurrency.network at a time) while 'browser' tests are run
+    one by one in the current thread.
+    As results are always returned in the original order,
+    merging them gives the same result as running them one by one.
+
+    Parameters:
+    site_jobs : list
+        A list of tuples containing concurrency class ('browser' or 'network')
+        and a function without arguments running the test.
+
+    Returns:
+    list
+        A list with the result of every job.
+    """
+    if not get_config('general.concurrency.use'):
+        return [job() for _, job in site_jobs]
+
+    results = [None] * len(site_jobs)
+    with ThreadPoolExecutor(
+            max_workers=max(1, get_config('general.concurrency.network'))) as executor:
+        futures = {}
+        for job_index, (concurrency_class, job) in enumerate(site_jobs):
+            if concurrency_class == 'network':
+                futures[job_index] = executor.submit(job)
+
+        for job_index, (concurrency_class, job) in enumerate(site_jobs):
+            if concurrency_class != 'network':
+                results[job_index] = job()
+
+        for job_index, future in futures.items():
+            results[job_index] = future.result()
+
+    return results
+
+def use_event_loop(test_types, workers):
+    """
+    Returns True if sites should be tested on an event loop (see run_async_site_test_jobs),
+    that is when general.concurrency.async is set, sites are not tested in
+    worker processes and only network bound tests (see TEST_CONCURRENCY) are run.
+    """
+    return get_config('general.concurrency.async') > 0 and workers <= 1 and\
+        len(test_types) > 0 and\
+        all(TEST_CONCURRENCY.get(test_type) == 'network' for test_type in test_types)
+
+async def test_site_async(global_translation, site, test_types, semaphore, failed_tests=None):
+    """
+    Same as test_site but for an event loop (only for network bound tests),
+    tests run at the same time and every test waits for semaphore before it starts.
+
+    Returns:
+    list
+        A list containing the results of all the tests run on the website.
+    """
+    if get_config('general.preflight.use'):
+        verdict = await asyncio.get_running_loop().run_in_executor(
+            None, get_site_reachability, site[1])
+        if not verdict['reachable']:
+            write_unreachable_site_info(site, test_types, verdict)
+            return []
+
+    async def run_test_with_semaphore(test_id):
+        async with semaphore:
+            return await test_async(global_translation, site, test_id, failed_tests)
+
+    (_, _, other_tests) = get_site_test_plan(test_types)
+    tests = []
+    for test_result in await asyncio.gather(
+            *[run_test_with_semaphore(test_id) for test_id in other_tests]):
+        tests.extend(test_result)
+
+    return get_combined_site_test(global_translation, site[0], test_types, tests)
+
+async def test_site_job_async(global_translation, job, test_types, nof_sites, # pylint: disable=too-many-arguments
+                              fresh_site_tests, semaphore):
+    """
+    Same as test_site_job but for an event loop, see test_site_async.
+    """
+    site_test_types = get_site_job_test_types(
+        global_translation, job, test_types, nof_sites, fresh_site_tests)
+    if len(site_test_types) == 0:
+        return []
+    failed_tests = {}
+    site_results = await test_site_async(
+        global_translation, job[1], site_test_types, semaphore, failed_tests)
+    return get_site_job_results(site_results, failed_tests, site_test_types)
+
+async def run_async_site_tests(global_translation, jobs, test_types, nof_sites, # pylint: disable=too-many-arguments
+                               fresh_site_tests, on_job_done):
+    """
+    Tests the site of every job on the current event loop, see run_async_site_test_jobs.
+
+    Returns:
+    list
+        Job and its results for every job, in the same order as jobs.
+    """
+    limit = max(1, get_config('general.concurrency.async'))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=limit))
+    semaphore = asyncio.Semaphore(limit)
+    finished = {}
+
+    async def run_job(job_index, job):
+        job_results = await test_site_job_async(
+            global_translation, job, test_types, nof_sites, fresh_site_tests, semaphore)
+        on_job_done(job, job_results)
+        finished[job_index] = (job, job_results)
+
+    running = set()
+    for job_index, job in enumerate(jobs):
+        # Only start as many sites as tests can run, so sites are read while testing
+        if len(running) >= limit:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        running.add(asyncio.create_task(run_job(job_index, job)))
+    if len(running) > 0:
+        done, _ = await asyncio.wait(running)
+        for task in done:
+            task.result()
+
+    return [finished[job_index] for job_index in sorted(finished.keys())]
+
+def run_async_site_test_jobs(global_translation, jobs, test_types, nof_sites, # pylint: disable=too-many-arguments
+                             fresh_site_tests, on_job_done):
+    """
+    Tests sites on an event loop in the current process, at most general.concurrency.async
+    tests at a time for all sites together. Tests in TEST_ASYNC_FUNCS are awaited,
+    other tests are run in a thread pool of the same size.
+    on_job_done is called as soon as a site is tested.
+
+    Yields:
+    tuple: Job and its results, in the same order as jobs.
+    """
+    yield from asyncio.run(run_async_site_tests(
+        global_translation, jobs, test_types, nof_sites, fresh_site_tests, on_job_done))
+
+def test_sites(global_translation, sites, test_types, workers=1, journal_filename=None, # pylint: disable=too-many-arguments
+               fresh_site_tests=None, deadline=None):
     """
     This function runs a series of tests on multiple websites and
     returns a list of all the test results.
@@ -394,40 +796,563 @@ def test_sites(global_translation, sites, test_types):
     Parameters:
     global_translation : GNUTranslations
         An object that handles the translation of text in the context of internationalization.
-    sites : list
+    sites : list or iterable
         A list of tuples, each containing the site ID and the website URL.
+        Can also be an iterable reading sites while testing (see helpers/site_source_helper.py).
     test_types : list
         A list of test types to be run. If not provided, all tests will be run.
+    workers : int, optional
+        Number of worker processes to test sites in, 1 (default) tests one site at a time.
+    journal_filename : str, optional
+        If set, the results of every site are appended to this journal as soon as
+        the site is tested (see helpers/journal_helper.py).
+    fresh_site_tests : dict, optional
+        Test types to skip for every site as their results are still fresh,
+        see get_fresh_site_tests.
+    deadline : datetime, optional
+        If set, no new site is started unless it is estimated to be done before the deadline,
+        sites already started are always finished.
 
     Returns:
     list
-        A list containing the results of all the tests run on the websites.
+        A list containing the results of all the tests run on the websites,
+        in the same order as the sites.
     """
-    results = []
-
     print(global_translation('TEXT_TEST_START_HEADER'))
 
-    nof_sites = len(sites)
-    has_more_then_one_site = nof_sites > 1
+    # Number of sites is not known when sites are read while testing
+    nof_sites = len(sites) if isinstance(sites, (list, tuple)) else None
+    has_more_then_one_site = nof_sites is None or nof_sites > 1
 
-    if has_more_then_one_site:
+    if nof_sites is not None and has_more_then_one_site:
         print(global_translation('TEXT_TESTING_NUMBER_OF_SITES').format(nof_sites))
 
-    site_index = 0
-    for site in sites:
-        if site_index > 0:
-            print(global_translation('TEXT_TEST_START_HEADER'))
-        website = site[1]
-        print(global_translation('TEXT_TESTING_SITE').format(website))
-        if has_more_then_one_site:
-            print(global_translation('TEXT_WEBSITE_X_OF_Y').format(site_index + 1, nof_sites))
-        results.extend(test_site(global_translation, site,
-                                 test_types))
+    started_sites = {}
+    jobs = get_site_jobs(sites, test_types, deadline, started_sites, fresh_site_tests)
+    capture_batches = use_capture_batches(test_types)
+    on_job_done = functools.partial(
+        on_site_job_done,
+        journal_filename=journal_filename,
+        started_sites=started_sites)
+
+    # Results by site index, failed tests are retried after all sites are tested
+    site_results = {}
+    failures = {}
+    for job, job_results in run_site_test_jobs(
+            global_translation, jobs, test_types, nof_sites,
+            workers if has_more_then_one_site else 1,
+            fresh_site_tests, on_job_done, capture_batches):
+        rows, failed_tests = get_failed_tests(job_results)
+        site_results[job[0]] = rows
+        if len(failed_tests) > 0:
+            failures[job[0]] = {
+                'site': job[1],
+                'failed': failed_tests,
+                'failed_at': time.monotonic(),
+                'attempts': [get_attempt_info(1, failed_tests)]
+            }
+
+    retry_failed_site_tests(
+        global_translation, test_types, failures, site_results,
+        workers, journal_filename, deadline)
+    save_changed_stats()
 
-        site_index += 1
+    if has_more_then_one_site:
+        print_memo_stats()
 
+    results = []
+    for site_index in sorted(site_results.keys()):
+        results.extend(site_results[site_index])
     return results
 
+def run_site_test_jobs(global_translation, jobs, test_types, nof_sites, workers, # pylint: disable=too-many-arguments
+                       fresh_site_tests, on_job_done, capture_batches=False):
+    """
+    Runs test_site_job for every job, in worker processes if workers is more than 1
+    or if there are too many sites for one worker (see use_worker_processes).
+    Only network bound tests may instead be run on an event loop (see use_event_loop).
+    If capture_batches is set, following jobs for sites on the same host are
+    run together (see get_capture_batch_jobs), in the same process, after capturing
+    all of them in one browser run (see test_site_batch_job).
+
+    Yields:
+    tuple: Job and its results, in the same order as jobs.
+    """
+    if use_event_loop(test_types, workers):
+        yield from run_async_site_test_jobs(
+            global_translation, jobs, test_types, nof_sites, fresh_site_tests, on_job_done)
+        return
+
+    job_handler = test_site_job
+    on_lost_job = on_lost_site_job
+    if capture_batches:
+        # Every job is then a list of jobs, see get_capture_batch_jobs
+        jobs = get_capture_batch_jobs(jobs, test_types, fresh_site_tests)
+        job_handler = test_site_batch_job
+        on_lost_job = on_lost_site_batch_job
+        on_job_done = functools.partial(on_site_batch_done, on_job_done=on_job_done)
+    job_handler = functools.partial(
+        job_handler,
+        test_types=test_types,
+        nof_sites=nof_sites,
+        fresh_site_tests=fresh_site_tests)
+
+    if use_worker_processes(workers, nof_sites):
+        results = run_worker_pool(
+            job_handler,
+            jobs,
+            workers if nof_sites is None else min(workers, nof_sites),
+            functools.partial(on_lost_job, test_types=test_types),
+            on_job_done)
+    else:
+        results = run_local_site_test_jobs(global_translation, jobs, job_handler, on_job_done)
+
+    for job, job_results in results:
+        if capture_batches:
+            yield from zip(job, job_results)
+        else:
+            yield job, job_results
+
+def run_local_site_test_jobs(global_translation, jobs, job_handler, on_job_done):
+    """
+    Runs job_handler for every job in this process, one job at a time,
+    calling on_job_done as soon as a job is done.
+
+    Yields:
+    tuple: Job and its results, in the same order as jobs.
+    """
+    for job in jobs:
+        job_results = job_handler(global_translation, job)
+        on_job_done(job, job_results)
+        yield job, job_results
+
+def get_failed_tests(site_results):
+    """
+    Splits the results of test_site_job into test results and failed tests.
+
+    Returns:
+    tuple: Test results (list) and error for every failed test type (dict).
+    """
+    if len(site_results) > 0 and 'failed_tests' in site_results[-1]:
+        return site_results[:-1], site_results[-1]['failed_tests']
+    return site_results, {}
+
+def get_attempt_info(attempt, failed_tests):
+    """
+    Returns attempt history entry for an attempt to test a site.
+
+    Parameters:
+    attempt (int): Attempt number, starting with 1.
+    failed_tests (dict): Error for every test type that failed in the attempt.
+    """
+    return {
+        'attempt': attempt,
+        'date': datetime.now().isoformat(),
+        'failed': {str(test_type): error for test_type, error in failed_tests.items()}
+    }
+
+def get_retry_jobs(failures, delay, deadline):
+    """
+    Yields a retry job (site index, site and failed test types) for every failure,
+    waiting until delay seconds have passed since the site last failed.
+    No more jobs are yielded if waiting would pass the deadline.
+    """
+    for site_index, failure in sorted(failures.items(), key=lambda item: item[1]['failed_at']):
+        wait_seconds = failure['failed_at'] + delay - time.monotonic()
+        if deadline is not None and \
+                datetime.now() + timedelta(seconds=max(wait_seconds, 0)) > deadline:
+            print(f'Deadline {deadline.isoformat(timespec="minutes")} is too close, '
+                  'not retrying remaining failed tests')
+            return
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+        yield site_index, failure['site'], sorted(failure['failed'].keys())
+
+def retry_failed_site_tests(global_translation, test_types, failures, site_results, # pylint: disable=too-many-arguments
+                            workers, journal_filename, deadline):
+    """
+    Retries failed tests (timeouts, HTTP errors, browser crashes and similar)
+    after all sites are tested, waiting general.retry.delay seconds before the first retry
+    and twice as long before every following retry, at most general.retry.max times.
+    Results of a retry are combined with the results of the earlier attempts and
+    the attempt history is added to the data of the result.
+
+    Parameters:
+    global_translation : GNUTranslations
+        An object that handles the translation of text in the context of internationalization.
+    test_types : list
+        The test types run on every site.
+    failures : dict
+        Failed site tests by site index, see test_sites.
+    site_results : dict
+        Results by site index, updated with the combined results.
+    workers : int
+        Number of worker processes to use.
+    journal_filename : str
+        If set, the combined results are appended to the journal.
+    deadline : datetime
+        No retry is started if waiting for it would pass the deadline.
+    """
+    max_retries = get_config('general.retry.max')
+    delay = get_config('general.retry.delay')
+    for retry in range(max_retries):
+        if len(failures) == 0:
+            return
+        attempt = retry + 2
+        retry_delay = delay * 2 ** retry
+        print(f'Retrying failed tests for {len(failures)} site(s), attempt {attempt} '
+              f'(waiting {retry_delay} seconds after last failure)')
+
+        # Jobs are taken when a site is ready to be retried, so waiting for one site
+        # doesn't hold back retrying the sites that failed before it
+        nof_retried = 0
+        for job, job_results in run_site_test_jobs(
+                global_translation, get_retry_jobs(failures, retry_delay, deadline),
+                test_types, None, min(workers, len(failures)), None,
+                lambda job, job_results: add_site_job_costs(job_results)):
+            nof_retried += 1
+            site_index, site, _ = job
+            failure = failures.pop(site_index)
+            rows, failed_tests = get_failed_tests(job_results)
+            failure['attempts'].append(get_attempt_info(attempt, failed_tests))
+            site_results[site_index] = get_combined_site_test(
+                global_translation,
+                site[0],
+                test_types,
+                site_results[site_index] + rows,
+                failure['attempts'])
+            append_journal_entry(journal_filename, site, site_results[site_index])
+            if len(failed_tests) > 0:
+                failure['failed'] = failed_tests
+                failure['failed_at'] = time.monotonic()
+                failures[site_index] = failure
+        if nof_retried == 0:
+            # Deadline too close for any retry
+            break
+
+    if len(failures) > 0:
+        print(f'Giving up on failed tests for {len(failures)} site(s), see failures.log')
+
+def get_site_jobs(sites, test_types, deadline, started_sites, fresh_site_tests=None):
+    """
+    Yields a job (site index and site) for every site to test.
+
+    If deadline is set, no more jobs are yielded once the next site is estimated
+    to not be done before the deadline (based on how long sites took to test
+    with the same test types in previous and the current run, see helpers/stats_helper.py).
+
+    Parameters:
+    sites (list or iterable): A list of sites, each a list of site id and website.
+    test_types (list): A list of test types to be run.
+    deadline (datetime): When all testing should be done, or None for no deadline.
+    started_sites (dict): Filled with the time every site was started, by site index.
+    fresh_site_tests (dict): Fresh test types for every site (see get_fresh_site_tests).
+
+    Yields:
+    tuple: Site index and site.
+    """
+    for site_index, site in enumerate(sites):
+        if deadline is not None:
+            estimated_seconds = get_estimated_site_duration(
+                get_site_test_types(site, test_types, fresh_site_tests))
+            if estimated_seconds is None:
+                estimated_seconds = 0
+            if datetime.now() + timedelta(seconds=estimated_seconds) > deadline:
+                nof_remaining = '' if not isinstance(sites, (list, tuple)) \
+                    else f' {len(sites) - site_index}'
+                print(f'Deadline {deadline.isoformat(timespec="minutes")} is too close '
+                      f'(a site takes about {estimated_seconds:.0f} seconds), '
+                      f'not testing remaining{nof_remaining} site(s)')
+                return
+        started_sites[site_index] = time.monotonic()
+        yield site_index, site
+
+def test_site_job(global_translation, job, test_types, nof_sites, fresh_site_tests=None):
+    """
+    Tests one site, printing the same progress information as when testing
+    sites one by one. Used both directly and as job handler for worker processes.
+
+    Parameters:
+    global_translation : GNUTranslations
+        An object that handles the translation of text in the context of internationalization.
+    job : tuple
+        A tuple containing the index of the site and the site (site ID and website URL),
+        retry jobs also have the failed test types to run again.
+    test_types : list
+        A list of test types to be run.
+    nof_sites : int
+        Total number of sites being tested, None if not known.
+    fresh_site_tests : dict, optional
+        Test types to skip for every site as their results are still fresh.
+
+    Returns:
+    list
+        A list containing the results of all the tests run on the website,
+        followed by {'failed_tests': {...}, 'test_costs': [...], 'tested_test_types': [...],
+        'memo_counters': {...}} if tests were run (see get_site_job_results).
+    """
+    site_test_types = get_site_job_test_types(
+        global_translation, job, test_types, nof_sites, fresh_site_tests)
+    if len(site_test_types) == 0:
+        return []
+    failed_tests = {}
+    site_results = test_site(global_translation, job[1], site_test_types, failed_tests)
+    return get_site_job_results(site_results, failed_tests, site_test_types)
+
+def test_site_batch_job(global_translation, batch, test_types, nof_sites, fresh_site_tests=None):
+    """
+    Tests the sites of a group of jobs (see get_capture_batch_jobs) one by one,
+    after capturing all of them in one browser run (see capture_in_advance)
+    if there are more than one. Used both directly and as job handler for worker processes,
+    so the capture is always made by the process using it.
+
+    Returns:
+    list
+        The results of test_site_job for every job in batch.
+    """
+    if len(batch) > 1:
+        capture_in_advance([job[1][1] for job in batch])
+    return [
+        test_site_job(global_translation, job, test_types, nof_sites, fresh_site_tests)
+        for job in batch]
+
+def get_site_job_test_types(global_translation, job, test_types, nof_sites, fresh_site_tests):
+    """
+    Prints what site a job tests and returns the test types to run on it
+    (the failed test types for retry jobs), see test_site_job.
+    """
+    site_index, site = job[0], job[1]
+    if site_index > 0:
+        print(global_translation('TEXT_TEST_START_HEADER'))
+    website = site[1]
+    print(global_translation('TEXT_TESTING_SITE').format(website))
+    if len(job) > 2:
+        site_test_types = job[2]
+        print(f'Retrying failed test(s): {site_test_types}')
+    else:
+        if nof_sites is None:
+            print(global_translation('TEXT_WEBSITE_X_OF_Y').format(site_index + 1, '?'))
+        elif nof_sites > 1:
+            print(global_translation('TEXT_WEBSITE_X_OF_Y').format(site_index + 1, nof_sites))
+        site_test_types = get_site_test_types(site, test_types, fresh_site_tests)
+
+    if len(site_test_types) == 0:
+        print('Skipping site, all test results are newer than general.skip-fresh')
+    return site_test_types
+
+def get_site_job_results(site_results, failed_tests, site_test_types):
+    """
+    Returns site_results followed by {'failed_tests': {...}, 'test_costs': [...],
+    'tested_test_types': [...], 'memo_counters': {...}} if tests were run (see test_site_job).
+    Test costs and memo counters are only given in worker processes. tested_test_types is only set
+    (to site_test_types) if the site was tested and no test failed,
+    so only complete sites are used to estimate how long a site takes (see on_site_job_done).
+    """
+    test_costs = pop_pending_test_costs()
+    memo_counters = pop_memo_counters()
+    tested_test_types = None
+    if len(failed_tests) == 0 and len(site_results) > 0:
+        tested_test_types = site_test_types
+    if len(failed_tests) > 0 or len(test_costs) > 0 or tested_test_types is not None or\
+            memo_counters is not None:
+        site_results.append({
+            'failed_tests': failed_tests,
+            'test_costs': test_costs,
+            'tested_test_types': tested_test_types,
+            'memo_counters': memo_counters
+        })
+    return site_results
+
+def get_fresh_site_tests(output_filename):
+    """
+    Returns the site tests in output file that are newer than general.skip-fresh minutes,
+    these are not tested again. Only supported for .sqlite output files.
+
+    Parameters:
+    output_filename (str): The name of the output file.
+
+    Returns:
+    dict: Set of fresh test types for every site, with site id (as str) as key.
+    """
+    max_age = get_config('general.skip-fresh')
+    if max_age is None or max_age <= 0 or len(output_filename) == 0:
+        return {}
+
+    get_fresh_tests = get_engine_function(OUTPUT_ENGINES, output_filename, 'get_fresh_site_tests')
+    if get_fresh_tests is None:
+        print('Warning: Ignoring general.skip-fresh, only supported for .sqlite output files')
+        return {}
+    return get_fresh_tests(output_filename, max_age)
+
+def sort_sites_by_staleness(sites, output_filename):
+    """
+    Orders sites so never tested sites come first, followed by the sites
+    with the oldest latest test in output file.
+    Only supported for .sqlite and .json output files.
+
+    Parameters:
+    sites (list): A list of sites, each a list of site id and website.
+    output_filename (str): The name of the output file.
+
+    Returns:
+    list: The sites, stalest first.
+    """
+    get_latest_test_dates = get_engine_function(
+        OUTPUT_ENGINES, output_filename, 'get_latest_test_dates')
+    if len(output_filename) == 0 or get_latest_test_dates is None:
+        print('Warning: Ignoring --stale-first, only supported for .sqlite and .json output files')
+        return sites
+
+    latest_test_dates = get_latest_test_dates(output_filename)
+    # sort is stable so sites with the same date keep their input order
+    return sorted(sites, key=lambda site: (
+        str(site[0]) in latest_test_dates,
+        latest_test_dates.get(str(site[0]), '')))
+
+def use_shared_capture(test_types):
+    """
+    Returns True if any of test_types uses the shared browser capture of the site
+    (see TEST_USE_SHARED_CAPTURE).
+    """
+    if get_config('tests.http.csp-only') and TEST_HTTP in test_types:
+        return True
+    shared_test_types = TEST_USE_SHARED_CAPTURE
+    if 'firefox' in get_config('tests.sitespeed.browser'):
+        # Software then uses its own Firefox run
+        shared_test_types = tuple(
+            test_type for test_type in shared_test_types if test_type != TEST_SOFTWARE)
+    return any(test_type in shared_test_types for test_type in test_types)
+
+def use_capture_batches(test_types):
+    """
+    Returns True if following sites on the same host should be captured in one
+    browser run (see get_capture_batch_jobs), that is if tests.sitespeed.batch-size
+    is more than 1 and any of test_types uses the shared capture.
+    """
+    return get_config('tests.sitespeed.batch-size') > 1 and\
+        get_config('tests.sitespeed.shared-capture') and use_shared_capture(test_types)
+
+def get_capture_batch_jobs(jobs, test_types, fresh_site_tests):
+    """
+    Groups following jobs for sites on the same host (for example from a sitemap),
+    at most tests.sitespeed.batch-size in every group, so each group can be
+    captured in one browser run (see test_site_batch_job) instead of one run per site.
+    Only looks as far ahead in jobs as needed, so sites can still be read while testing.
+
+    Parameters:
+    jobs (iterable): The jobs, see get_site_jobs.
+    test_types (list): A list of test types to be run.
+    fresh_site_tests (dict): Fresh test types for every site (see get_fresh_site_tests).
+
+    Yields:
+    list: The jobs of a group, sites not using the shared capture get a group of their own.
+    """
+    batch_size = get_config('tests.sitespeed.batch-size')
+    batch = []
+    batch_hostname = None
+    for job in jobs:
+        site = job[1]
+        if not use_shared_capture(get_site_test_types(site, test_types, fresh_site_tests)):
+            if len(batch) > 0:
+                yield batch
+                batch = []
+            yield [job]
+            continue
+
+        hostname = urlparse(site[1]).hostname
+        if len(batch) > 0 and hostname != batch_hostname:
+            yield batch
+            batch = []
+        batch_hostname = hostname
+        batch.append(job)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if len(batch) > 0:
+        yield batch
+
+def get_site_test_types(site, test_types, fresh_site_tests):
+    """
+    Returns the test types to run for a site, removing the ones with fresh results.
+    A fresh combined result (type -1) counts for all test types when running several tests.
+
+    Parameters:
+    site (tuple): A tuple containing the site ID and the website URL.
+    test_types (list): A list of test types to be run.
+    fresh_site_tests (dict): Fresh test types for every site (see get_fresh_site_tests).
+
+    Returns:
+    list: The test types to run for the site.
+    """
+    if fresh_site_tests is None:
+        return test_types
+
+    fresh_test_types = fresh_site_tests.get(str(site[0]))
+    if fresh_test_types is None:
+        return test_types
+    if len(test_types) > 1 and -1 in fresh_test_types:
+        return []
+    return [test_type for test_type in test_types if test_type not in fresh_test_types]
+
+def on_site_job_done(job, site_results, journal_filename, started_sites=None, nof_batch_sites=1): # pylint: disable=too-many-arguments
+    """
+    Called as soon as a site is tested, appends the results to the journal (if any)
+    and adds the time it took to the timing history. Only sites where all tests
+    were run without failing are added to the timing history (see get_site_job_results),
+    sites skipped by general.skip-fresh, lost with a worker or with failed tests are not.
+    Sites tested together (see on_site_batch_done) are started at the same time,
+    so each of them is given an equal part of the time.
+    """
+    site_index, site = job[0], job[1]
+    append_journal_entry(journal_filename, site, get_failed_tests(site_results)[0])
+    add_site_job_costs(site_results)
+    if started_sites is not None and site_index in started_sites:
+        started = started_sites.pop(site_index)
+        if len(site_results) > 0 and site_results[-1].get('tested_test_types') is not None:
+            add_site_duration(
+                site_results[-1]['tested_test_types'],
+                (time.monotonic() - started) / nof_batch_sites)
+
+def on_site_batch_done(batch, batch_results, on_job_done):
+    """
+    Called as soon as a group of jobs (see test_site_batch_job) is done,
+    calls on_job_done (see on_site_job_done) for every job in it.
+    """
+    for job, job_results in zip(batch, batch_results):
+        on_job_done(job, job_results, nof_batch_sites=len(batch))
+
+def add_site_job_costs(site_results):
+    """
+    Adds test costs measured in a worker process (see test_site_job) to the timing history
+    and its memo hits and misses to the ones printed when all sites are tested.
+    """
+    if len(site_results) > 0 and 'test_costs' in site_results[-1]:
+        add_test_costs(site_results[-1]['test_costs'])
+        if site_results[-1].get('memo_counters') is not None:
+            add_memo_counters(site_results[-1]['memo_counters'])
+
+def on_lost_site_job(job, exitcode, test_types):
+    """
+    Called when a worker process died while testing a site,
+    writes the reason to failures log and returns all test types as failed (so they are retried).
+    """
+    site = job[1]
+    if len(job) > 2:
+        test_types = job[2]
+    error = f'Worker process exited unexpectedly (exit code: {exitcode})'
+    info = get_error_info(site[1], test_types, RuntimeError(error))
+    print('\n'.join(info).replace('\n\n','\n'))
+    write_failure_info(info)
+    return [{'failed_tests': {test_type: error for test_type in test_types}}]
+
+def on_lost_site_batch_job(batch, exitcode, test_types):
+    """
+    Called when a worker process died while testing a group of jobs (see test_site_batch_job),
+    returns the result of on_lost_site_job for every job in it.
+    """
+    return [on_lost_site_job(job, exitcode, test_types) for job in batch]
+
 def validate_test_type(tmp_test_types):
     """
     Validates the given test types against a list of valid tests.
@@ -488,30 +1413,38 @@ def write_test_results(sites, output_filename, test_results, global_translation)
     None
     """
     if len(output_filename) > 0:
-        file_ending = ""
-        file_long_ending = ""
-        if len(output_filename) > 4:
-            file_ending = output_filename[-4:].lower()
-        if len(output_filename) > 7:
-            file_long_ending = output_filename[-7:].lower()
-        if file_ending == ".csv":
-            write_tests = csv_write_tests
-        elif file_ending == ".gov":
-            write_tests = gov_write_tests
-        elif file_ending == ".sql":
-            write_tests = sql_write_tests
-        elif file_long_ending == ".sqlite":
-            write_tests = sqlite_write_tests
-        elif file_long_ending.endswith(".md"):
-            write_tests = markdown_write_tests
-        else:
-            write_tests = json_write_tests
+        write_tests = get_engine_function(OUTPUT_ENGINES, output_filename, 'write_tests')
 
         ensure_parent_path(output_filename)
 
             # use loaded engine to write tests
         write_tests(output_filename, test_results, sites, global_translation)
 
+def merge_test_results(output_filename, input_filenames):
+    """
+    Merges test results from several output files (for example from different shards)
+    into one output file.
+
+    The file type is determined based on the file extension of the output filename,
+    all input files are expected to be of the same type.
+    Only .sqlite, .json and .csv are supported.
+
+    Parameters:
+    output_filename (str): The name of the output file.
+    input_filenames (list): The output files to merge.
+
+    Returns:
+    bool: True if the files were merged, False if file type is not supported.
+    """
+    if not output_filename.lower().endswith(('.sqlite', '.json', '.csv')):
+        print('Error: Merging is only supported for .sqlite, .json and .csv files')
+        return False
+
+    merge_tests = get_engine_function(OUTPUT_ENGINES, output_filename, 'merge_tests')
+    ensure_parent_path(output_filename)
+    merge_tests(output_filename, input_filenames)
+    return True
+
 def ensure_parent_path(output_filename):
     """
     Ensures that the parent directory of the output file exists.
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+import gettext
+import glob
+import multiprocessing
+import os
+import queue
+import sys
+from helpers.process_helper import stop_processes
+from helpers.setting_helper import get_config, get_used_configuration,\
+    set_runtime_config_only
+
+# Keeps track of what worker (if any) the current process is,
+# this so workers never share tmp folders or failure log.
+WORKER = {
+    'index': None,
+    'count': 1
+}
+
+def get_worker_index():
+    """
+    Returns the index of the current worker process,
+    or None if we are not running inside a worker.
+    """
+    return WORKER['index']
+
+def get_worker_count():
+    """
+    Returns the number of worker processes used in current run (1 if not using workers),
+    used for sharing limits (for example request rates) between workers.
+    """
+    return WORKER['count']
+
+def get_tmp_folder():
+    """
+    Returns the folder used for temporary test results (for example sitespeed results).
+    Every worker gets its own sub folder so parallel runs never collide.
+    """
+    if WORKER['index'] is None:
+        return 'tmp'
+    return os.path.join('tmp', f"worker-{WORKER['index']}")
+
+def get_failures_log_filename():
+    """
+    Returns the filename errors should be written to for the current process.
+    Workers write to their own log that is merged into failures.log when the run is done.
+    """
+    if WORKER['index'] is None:
+        return 'failures.log'
+    return f"failures-worker-{WORKER['index']}.log"
+
+def merge_worker_failure_logs():
+    """
+    Appends content of all worker failure logs to failures.log and removes them.
+    """
+    worker_logs = sorted(glob.glob('failures-worker-*.log'))
+    if len(worker_logs) == 0:
+        return
+
+    with open('failures.log', 'a', encoding='utf-8') as outfile:
+        for worker_log in worker_logs:
+            with open(worker_log, encoding='utf-8') as infile:
+                outfile.write(infile.read())
+            os.remove(worker_log)
+
+def use_worker_processes(nof_workers, nof_sites):
+    """
+    Returns True if sites should be tested in worker processes, that is when more than
+    one site is tested at a time or when more sites are tested than a worker is allowed
+    to test before it is replaced (general.worker.max-sites).
+    This so memory used by long runs stays bounded.
+
+    Args:
+        nof_workers (int): Number of sites to test at a time.
+        nof_sites (int): Number of sites to test, None if not known.
+    """
+    if nof_workers > 1:
+        return True
+    max_sites = get_config('general.worker.max-sites')
+    return max_sites > 0 and (nof_sites is None or nof_sites > max_sites)
+
+def get_memory_usage():
+    """
+    Returns number of bytes of memory (resident set size) used by the current process,
+    or None if it is not known on this platform.
+    """
+    try:
+        with open('/proc/self/statm', encoding='utf-8') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    # Peak usage, in bytes on macOS and in kilobytes on other platforms
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def get_recycle_reason(nof_jobs):
+    """
+    Returns why the current worker should be replaced by a new one after nof_jobs jobs
+    (general.worker.max-sites or general.worker.max-memory reached), or None.
+    """
+    max_sites = get_config('general.worker.max-sites')
+    # CSP only combines the result of all pages tested by the process
+    if max_sites > 0 and nof_jobs >= max_sites and not get_config('tests.http.csp-only'):
+        return f'tested {nof_jobs} site(s)'
+
+    max_memory = get_config('general.worker.max-memory')
+    if max_memory <= 0:
+        return None
+    memory_usage = get_memory_usage()
+    if memory_usage is not None and memory_usage > max_memory * 1024 * 1024:
+        return f'using {memory_usage // (1024 * 1024)} MB of memory'
+    return None
+
+def get_worker_context(nof_workers):
+    """
+    Returns everything a worker process needs to behave as the main process,
+    that is the language used, all configuration set for current run and
+    the number of workers.
+    """
+    return {
+        'language': get_config('general.language'),
+        'config': get_used_configuration(),
+        'workers': nof_workers
+    }
+
+def init_worker(worker_index, worker_context):
+    """
+    Prepares the current process to act as a worker.
+
+    Configuration from the main process is restored (settings given with --setting
+    are not available from settings.json) and the language is loaded and installed.
+
+    Args:
+        worker_index (int): Index of this worker, used for tmp folder and failure log.
+        worker_context (dict): Context created by `get_worker_context` in main process.
+
+    Returns:
+        function: The translation function for the configured language.
+    """
+    WORKER['index'] = worker_index
+    WORKER['count'] = worker_context['workers']
+
+    for name, value in worker_context['config'].items():
+        set_runtime_config_only(name, value)
+
+    trans = gettext.translation(
+        'webperf-core', localedir='locales', languages=[worker_context['language']])
+    trans.install()
+    return trans.gettext
+
+def worker_main(worker_index, worker_context, job_handler, job_queue, result_queue):
+    """
+    Entry point for worker processes.
+    Takes jobs from job_queue until it gets None and puts the result of
+    every job on result_queue.
+    Stops after a job if it should be replaced by a new worker (see get_recycle_reason).
+    """
+    global_translation = init_worker(worker_index, worker_context)
+
+    nof_jobs = 0
+    try:
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            job_index, job_data = job
+            result = job_handler(global_translation, job_data)
+            result_queue.put(('done', worker_index, job_index, result))
+
+            nof_jobs += 1
+            recycle_reason = get_recycle_reason(nof_jobs)
+            if recycle_reason is not None:
+                result_queue.put(('recycle', worker_index, None, recycle_reason))
+                break
+    finally:
+        # Worker processes exit without running atexit handlers
+        stop_processes()
+
+def start_worker(context, worker_index, worker_context, job_handler, job_queue, result_queue): # pylint: disable=too-many-arguments
+    """
+    Starts a new worker process and returns it.
+    """
+    process = context.Process(
+        target=worker_main,
+        args=(worker_index, worker_context, job_handler, job_queue, result_queue),
+        daemon=True)
+    process.start()
+    return process
+
+def run_worker_pool(job_handler, jobs, nof_workers, on_lost_job, on_job_done=None): # pylint: disable=too-many-locals,too-many-branches,too-many-arguments
+    """
+    Runs every job in a pool of worker processes.
+
+    Only as many jobs as there are workers are handed out at a time,
+    the rest are taken from `jobs` when a worker is ready for more.
+    Results are yielded in the same order as the jobs,
+    no matter in what order the workers finish them.
+    If a worker dies while running a job (or before taking the job it was given),
+    `on_lost_job` is called with the job and
+    the worker exit code and its return value is used as result for the job.
+    Workers are replaced by new ones (using the same index) when they have tested
+    general.worker.max-sites sites or use more than general.worker.max-memory MB.
+    If set, `on_job_done` is called as soon as a job is finished,
+    even if it is not yet its turn to be yielded.
+
+    Args:
+        job_handler (function): Picklable function taking (global_translation, job).
+        jobs (iterable): The jobs to run.
+        nof_workers (int): Number of worker processes to use.
+        on_lost_job (function): Called as on_lost_job(job, exitcode) for lost jobs.
+        on_job_done (function, optional): Called as on_job_done(job, result).
+
+    Yields:
+        tuple: (job, result) for every job, in the same order as `jobs`.
+    """
+    context = multiprocessing.get_context()
+    result_queue = context.Queue()
+    worker_context = get_worker_context(nof_workers)
+
+    # Every worker has its own job queue, so we always know what job a worker
+    # has been given, even if it dies before telling us it started it.
+    workers = {}
+    job_queues = {}
+    next_worker_index = 0
+    for _ in range(nof_workers):
+        job_queues[next_worker_index] = context.Queue()
+        workers[next_worker_index] = start_worker(
+            context, next_worker_index, worker_context, job_handler,
+            job_queues[next_worker_index], result_queue)
+        next_worker_index += 1
+
+    jobs_iterator = enumerate(jobs)
+    has_more_jobs = True
+    pending = {}
+    assigned = {}
+    finished = {}
+    next_to_yield = 0
+
+    try:
+        while True:
+            for worker_index in list(workers.keys()):
+                if not has_more_jobs or worker_index in assigned:
+                    continue
+                try:
+                    job_index, job = next(jobs_iterator)
+                except StopIteration:
+                    has_more_jobs = False
+                    break
+                pending[job_index] = job
+                assigned[worker_index] = job_index
+                job_queues[worker_index].put((job_index, job))
+
+            if len(pending) == 0 and next_to_yield not in finished:
+                break
+
+            try:
+                message_type, worker_index, job_index, result = result_queue.get(timeout=1)
+                if message_type == 'recycle':
+                    if worker_index in workers:
+                        print(f'Replacing worker {worker_index}, {result}')
+                        process = workers.pop(worker_index)
+                        process.join(timeout=10)
+                        if process.is_alive():
+                            process.kill()
+                        # A job given to it after its last one is taken by the new worker
+                        workers[worker_index] = start_worker(
+                            context, worker_index, worker_context,
+                            job_handler, job_queues[worker_index], result_queue)
+                elif message_type == 'done' and job_index in pending:
+                    assigned.pop(worker_index, None)
+                    finished[job_index] = (pending.pop(job_index), result)
+                    if on_job_done is not None:
+                        on_job_done(*finished[job_index])
+            except queue.Empty:
+                for worker_index, process in list(workers.items()):
+                    if process.is_alive():
+                        continue
+                    del workers[worker_index]
+                    job_index = assigned.pop(worker_index, None)
+                    if job_index is not None and job_index in pending:
+                        job = pending.pop(job_index)
+                        finished[job_index] = (job, on_lost_job(job, process.exitcode))
+                        if on_job_done is not None:
+                            on_job_done(*finished[job_index])
+                    del job_queues[worker_index]
+                    job_queues[next_worker_index] = context.Queue()
+                    workers[next_worker_index] = start_worker(
+                        context, next_worker_index, worker_context,
+                        job_handler, job_queues[next_worker_index], result_queue)
+                    next_worker_index += 1
+
+            while next_to_yield in finished:
+                yield finished.pop(next_to_yield)
+                next_to_yield += 1
+    finally:
+        for worker_index in workers:
+            job_queues[worker_index].put(None)
+        for process in workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+        merge_worker_failure_logs()
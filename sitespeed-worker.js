@@ -0,0 +1,58 @@
+/*
+ * USED FOR SITESPEED TESTS WHEN tests.sitespeed.worker.use IS SET!!!
+ * Keeps sitespeed.io (and its plugins) loaded between runs, see helpers/sitespeed_worker_helper.py.
+ *
+ * Reads one job per line on stdin: {"args": [<sitespeed.io arguments>]}
+ * For every job the sitespeed.io output is written to stdout followed by a line:
+ * WEBPERF-CORE-SITESPEED-WORKER-DONE {"exitCode": <0 or 1>, "outputFolder": "<path>"}
+ * Exits when stdin is closed.
+ */
+import path from 'node:path';
+import readline from 'node:readline';
+import { pathToFileURL } from 'node:url';
+
+const DONE_MARKER = 'WEBPERF-CORE-SITESPEED-WORKER-DONE';
+const SITESPEED_FOLDER = path.resolve('node_modules', 'sitespeed.io');
+
+// Imported using path as sitespeed.io doesn't export these (the same modules bin/sitespeed.js uses)
+const { parseCommandLine } = await import(
+  pathToFileURL(path.join(SITESPEED_FOLDER, 'lib', 'cli', 'cli.js')).href);
+const { run } = await import(
+  pathToFileURL(path.join(SITESPEED_FOLDER, 'lib', 'sitespeed.js')).href);
+
+function getOutputFolder(args) {
+  const index = args.indexOf('--outputFolder');
+  return index >= 0 && index + 1 < args.length ? args[index + 1] : '';
+}
+
+async function runJob(args) {
+  // Command line is parsed the same way as when running bin/sitespeed.js
+  process.argv = [process.argv[0], path.join(SITESPEED_FOLDER, 'bin', 'sitespeed.js'), ...args];
+  const parsed = await parseCommandLine();
+  const options = parsed.options;
+  options.explicitOptions = parsed.explicitOptions;
+  options.urls = parsed.urls;
+  options.urlsMetaData = parsed.urlMetaData;
+
+  const result = await run(options);
+  return result.errors && result.errors.length > 0 ? 1 : 0;
+}
+
+const lines = readline.createInterface({ input: process.stdin });
+for await (const line of lines) {
+  if (line.trim() === '') {
+    continue;
+  }
+
+  let exitCode = 0;
+  let outputFolder = '';
+  try {
+    const job = JSON.parse(line);
+    outputFolder = getOutputFolder(job.args);
+    exitCode = await runJob(job.args);
+  } catch (error) {
+    console.error(error);
+    exitCode = 1;
+  }
+  process.stdout.write(`\n${DONE_MARKER} ${JSON.stringify({ exitCode, outputFolder })}\n`);
+}
@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 import os
-import subprocess
 from datetime import datetime
 import json
 from tests.utils import get_translation,\
     get_http_content, flatten_issues_dict,\
     calculate_rating, get_domain
 from helpers.setting_helper import get_config
+from helpers.politeness_helper import wait_for_host
+from helpers.process_helper import run_process
+from helpers.stats_helper import add_test_cost
 from helpers.models import Rating
 
 def run_test(global_translation, url):
@@ -121,11 +123,12 @@ def get_pa11y_errors(url, use_axe):
     # NOTE: "--ignore color-contrast" was added to temporarly solve issue #204
     command = (f"node node_modules{os.path.sep}pa11y{os.path.sep}bin{os.path.sep}pa11y.js "
                    f"--ignore color-contrast --reporter json {additional_args}{url}")
-    with subprocess.Popen(command.split(), stdout=subprocess.PIPE) as process:
-        output, _ = process.communicate(timeout=get_config('general.request.timeout') * 10)
-
-        # If we fail to connect to website the result_dict should be None and we should end test
-        if output is None or len(output) == 0:
-            return None
-        json_result = json.loads(output)
-        return json_result
+    wait_for_host(url)
+    add_test_cost('pa11y')
+    output = run_process(command.split(), get_config('general.request.timeout') * 10)
+
+    # If we fail to connect to website the result_dict should be None and we should end test
+    if output is None or len(output) == 0:
+        return None
+    json_result = json.loads(output)
+    return json_result
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=too-many-lines
+import asyncio
+import contextvars
+import copy
 import re
 import json
 import smtplib
@@ -9,11 +12,11 @@ import ipaddress
 import sys
 import urllib
 import urllib.parse
-import time
 from bs4 import BeautifulSoup
 import dns
+from helpers.memo_helper import get_memo_value
 from helpers.models import Rating
-from tests.utils import dns_lookup, get_best_country_code, \
+from tests.utils import dns_lookup, dns_lookup_async, get_best_country_code, \
     get_http_content, get_translation, \
     is_country_code_in_eu_or_on_exception_list, get_root_url
 from helpers.setting_helper import get_config
@@ -130,16 +133,86 @@ def run_test(global_translation, url):
     print(global_translation('TEXT_TEST_START').format(
         datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
 
-    result_dict = {}
     o = urllib.parse.urlparse(url)
     hostname = o.hostname
 
+    # Result only depends on the hostname,
+    # other urls on the same host (for example from a sitemap) reuse it.
+    (rating, domain_result_dict), memo_info = get_memo_value(
+        'email',
+        hostname,
+        lambda: validate_email_for_url(url, hostname, global_translation, local_translation))
+    result_dict = copy.deepcopy(domain_result_dict)
+    if memo_info is not None:
+        result_dict['memo'] = memo_info
+
+    print(global_translation('TEXT_TEST_END').format(
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    reviews = rating.get_reviews()
+    print(global_translation('TEXT_SITE_RATING'), rating)
+    if get_config('general.review.show'):
+        print(
+            global_translation('TEXT_SITE_REVIEW'),
+            reviews)
+
+    if get_config('general.review.data'):
+        nice_json_data = json.dumps(result_dict, indent=3)
+        print(
+            global_translation('TEXT_SITE_REVIEW_DATA'),
+            f'```json\r\n{nice_json_data}\r\n```')
+
+    return (rating, result_dict)
+
+async def run_test_async(global_translation, url):
+    """
+    Same as run_test but for an event loop (see test_async in helpers/test_helper.py).
+    The DNS records the test needs are looked up without blocking the event loop,
+    the rest of the test (SMTP, HTTP and rating) runs in the default executor
+    using the cached DNS answers.
+    """
+    hostname = urllib.parse.urlparse(url).hostname
+    if hostname is not None:
+        await prefetch_email_dns(hostname[4:] if hostname.startswith('www.') else hostname)
+
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        None, context.run, run_test, global_translation, url)
+
+async def prefetch_email_dns(hostname):
+    """
+    Looks up (and caches) the DNS records validate_email_domain uses for hostname,
+    MX servers are looked up when the MX records are known.
+    """
+    (mx_results, _, _, _) = await asyncio.gather(
+        dns_lookup_async(hostname, dns.rdatatype.MX),
+        dns_lookup_async(hostname, dns.rdatatype.TXT),
+        dns_lookup_async(f'_dmarc.{hostname}', 'TXT'),
+        dns_lookup_async(f'_mta-sts.{hostname}', dns.rdatatype.TXT))
+
+    lookups = []
+    for mx_result in mx_results:
+        # result is in format "<priority> <domain address/ip>"
+        mx_result_sections = mx_result.split(' ')
+        if len(mx_result_sections) > 1:
+            lookups.append(dns_lookup_async(mx_result_sections[1], dns.rdatatype.A))
+            lookups.append(dns_lookup_async(mx_result_sections[1], dns.rdatatype.AAAA))
+    await asyncio.gather(*lookups)
+
+def validate_email_for_url(url, hostname, global_translation, local_translation):
+    """
+    Validates e-mail support for hostname, if hostname has no MX record
+    the website is searched for an e-mail address using another domain.
+
+    Returns:
+        tuple: Rating and result dictionary.
+    """
+    result_dict = {}
     rating, result_dict = validate_email_domain(
         hostname, result_dict, global_translation, local_translation)
     if rating.get_overall() == -1.0:
         # NO MX record found for domain, look for e-mail on website for alternative e-mail domain.
         content = get_http_content(url, True)
-        time.sleep(1)
         result = search_for_email_domain(content)
         if result is None:
             interesting_urls = get_interesting_urls(content, url, 0)
@@ -148,7 +221,6 @@ def run_test(global_translation, url):
                 result = search_for_email_domain(content)
                 if result is not None:
                     break
-                time.sleep(1)
 
         if result is not None:
             rating, result_dict = validate_email_domain(
@@ -156,24 +228,7 @@ def run_test(global_translation, url):
             rating.overall_review = local_translation('TEXT_REVIEW_MX_ALTERATIVE').format(
                 result, rating.overall_review)
 
-    print(global_translation('TEXT_TEST_END').format(
-        datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-
-    reviews = rating.get_reviews()
-    print(global_translation('TEXT_SITE_RATING'), rating)
-    if get_config('general.review.show'):
-        print(
-            global_translation('TEXT_SITE_REVIEW'),
-            reviews)
-
-    if get_config('general.review.data'):
-        nice_json_data = json.dumps(result_dict, indent=3)
-        print(
-            global_translation('TEXT_SITE_REVIEW_DATA'),
-            f'```json\r\n{nice_json_data}\r\n```')
-
-    return (rating, result_dict)
-
+    return rating, result_dict
 
 def search_for_email_domain(content):
     """
@@ -4,11 +4,10 @@ from urllib.parse import urlparse
 import json
 import os
 from helpers.setting_helper import get_config
-from helpers.browser_helper import get_chromium_browser
 from helpers.models import Rating
 from helpers.sitespeed_helper import get_first_page_entries
 from tests import energy_efficiency_carbon_percentiles
-from tests.sitespeed_base import get_result
+from tests.sitespeed_base import get_shared_capture_result
 from tests.utils import get_translation
 from engines.sitespeed_result import read_sites_from_directory
 
@@ -289,28 +288,7 @@ def get_total_bytes_for_url(url, result_dict):
     int: The total byte weight of the webpage as determined by the sitespeed test.
     """
 
-    # We don't need extra iterations for what we are using it for
-    sitespeed_iterations = 1
-    sitespeed_arg = (
-            f'--shm-size=1g -b {get_chromium_browser()} '
-            '--plugins.add plugin-webperf-core '
-            '--plugins.remove screenshot --plugins.remove html --plugins.remove metrics '
-            '--browsertime.screenshot false --screenshot false --screenshotLCP false '
-            '--browsertime.screenshotLCP false --chrome.cdp.performance false '
-            '--browsertime.chrome.timeline false --videoParams.createFilmstrip false '
-            '--visualMetrics false --visualMetricsPerceptual false '
-            '--visualMetricsContentful false --browsertime.headless true '
-            '--browsertime.chrome.includeResponseBodies all --utc true '
-            '--browsertime.chrome.args ignore-certificate-errors '
-            f'-n {sitespeed_iterations}')
-    if get_config('tests.sitespeed.xvfb'):
-        sitespeed_arg += ' --xvfb'
-
-    (result_folder_name, filename) = get_result(
-        url,
-        get_config('tests.sitespeed.docker.use'),
-        sitespeed_arg,
-        get_config('tests.sitespeed.timeout'))
+    (result_folder_name, filename) = get_shared_capture_result(url)
 
     o = urlparse(url)
     origin_domain = o.hostname
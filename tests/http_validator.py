@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import copy
 import os
 import json
 from datetime import datetime
@@ -12,15 +13,15 @@ import dns.resolver
 import dns.rdatatype
 from helpers.csp_helper import rate_csp
 from helpers.data_helper import append_domain_entry, has_domain_entry
+from helpers.memo_helper import get_memo_value
 from helpers.sitespeed_helper import get_data_from_sitespeed
 from helpers.sri_helper import rate_sri
 from helpers.tls_helper import rate_transfer_layers
 from helpers.setting_helper import get_config
-from helpers.browser_helper import get_chromium_browser
 from helpers.models import Rating
 from tests.utils import change_url_to_test_url, dns_lookup,\
     get_translation, merge_dicts
-from tests.sitespeed_base import get_result
+from tests.sitespeed_base import get_result, get_shared_capture_result
 from engines.sitespeed_result import read_sites_from_directory
 
 csp_only_global_result_dict = {}
@@ -33,6 +34,7 @@ def run_test(global_translation, url):
     global csp_only_global_result_dict # pylint: disable=global-statement
 
     result_dict = {}
+    memo_info = None
 
     local_translation = get_translation(
             'http_validator',
@@ -67,17 +69,21 @@ def run_test(global_translation, url):
 
         csp_only_global_result_dict = result_dict
     else:
-        result_dict = check_http_to_https(url, global_translation)
-        result_dict = check_tls_versions(url, result_dict, global_translation)
-        if org_hostname != hostname:
-            result_dict = check_tls_versions(org_url, result_dict, global_translation)
-        result_dict = check_ip_version(result_dict)
-        result_dict = check_http_version(url, result_dict, global_translation)
+        # Result only depends on the hostname,
+        # other urls on the same host (for example from a sitemap) reuse it.
+        domain_result_dict, memo_info = get_memo_value(
+            'http',
+            org_hostname,
+            lambda: check_domain(url, org_url, org_hostname != hostname, global_translation))
+        result_dict = copy.deepcopy(domain_result_dict)
 
     result_dict = cleanup(result_dict)
 
     rating = rate(hostname, result_dict, global_translation, local_translation)
 
+    if memo_info is not None:
+        result_dict['memo'] = memo_info
+
     print(global_translation('TEXT_TEST_END').format(
         datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
 
@@ -96,6 +102,26 @@ def run_test(global_translation, url):
 
     return (rating, result_dict)
 
+def check_domain(url, org_url, has_www, global_translation):
+    """
+    Checks HTTP to HTTPS redirects, TLS versions, IP versions and HTTP versions.
+
+    Args:
+        url (str): The URL to check (without www.).
+        org_url (str): The URL as given.
+        has_www (bool): True if org_url has a www. subdomain.
+
+    Returns:
+        dict: The result dictionary with information for each domain.
+    """
+    result_dict = check_http_to_https(url, global_translation)
+    result_dict = check_tls_versions(url, result_dict, global_translation)
+    if has_www:
+        result_dict = check_tls_versions(org_url, result_dict, global_translation)
+    result_dict = check_ip_version(result_dict)
+    result_dict = check_http_version(url, result_dict, global_translation)
+    return result_dict
+
 def check_tls_versions(url, result_dict, global_translation):
     """
     Checks the TLS versions for all domains in the result dictionary.
@@ -798,7 +824,8 @@ def check_ip_version(result_dict):
             if not isinstance(result_dict[domain], dict):
                 continue
             if not has_domain_entry(domain, "ip-versions", "IPv4", result_dict):
-                ip4_result = dns_lookup(domain, dns.rdatatype.A)
+                ip4_result, _ = get_memo_value(
+                    'dns-A', domain, lambda domain=domain: dns_lookup(domain, dns.rdatatype.A))
                 if len(ip4_result) > 0:
                     append_domain_entry(domain, "ip-versions", "IPv4*", result_dict)
 
@@ -807,7 +834,8 @@ def check_ip_version(result_dict):
             if not isinstance(result_dict[domain], dict):
                 continue
             if not has_domain_entry(domain, "ip-versions", "IPv6", result_dict):
-                ip6_result = dns_lookup(domain, dns.rdatatype.AAAA)
+                ip6_result, _ = get_memo_value(
+                    'dns-AAAA', domain, lambda domain=domain: dns_lookup(domain, dns.rdatatype.AAAA))
                 if len(ip6_result) > 0:
                     append_domain_entry(domain, "ip-versions", "IPv6*", result_dict)
 
@@ -819,7 +847,7 @@ def get_website_support_from_sitespeed(url, org_domain, configuration, browser,
     and returns the results.
 
     This function constructs the SiteSpeed command with the appropriate arguments based on
-    the browser and configuration.
+    the browser and configuration, Chrome runs are shared with the other HAR based tests.
     It then runs the SiteSpeed command to generate a HAR (HTTP Archive) file.
     The HAR file is parsed to extract the website support information,
     which is returned as a dictionary.
@@ -863,22 +891,16 @@ def get_website_support_from_sitespeed(url, org_domain, configuration, browser,
             '--firefox.preference browser.safebrowsing.phishing.enabled:false'
             f'{configuration} '
             f'{sitespeed_arg}')
-    else:
-        sitespeed_arg = (
-            f'-b {get_chromium_browser()} '
-            '--chrome.cdp.performance false '
-            '--browsertime.chrome.timeline false '
-            '--browsertime.chrome.includeResponseBodies all '
-            '--browsertime.chrome.args ignore-certificate-errors '
-            f'{sitespeed_arg}')
-
-    sitespeed_arg = f'--shm-size=1g {sitespeed_arg}'
+        sitespeed_arg = f'--shm-size=1g {sitespeed_arg}'
 
-    if get_config('tests.sitespeed.xvfb'):
-        sitespeed_arg += ' --xvfb'
+        if get_config('tests.sitespeed.xvfb'):
+            sitespeed_arg += ' --xvfb'
 
-    (result_folder_name, filename) = get_result(
-        url, get_config('tests.sitespeed.docker.use'), sitespeed_arg, timeout)
+        (result_folder_name, filename) = get_result(
+            url, get_config('tests.sitespeed.docker.use'), sitespeed_arg, timeout)
+    else:
+        # Same run as the other HAR based tests, see get_shared_capture_result
+        (result_folder_name, filename) = get_shared_capture_result(url)
 
     o = urlparse(url)
     url_domain = o.hostname
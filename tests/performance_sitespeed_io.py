@@ -3,50 +3,61 @@ import json
 from pathlib import Path
 import os
 import re
-import subprocess
 from datetime import datetime
 from helpers.models import Rating
 from helpers.setting_helper import get_config
+from helpers.politeness_helper import wait_for_host
+from helpers.process_helper import run_process
+from helpers.sitespeed_container_helper import run_in_sitespeed_container
+from helpers.sitespeed_worker_helper import run_sitespeed_job
+from helpers.stats_helper import add_test_cost
 from helpers.browser_helper import get_chromium_browser
 from tests.utils import get_dependency_version, get_translation
 
-def get_result(arg):
+def get_result(url, arg):
     """
     Executes a Sitespeed command and returns the result.
 
     This function runs a Sitespeed command either in a Docker container or directly via Node.js,
     depending on the value of `get_config('tests.sitespeed.docker.use')`.
+    In Docker one container is reused if `tests.sitespeed.docker.reuse` is set and
+    via Node.js the sitespeed.io worker is used if `tests.sitespeed.worker.use` is set.
     The command's output is captured and returned as a string.
 
     Args:
+        url (str): The URL being tested.
         arg (str): The arguments to pass to the Sitespeed command.
 
     Returns:
         str: The output of the Sitespeed command.
     """
     result = ''
+    wait_for_host(url)
+    add_test_cost('sitespeed')
     if get_config('tests.sitespeed.docker.use'):
         base_directory = Path(os.path.dirname(
             os.path.realpath(__file__)) + os.path.sep).parent
         data_dir = base_directory.resolve()
 
         sitespeedio_version = get_dependency_version('sitespeed.io')
+        if get_config('tests.sitespeed.docker.reuse'):
+            return run_in_sitespeed_container(
+                data_dir,
+                f'sitespeedio/sitespeed.io:{sitespeedio_version}',
+                arg.split(),
+                get_config('general.request.timeout') * 10)
+
         command = (f"docker run --rm -v {data_dir}:/sitespeed.io "
                    f"sitespeedio/sitespeed.io:{sitespeedio_version} {arg}")
 
-        with subprocess.Popen(command.split(), stdout=subprocess.PIPE) as process:
-            output, _ = process.communicate(
-                timeout=get_config('general.request.timeout') * 10)
-            result = str(output)
+        result = str(run_process(command.split(), get_config('general.request.timeout') * 10))
+    elif get_config('tests.sitespeed.worker.use'):
+        result = run_sitespeed_job(arg.split(), get_config('general.request.timeout') * 10)
     else:
         command = (f"node node_modules{os.path.sep}sitespeed.io{os.path.sep}bin{os.path.sep}"
                    f"sitespeed.js {arg}")
 
-        with subprocess.Popen(
-            command.split(), stdout=subprocess.PIPE) as process:
-            output, _ = process.communicate(
-                timeout=get_config('general.request.timeout') * 10)
-            result = str(output)
+        result = str(run_process(command.split(), get_config('general.request.timeout') * 10))
 
     return result
 
@@ -225,7 +236,7 @@ def validate_on_mobile_using_validator(url, validator_config):
     if get_config('tests.sitespeed.xvfb'):
         arg = '--xvfb ' + arg
 
-    result_dict = get_result_dict(get_result(arg), validator_config['name'])
+    result_dict = get_result_dict(get_result(url, arg), validator_config['name'])
     result_dict['name'] = validator_config['name']
     result_dict['use_reference'] = validator_config['use_reference']
 
@@ -300,7 +311,7 @@ def validate_on_desktop_using_validator(url, validator_config):
     if get_config('tests.sitespeed.xvfb'):
         arg = '--xvfb ' + arg
 
-    result_dict = get_result_dict(get_result(arg), validator_config['name'])
+    result_dict = get_result_dict(get_result(url, arg), validator_config['name'])
     result_dict['name'] = validator_config['name']
     result_dict['use_reference'] = validator_config['use_reference']
 
@@ -333,7 +344,7 @@ def validate_on_desktop(url):
     if get_config('tests.sitespeed.xvfb'):
         arg = '--xvfb ' + arg
 
-    result_dict = get_result_dict(get_result(arg), 'desktop')
+    result_dict = get_result_dict(get_result(url, arg), 'desktop')
 
     return result_dict
 
@@ -365,7 +376,7 @@ def validate_on_mobile(url):
     if get_config('tests.sitespeed.xvfb'):
         arg = '--xvfb ' + arg
 
-    result_dict = get_result_dict(get_result(arg), 'mobile')
+    result_dict = get_result_dict(get_result(url, arg), 'mobile')
 
     return result_dict
 
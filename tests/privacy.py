@@ -4,13 +4,14 @@ from datetime import datetime
 import os
 import re
 import json
-import subprocess
 import time
 import urllib.parse
 from urllib.parse import urlparse, urljoin
 import requests
 from helpers.models import Rating
 from helpers.setting_helper import get_config
+from helpers.politeness_helper import wait_for_host
+from helpers.process_helper import start_process, stop_process
 from tests.utils import get_translation
 from tests.tracking_validator import get_domains_from_blocklistproject_file
 
@@ -41,11 +42,8 @@ def stop_backend():
     process = BACKEND_PROCESS['process']
     if process is None:
         return
-    process.terminate()
-    try:
-        process.wait(timeout=10)
-    except subprocess.TimeoutExpired:
-        process.kill()
+    # Also stops the browsers it started (see helpers/process_helper.py)
+    stop_process(process)
     BACKEND_PROCESS['process'] = None
 
 def is_backend_alive(api_url):
@@ -90,7 +88,7 @@ def ensure_backend_running(api_url):
         port = 8100
 
     with open(os.devnull, 'w', encoding='utf-8') as devnull:
-        BACKEND_PROCESS['process'] = subprocess.Popen( # pylint: disable=consider-using-with
+        BACKEND_PROCESS['process'] = start_process(
             ['node', 'index.js', str(port)],
             cwd=backend_dir,
             stdout=devnull,
@@ -220,6 +218,8 @@ def get_backend_data(url, local_translation):
     http_timeout = (timeout * 3) + 30
 
     try:
+        # backend visits the website for us
+        wait_for_host(url)
         request = requests.get(
             (f'{api_url}/?fetch_url={urllib.parse.quote(url)}'
              f'&timeout={timeout * 1000}'),
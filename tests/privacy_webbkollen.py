@@ -9,6 +9,7 @@ from bs4 import BeautifulSoup
 from helpers.models import Rating
 from tests.utils import get_translation
 from helpers.setting_helper import get_config
+from helpers.politeness_helper import wait_for_host
 
 # DEFAULTS
 REGEX_ALLOWED_CHARS = r"[^\u00E5\u00E4\u00F6\u00C5\u00C4\u00D6a-zA-Zå-öÅ-Ö 0-9\-:\/]+"
@@ -161,6 +162,8 @@ def get_html_content(orginal_url, lang_code, local_translation):
     has_refresh_statement = True
     had_refresh_statement = False
     session = requests.Session()
+    # webbkoll visits the website for us
+    wait_for_host(orginal_url)
     while has_refresh_statement:
         has_refresh_statement = False
         request = session.get(
@@ -17,6 +17,13 @@ from tests.utils import change_url_to_test_url,\
 import engines.sitespeed_result as sitespeed_cache
 from helpers.setting_helper import get_config
 from helpers.browser_helper import get_chromium_browser
+from helpers.capture_helper import get_shared_capture, set_shared_captures
+from helpers.politeness_helper import wait_for_host
+from helpers.process_helper import run_process
+from helpers.sitespeed_container_helper import run_in_sitespeed_container
+from helpers.sitespeed_worker_helper import run_sitespeed_job
+from helpers.stats_helper import add_test_cost, get_folder_size
+from helpers.worker_helper import get_tmp_folder
 
 
 
@@ -28,6 +35,13 @@ def get_webperf_json(filename):
     return json.loads(data_str)
 
 def create_webperf_json(url, sitespeed_plugins):
+    """
+    Runs sitespeed.io with the given plugins and returns the webperf-core.json result.
+
+    Returns:
+        tuple: The result (or None if the page never loaded) and
+               the error from sitespeed.io (or None if there is a result).
+    """
     # We don't need extra iterations for what we are using it for
     sitespeed_iterations = 1
     sitespeed_arg = (
@@ -46,13 +60,31 @@ def create_webperf_json(url, sitespeed_plugins):
     if get_config('tests.sitespeed.xvfb'):
         sitespeed_arg += ' --xvfb'
 
-    (folder, filename) = get_result(url,
+    (_, filename, output) = get_result_and_output(url,
         get_config('tests.sitespeed.docker.use'),
         sitespeed_arg,
         get_config('tests.sitespeed.timeout'))
 
     data = get_webperf_json(filename)
-    return data
+    if data is None:
+        return (None, get_sitespeed_error(output))
+    return (data, None)
+
+def get_sitespeed_error(output):
+    """
+    Returns the error lines from sitespeed.io output,
+    used to explain why no result was written.
+
+    Args:
+        output (str): The sitespeed.io output.
+
+    Returns:
+        str: The error lines (at most 10).
+    """
+    lines = [line.strip() for line in output.splitlines() if 'ERROR' in line]
+    if len(lines) == 0:
+        return 'No result from sitespeed.io (timeout or crash)'
+    return '\n'.join(lines[:10])
 
 def to_firefox_url_format(url):
     """
@@ -91,7 +123,185 @@ def get_result(url, sitespeed_use_docker, sitespeed_arg, timeout):
     Returns:
         tuple: The name of the result folder and the filename of the HAR file.
     """
-    folder = 'tmp'
+    (folder, filename, _) = get_result_and_output(
+        url, sitespeed_use_docker, sitespeed_arg, timeout)
+    return (folder, filename)
+
+def get_shared_capture_arg():
+    """
+    Returns the sitespeed.io arguments for the shared capture (see get_shared_capture_result).
+    """
+    # We don't need extra iterations for what we are using it for
+    sitespeed_iterations = 1
+    sitespeed_arg = (
+            f'--shm-size=1g -b {get_chromium_browser()} '
+            '--plugins.add plugin-webperf-core '
+            '--plugins.remove screenshot --plugins.remove html --plugins.remove metrics '
+            '--browsertime.screenshot false --screenshot false --screenshotLCP false '
+            '--browsertime.screenshotLCP false --chrome.cdp.performance false '
+            '--browsertime.chrome.timeline false --videoParams.createFilmstrip false '
+            '--visualMetrics false --visualMetricsPerceptual false '
+            '--visualMetricsContentful false --browsertime.headless true '
+            '--browsertime.chrome.includeResponseBodies all --utc true '
+            '--browsertime.chrome.args ignore-certificate-errors '
+            f'-n {sitespeed_iterations}')
+    if get_config('tests.sitespeed.xvfb'):
+        sitespeed_arg += ' --xvfb'
+    return sitespeed_arg
+
+def get_shared_capture_result(url):
+    """
+    Retrieves the result of a Chromium based sitespeed.io run with response bodies
+    for a given URL, shared by all HAR based tests (software, tracking, energy efficiency
+    and HTTP) of the site (see helpers/capture_helper.py).
+    Tests using the result must not change the HAR file.
+
+    Args:
+        url (str): The URL to be tested.
+
+    Returns:
+        tuple: The name of the result folder and the filename of the HAR file,
+               the filename is empty if url was captured in advance (see capture_in_advance).
+    """
+    return get_shared_capture(url, lambda: get_result(
+        url,
+        get_config('tests.sitespeed.docker.use'),
+        get_shared_capture_arg(),
+        get_config('tests.sitespeed.timeout')))
+
+def capture_in_advance(urls):
+    """
+    Captures urls (on the same host) in one sitespeed.io run,
+    the result of every url is then used by get_shared_capture_result.
+    Urls without a page in the result are captured alone when used.
+
+    Args:
+        urls (list): The URLs to capture.
+    """
+    results = get_batch_result(
+        urls,
+        get_config('tests.sitespeed.docker.use'),
+        get_shared_capture_arg(),
+        get_config('tests.sitespeed.timeout'))
+    print(f'Captured {len(results)} of {len(urls)} url(s) in one sitespeed.io run')
+    set_shared_captures(results)
+
+def get_batch_result(urls, sitespeed_use_docker, sitespeed_arg, timeout):
+    """
+    Retrieves the result of one site speed test for many URLs on the same host,
+    split into one result for every URL (see split_batch_result).
+
+    Args:
+        urls (list): The URLs to be tested.
+        sitespeed_use_docker (bool): Whether to use Docker for the site speed test.
+        sitespeed_arg (str): The arguments for the site speed test.
+        timeout (int): The maximum time to wait for one URL to complete.
+
+    Returns:
+        dict: The name of the result folder and an empty filename (see split_batch_result)
+              for every URL with a page in the result.
+    """
+    hostname = urlparse(urls[0]).hostname
+    result_folder_name = os.path.join(get_tmp_folder(), hostname, f'{str(uuid.uuid4())}')
+
+    test_urls = urls
+    if get_config('tests.sitespeed.mobile'):
+        test_urls = [change_url_to_test_url(url, 'mobile') for url in urls]
+        sitespeed_arg += (' --mobile')
+
+    sitespeed_arg += (' --postScript chrome-cookies.cjs --postScript chrome-versions.cjs '
+                      f'--outputFolder {result_folder_name} {" ".join(test_urls)}')
+
+    # The run visits every url, so it takes one request token for each of them
+    for url in urls:
+        wait_for_host(url)
+    get_result_using_no_cache(sitespeed_use_docker, sitespeed_arg, timeout, len(urls))
+    add_test_cost('disk', get_folder_size(result_folder_name))
+
+    return split_batch_result(result_folder_name, urls, test_urls)
+
+def get_batch_url(page, page_index, urls, test_urls):
+    """
+    Returns which of urls a HAR page is for, by its url (or position if it has none).
+    """
+    page_url = page.get('_url', page.get('title', ''))
+    for url, test_url in zip(urls, test_urls):
+        if to_firefox_url_format(test_url) == to_firefox_url_format(page_url):
+            return url
+    if page_url == '' and page_index < len(urls):
+        return urls[page_index]
+    return None
+
+def split_batch_result(result_folder_name, urls, test_urls):
+    """
+    Splits the HAR files of a sitespeed.io run testing many URLs into
+    one result folder for every URL (next to result_folder_name),
+    each page is written together with its entries (by pageref).
+    webperf-core.json is only given for the whole run and can't be split,
+    so no filename is given for it.
+
+    Args:
+        result_folder_name (str): Output folder of the sitespeed.io run.
+        urls (list): The tested URLs.
+        test_urls (list): The URLs given to sitespeed.io (see tests.sitespeed.mobile).
+
+    Returns:
+        dict: The name of the result folder and an empty filename (instead of the
+              webperf-core.json filename given by get_result) for every URL with a page
+              in the result.
+    """
+    results = {}
+    data_folder = os.path.join(result_folder_name, 'data')
+    if not os.path.isdir(data_folder):
+        return results
+
+    for file_name in os.listdir(data_folder):
+        if not file_name.endswith('.har'):
+            continue
+        try:
+            with open(os.path.join(data_folder, file_name), 'r', encoding='utf-8') as file:
+                har_data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            print(f'Warning: Unable to split sitespeed.io result {file_name}')
+            continue
+
+        log = har_data.get('log', har_data)
+        pages = log.get('pages', [])
+        entries = log.get('entries', [])
+        for page_index, page in enumerate(pages):
+            url = get_batch_url(page, page_index, urls, test_urls)
+            if url is None or url in results:
+                continue
+
+            page_log = dict(log)
+            page_log['pages'] = [page]
+            page_log['entries'] = [
+                entry for entry in entries
+                if entry.get('pageref', pages[0].get('id')) == page.get('id')]
+
+            folder = os.path.join(f'{result_folder_name}-{len(results)}', 'data')
+            os.makedirs(folder, exist_ok=True)
+            write_json(os.path.join(folder, file_name),
+                       {'log': page_log} if 'log' in har_data else page_log)
+            results[url] = (folder, '')
+    return results
+
+def get_result_and_output(url, sitespeed_use_docker, sitespeed_arg, timeout):
+    """
+    Retrieves the result of a site speed test for a given URL,
+    together with the output from sitespeed.io.
+
+    Args:
+        url (str): The URL to be tested.
+        sitespeed_use_docker (bool): Whether to use Docker for the site speed test.
+        sitespeed_arg (str): The arguments for the site speed test.
+        timeout (int): The maximum time to wait for the test to complete.
+
+    Returns:
+        tuple: The name of the result folder, the filename of the HAR file and
+               the sitespeed.io output.
+    """
+    folder = get_tmp_folder()
     o = urlparse(url)
     hostname = o.hostname
 
@@ -106,8 +316,10 @@ def get_result(url, sitespeed_use_docker, sitespeed_arg, timeout):
 
     filename = ''
 
+    wait_for_host(url)
     test = get_result_using_no_cache(sitespeed_use_docker, sitespeed_arg, timeout)
     test = test.replace('\\n', '\r\n').replace('\\\\', '\\')
+    add_test_cost('disk', get_folder_size(result_folder_name))
 
     cookies_json = get_cookies(test)
     versions_json = get_versions(test)
@@ -115,7 +327,7 @@ def get_result(url, sitespeed_use_docker, sitespeed_arg, timeout):
     folder = os.path.join(result_folder_name, 'data')
     filename = os.path.join(result_folder_name, 'data', 'webperf-core.json')
 
-    return (folder, filename)
+    return (folder, filename, test)
 
 def get_versions(test):
     """
@@ -197,28 +409,32 @@ def cleanup_results_dir(browsertime_path, path):
         os.rename(lighthouse_path, correct_lighthouse_path)
     shutil.rmtree(path)
 
-def get_result_using_no_cache(sitespeed_use_docker, arg, timeout):
+def get_result_using_no_cache(sitespeed_use_docker, arg, timeout, nof_urls=1):
     """
-    Executes a command using subprocess.Popen and returns the result.
+    Executes a command in its own process group and returns the result.
 
-    If `sitespeed_use_docker` is True, the command is run in a Docker container.
-    Otherwise, it is run on the host system. The command is constructed using
+    If `sitespeed_use_docker` is True, the command is run in a Docker container
+    (reusing one container if tests.sitespeed.docker.reuse is set, see
+    helpers/sitespeed_container_helper.py). Otherwise, it is run on the host system, in the sitespeed.io worker
+    if tests.sitespeed.worker.use is set (see helpers/sitespeed_worker_helper.py). The command is constructed using
     the provided `arg` and `timeout` parameters.
 
-    If the command execution exceeds the `timeout` multiplied by 10, a 
-    subprocess.TimeoutExpired exception is raised, and the process is terminated.
+    If the command execution exceeds the `timeout` multiplied by 10 (for every url), a 
+    subprocess.TimeoutExpired exception is raised, and the process is terminated
+    together with everything it started (see helpers/process_helper.py).
 
     Parameters:
     sitespeed_use_docker (bool): Flag to determine if command should be run in Docker.
     arg (str): Argument to be passed to the command.
     timeout (int): Time limit for the command execution.
+    nof_urls (int): Number of urls tested by the command.
 
     Returns:
     str: Output of the command execution.
     """
     result = ''
-    process = None
-    process_failsafe_timeout = timeout * 10
+    process_failsafe_timeout = timeout * 10 * nof_urls
+    add_test_cost('firefox' if '-b firefox' in arg else 'sitespeed')
     try:
         if sitespeed_use_docker:
             base_directory = Path(os.path.dirname(
@@ -226,19 +442,26 @@ def get_result_using_no_cache(sitespeed_use_docker, arg, timeout):
             data_dir = base_directory.resolve()
 
             sitespeedio_version = get_dependency_version('sitespeed.io')
-            command = (
-                f"docker run --rm -v {data_dir}:/sitespeed.io "
-                f"sitespeedio/sitespeed.io:{sitespeedio_version} "
-                f"--maxLoadTime {(timeout * 1000)} {arg}"
-                )
-
-            with subprocess.Popen(command.split(), stdout=subprocess.PIPE) as process:
-                output, error = process.communicate(timeout=process_failsafe_timeout)
+            if get_config('tests.sitespeed.docker.reuse'):
+                result = run_in_sitespeed_container(
+                    data_dir,
+                    f'sitespeedio/sitespeed.io:{sitespeedio_version}',
+                    f"--maxLoadTime {(timeout * 1000)} {arg}".split(),
+                    process_failsafe_timeout)
+            else:
+                command = (
+                    f"docker run --rm -v {data_dir}:/sitespeed.io "
+                    f"sitespeedio/sitespeed.io:{sitespeedio_version} "
+                    f"--maxLoadTime {(timeout * 1000)} {arg}"
+                    )
 
-                if error is not None:
-                    print('DEBUG get_result_using_no_cache(error)', error)
+                result = str(run_process(command.split(), process_failsafe_timeout))
 
-                result = str(output)
+            if 'Could not locate Firefox on the current system' in result:
+                print('ERROR! Could not locate Firefox on the current system.')
+        elif get_config('tests.sitespeed.worker.use'):
+            result = run_sitespeed_job(
+                f"--maxLoadTime {(timeout * 1000)} {arg}".split(), process_failsafe_timeout)
 
             if 'Could not locate Firefox on the current system' in result:
                 print('ERROR! Could not locate Firefox on the current system.')
@@ -246,21 +469,12 @@ def get_result_using_no_cache(sitespeed_use_docker, arg, timeout):
             command = (f"node node_modules{os.path.sep}sitespeed.io{os.path.sep}"
                        f"bin{os.path.sep}sitespeed.js --maxLoadTime {(timeout * 1000)} {arg}")
 
-            with subprocess.Popen(
-                command.split(), stdout=subprocess.PIPE) as process:
-                output, error = process.communicate(timeout=process_failsafe_timeout)
-
-                if error is not None:
-                    print('DEBUG get_result_using_no_cache(error)', error)
-
-                result = str(output)
+            result = str(run_process(command.split(), process_failsafe_timeout))
 
             if 'Could not locate Firefox on the current system' in result:
                 print('ERROR! Could not locate Firefox on the current system.')
     except subprocess.TimeoutExpired:
-        if process is not None:
-            process.terminate()
-            process.kill()
+        # run_process has already stopped sitespeed.io and the browser it started
         print('TIMEOUT!')
         return result
     return result
@@ -11,14 +11,17 @@ from PIL.ExifTags import TAGS
 from PIL import Image
 # https://docs.python.org/3/library/urllib.parse.html
 import packaging.version
+from helpers.memo_helper import get_resource_memo_value
 from helpers.models import Rating, DefaultInfo
-from helpers.browser_helper import get_chromium_browser
 from helpers.setting_helper import get_config
 from helpers.sitespeed_helper import get_first_page_entries
-from tests.sitespeed_base import get_result
+from tests.sitespeed_base import get_result, get_shared_capture_result
 from tests.utils import get_http_content, get_translation, is_file_older_than
 from engines.sitespeed_result import read_sites_from_directory
 
+# Parsed json files (software-full.json and software-rules.json), see get_cached_json_file
+JSON_FILE_CACHE = {}
+
 # Debug flags for every category here,
 # this so we can print out raw values (so we can add more allowed once)
 raw_data = {
@@ -54,10 +57,24 @@ raw_data = {
 }
 
 
-def get_rating_from_sitespeed(url, local_translation, global_translation):
+def get_firefox_result(url):
+    """
+    Retrieves the result of a Firefox based sitespeed.io run with response bodies
+    for a given URL (used when tests.sitespeed.browser is firefox).
+
+    Returns:
+        tuple: The name of the result folder and the filename of the HAR file.
+    """
     # We don't need extra iterations for what we are using it for
     sitespeed_iterations = 1
     sitespeed_arg = (
+        '--shm-size=1g '
+        '-b firefox '
+        '--firefox.includeResponseBodies all '
+        '--firefox.preference privacy.trackingprotection.enabled:false '
+        '--firefox.preference privacy.donottrackheader.enabled:false '
+        '--firefox.preference browser.safebrowsing.malware.enabled:false '
+        '--firefox.preference browser.safebrowsing.phishing.enabled:false '
         '--plugins.remove screenshot '
         '--plugins.remove html '
         '--plugins.remove metrics '
@@ -74,35 +91,21 @@ def get_rating_from_sitespeed(url, local_translation, global_translation):
         '--utc true '
         f'-n {sitespeed_iterations}')
 
-    if 'firefox' in get_config('tests.sitespeed.browser'):
-        sitespeed_arg = (
-            '-b firefox '
-            '--firefox.includeResponseBodies all '
-            '--firefox.preference privacy.trackingprotection.enabled:false '
-            '--firefox.preference privacy.donottrackheader.enabled:false '
-            '--firefox.preference browser.safebrowsing.malware.enabled:false '
-            '--firefox.preference browser.safebrowsing.phishing.enabled:false '
-            f'{sitespeed_arg}')
-    else:
-        sitespeed_arg = (
-            f'-b {get_chromium_browser()} '
-            '--chrome.cdp.performance false '
-            '--browsertime.chrome.timeline false '
-            '--browsertime.chrome.includeResponseBodies all '
-            '--browsertime.chrome.args ignore-certificate-errors '
-            f'{sitespeed_arg}')
-
-    sitespeed_arg = f'--shm-size=1g {sitespeed_arg}'
-
     if get_config('tests.sitespeed.xvfb'):
         sitespeed_arg += ' --xvfb'
 
-    (result_folder_name, filename) = get_result(
+    return get_result(
         url,
         get_config('tests.sitespeed.docker.use'),
         sitespeed_arg,
         get_config('tests.sitespeed.timeout'))
 
+def get_rating_from_sitespeed(url, local_translation, global_translation):
+    if 'firefox' in get_config('tests.sitespeed.browser'):
+        (result_folder_name, filename) = get_firefox_result(url)
+    else:
+        (result_folder_name, filename) = get_shared_capture_result(url)
+
     o = urlparse(url)
     origin_domain = o.hostname
 
@@ -674,6 +677,27 @@ def enrich_data(data, orginal_domain, result_folder_name, rules):
 
     return data
 
+def get_cached_json_file(file_path):
+    """
+    Returns parsed content of a json file, the content is only parsed again
+    if the file has changed since last time.
+    This so a long running process (for example --serve) don't need to parse
+    the large software files for every site.
+    The returned content is shared and must not be changed by the caller.
+    """
+    modified = os.path.getmtime(file_path)
+    cached = JSON_FILE_CACHE.get(file_path)
+    if cached is not None and cached['modified'] == modified:
+        return cached['content']
+
+    with open(file_path, encoding='utf-8') as json_file:
+        content = json.load(json_file)
+    JSON_FILE_CACHE[file_path] = {
+        'modified': modified,
+        'content': content
+    }
+    return content
+
 def get_softwares():
     base_directory = Path(os.path.dirname(
         os.path.realpath(__file__)) + os.path.sep).parent
@@ -687,9 +711,7 @@ def get_softwares():
             'loaded': False
         }
 
-    with open(file_path, encoding='utf-8') as json_file:
-        softwares = json.load(json_file)
-    return softwares
+    return get_cached_json_file(file_path)
 
 
 def add_known_software_source(name, source_type, match, url):
@@ -1307,8 +1329,100 @@ def lookup_response_content(item, response_mimetype, response_content, rules):
     o = urlparse(req_url)
     hostname = o.hostname
 
+    # Same resources (for example from CDNs) are used by many sites,
+    # only the rule matching is memoized as the result depends on the url.
+    content_matches = get_resource_memo_value(
+        'software',
+        hostname,
+        f'{response_mimetype}\n{response_content}',
+        lambda: get_response_content_matches(response_mimetype, response_content, rules))
+
     is_found = False
-    for rule in rules['contents']:
+    for rule_index, groups in content_matches:
+        rule = rules['contents'][rule_index]
+        match_name = None
+        match_version = None
+        match_github_owner = None
+        match_github_repo = None
+        license_url = None
+
+        if 'name' in groups:
+            match_name = groups['name']
+        if '?P<name>' in rule['match'] and match_name is None:
+            continue
+        if 'version' in groups:
+            match_version = groups['version']
+        if '?P<version>' in rule['match'] and match_version is None:
+            continue
+        if 'owner' in groups:
+            match_github_owner = groups['owner']
+        if '?P<owner>' in rule['match'] and match_github_owner is None:
+            continue
+        if 'repo' in groups:
+            match_github_repo = groups['repo']
+            # fix for repo url ending with .git
+            if match_github_repo.endswith('.git'):
+                name_is_equal = match_github_repo == match_name
+                match_github_repo = match_github_repo[:-4]
+                if name_is_equal:
+                    match_name = match_github_repo
+
+        if '?P<repo>' in rule['match'] and match_github_repo is None:
+            continue
+
+        if 'licensetxt' in groups and 'licensefile' in groups:
+            source_segment = groups['licensefile']
+            license_txt = groups['licensetxt']
+            license_index = req_url.rfind(source_segment)
+            tmp_url = req_url[:license_index]
+            license_url = f'{tmp_url}{source_segment}{license_txt}'
+
+        for result in rule['results']:
+            name = None
+            version = None
+            if 'category' not in result:
+                continue
+            if 'precision' not in result:
+                continue
+
+            category = result['category']
+            precision = result['precision']
+
+            if 'name' in result:
+                name = result['name']
+            else:
+                name = match_name
+            if 'version' in result:
+                version = result['version']
+            else:
+                version = match_version
+
+            if precision > 0.0:
+                info = get_default_info(
+                    req_url, 'content', precision, category, name, version)
+                if match_github_owner is not None:
+                    info['github-owner'] = match_github_owner
+                if match_github_repo is not None:
+                    info['github-repo'] = match_github_repo
+                if license_url is not None:
+                    info['license-txt'] = license_url
+                info['mime-type'] = response_mimetype
+
+                item['matches'].append(info)
+                is_found = True
+            elif raw_data['contents']['use'] and not is_found:
+                raw_data['contents'][groups['debug']] = hostname
+
+def get_response_content_matches(response_mimetype, response_content, rules):
+    """
+    Returns content rules matching response content.
+
+    Returns:
+        list: Tuples with index of rule in rules['contents'] and
+              named groups of the match, in the order they were found.
+    """
+    content_matches = []
+    for rule_index, rule in enumerate(rules['contents']):
         if 'use' not in rule:
             continue
         if not rule['use']:
@@ -1323,84 +1437,11 @@ def lookup_response_content(item, response_mimetype, response_content, rules):
         if rule['type'] not in response_mimetype:
             continue
 
-
         regex = r"{0}".format(rule['match'])
         matches = re.finditer(regex, response_content, re.IGNORECASE)
-        for _, match in enumerate(matches, start=1):
-            match_name = None
-            match_version = None
-            match_github_owner = None
-            match_github_repo = None
-            license_url = None
-
-            groups = match.groupdict()
-
-            if 'name' in groups:
-                match_name = groups['name']
-            if '?P<name>' in rule['match'] and match_name is None:
-                continue
-            if 'version' in groups:
-                match_version = groups['version']
-            if '?P<version>' in rule['match'] and match_version is None:
-                continue
-            if 'owner' in groups:
-                match_github_owner = groups['owner']
-            if '?P<owner>' in rule['match'] and match_github_owner is None:
-                continue
-            if 'repo' in groups:
-                match_github_repo = groups['repo']
-                # fix for repo url ending with .git
-                if match_github_repo.endswith('.git'):
-                    name_is_equal = match_github_repo == match_name
-                    match_github_repo = match_github_repo[:-4]
-                    if name_is_equal:
-                        match_name = match_github_repo
-
-            if '?P<repo>' in rule['match'] and match_github_repo is None:
-                continue
-
-            if 'licensetxt' in groups and 'licensefile' in groups:
-                source_segment = groups['licensefile']
-                license_txt = groups['licensetxt']
-                license_index = req_url.rfind(source_segment)
-                tmp_url = req_url[:license_index]
-                license_url = f'{tmp_url}{source_segment}{license_txt}'
-
-            for result in rule['results']:
-                name = None
-                version = None
-                if 'category' not in result:
-                    continue
-                if 'precision' not in result:
-                    continue
-
-                category = result['category']
-                precision = result['precision']
-
-                if 'name' in result:
-                    name = result['name']
-                else:
-                    name = match_name
-                if 'version' in result:
-                    version = result['version']
-                else:
-                    version = match_version
-
-                if precision > 0.0:
-                    info = get_default_info(
-                        req_url, 'content', precision, category, name, version)
-                    if match_github_owner is not None:
-                        info['github-owner'] = match_github_owner
-                    if match_github_repo is not None:
-                        info['github-repo'] = match_github_repo
-                    if license_url is not None:
-                        info['license-txt'] = license_url
-                    info['mime-type'] = response_mimetype
-
-                    item['matches'].append(info)
-                    is_found = True
-                elif raw_data['contents']['use'] and not is_found:
-                    raw_data['contents'][match.group('debug')] = hostname
+        for match in matches:
+            content_matches.append((rule_index, match.groupdict()))
+    return content_matches
 
 def get_default_info(url, method, precision, key, name, version, domain=None):
     result = {}
@@ -1702,9 +1743,7 @@ def get_rules():
     if not os.path.isfile(file_path):
         print("ERROR: No software-rules.json file found!")
 
-    with open(file_path, encoding='utf-8') as json_rules_file:
-        rules = json.load(json_rules_file)
-    return rules
+    return get_cached_json_file(file_path)
 
 def run_test(global_translation, url):
     """
@@ -45,7 +45,7 @@ def run_test(global_translation, url):
     sitespeed_plugins = (
         '--plugins.add plugin-standard-files '
         '--plugins.add plugin-webperf-core ')
-    data = create_webperf_json(url, sitespeed_plugins)
+    (data, _) = create_webperf_json(url, sitespeed_plugins)
 
     result_dict = build_result_dict(url, data)
     if result_dict is None:
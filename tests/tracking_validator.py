@@ -7,13 +7,13 @@ import re
 # https://docs.python.org/3/library/urllib.parse.html
 from urllib.parse import urlparse
 from datetime import datetime, timedelta, date
+from helpers.memo_helper import get_resource_memo_value
 from helpers.models import Rating
 from helpers.setting_helper import get_config
-from helpers.browser_helper import get_chromium_browser
 from helpers.sitespeed_helper import get_first_page_entries
 from tests.utils import get_best_country_code, get_friendly_url_name,\
     get_translation, is_country_code_in_eu_or_on_exception_list
-from tests.sitespeed_base import get_result
+from tests.sitespeed_base import get_shared_capture_result
 from engines.sitespeed_result import read_sites_from_directory
 
 def get_domains_from_url(url):
@@ -392,6 +392,19 @@ def rate_cookies(content, url, local_translation, global_translation):
     return result_rating
 
 
+def get_country_code_for_entry(entry):
+    """
+    Returns country code for server IP address of a HAR entry,
+    memoized by host and IP address as the same hosts are used by many sites.
+    """
+    ip_address = entry['serverIPAddress']
+    host = urlparse(entry.get('request', {}).get('url', '')).hostname
+    return get_resource_memo_value(
+        'country',
+        host,
+        ip_address,
+        lambda: get_best_country_code(ip_address, ''))
+
 def rate_gdpr_and_schrems(content, local_translation, global_translation):
     rating = Rating(global_translation, get_config('general.review.improve-only'))
 
@@ -411,12 +424,7 @@ def rate_gdpr_and_schrems(content, local_translation, global_translation):
         entries = json_content['entries']
         number_of_entries = len(entries)
         page_entry = entries[0]
-        page_countrycode = ''
-
-        page_ip_address = page_entry['serverIPAddress']
-
-        page_countrycode = get_best_country_code(
-            page_ip_address, page_countrycode)
+        page_countrycode = get_country_code_for_entry(page_entry)
         if page_countrycode == '':
             page_countrycode = 'unknown'
 
@@ -430,11 +438,7 @@ def rate_gdpr_and_schrems(content, local_translation, global_translation):
                     request_friendly_name = get_friendly_url_name(global_translation,
                         url, entries_index + 1)
 
-            entry_country_code = ''
-
-            entry_ip_address = entries[entries_index]['serverIPAddress']
-            entry_country_code = get_best_country_code(
-                entry_ip_address, entry_country_code)
+            entry_country_code = get_country_code_for_entry(entries[entries_index])
 
             if entry_country_code == '' or entry_country_code == '-':
                 entry_country_code = 'unknown'
@@ -766,30 +770,7 @@ def rate_ads(website_urls, local_translation, global_translation):
 def get_rating_from_sitespeed(url, local_translation, global_translation):
     rating = Rating(global_translation, get_config('general.review.improve-only'))
 
-    # We don't need extra iterations for what we are using it for
-    sitespeed_iterations = 1
-
-    sitespeed_arg = (
-        f'--shm-size=1g -b {get_chromium_browser()} '
-        '--plugins.add plugin-webperf-core '
-        '--plugins.remove screenshot --plugins.remove html --plugins.remove metrics '
-        '--browsertime.screenshot false --screenshot false --screenshotLCP false '
-        '--browsertime.screenshotLCP false --chrome.cdp.performance false '
-        '--browsertime.chrome.timeline false --videoParams.createFilmstrip false '
-        '--visualMetrics false --visualMetricsPerceptual false '
-        '--visualMetricsContentful false '
-        '--browsertime.headless true '
-        '--browsertime.chrome.includeResponseBodies all '
-        '--utc true --browsertime.chrome.args '
-        f'ignore-certificate-errors -n {sitespeed_iterations}')
-    if get_config('tests.sitespeed.xvfb'):
-        sitespeed_arg += ' --xvfb'
-
-    (result_folder_name, filename) = get_result(
-        url,
-        get_config('tests.sitespeed.docker.use'),
-        sitespeed_arg,
-        get_config('tests.sitespeed.timeout'))
+    (result_folder_name, filename) = get_shared_capture_result(url)
 
     o = urlparse(url)
     origin_domain = o.hostname
@@ -905,13 +886,26 @@ def get_analytics(global_translation, local_translation, url, content, request_i
 
     url_and_content = url + content
 
+    # Same resources (for example analytics scripts) are used by many sites
+    names = get_resource_memo_value(
+        'analytics',
+        urlparse(url).hostname,
+        url_and_content,
+        lambda: get_analytics_names(url_and_content, analytics_rules))
+    for name in names:
+        analytics[text.format(request_friendly_name, name)] = True
+
+    return analytics
+
+def get_analytics_names(url_and_content, analytics_rules):
+    names = []
     for rule in analytics_rules:
         name = rule['name']
         for match in rule['matches']:
             if (match in url_and_content):
-                analytics[text.format(request_friendly_name, name)] = True
-
-    return analytics
+                names.append(name)
+                break
+    return names
 
 
 
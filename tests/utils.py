@@ -7,7 +7,6 @@ import shutil
 import sys
 import ssl
 import json
-import time
 import urllib  # https://docs.python.org/3/library/urllib.parse.html
 import urllib.parse
 import uuid
@@ -18,6 +17,7 @@ import gettext
 import requests
 import IP2Location
 import dns
+import dns.asyncquery
 import dns.query
 import dns.resolver
 import dns.dnssec
@@ -25,6 +25,9 @@ import dns.exception
 import dns.name
 
 from helpers.setting_helper import get_config
+from helpers.politeness_helper import wait_for_host, wait_for_resolver,\
+    wait_for_resolver_async
+from helpers.stats_helper import add_test_cost
 
 CONFIG_WARNINGS = {}
 IP2_LOCATION_DB = {
@@ -480,6 +483,8 @@ def get_http_content(url, allow_redirects=False, use_text_instead_of_content=Tru
         hostname = urlparse(url).hostname
         if hostname == 'api.github.com' and get_config('github.api.key') is not None:
             headers['authorization'] = f"Bearer {get_config('github.api.key')}"
+        wait_for_host(url)
+        add_test_cost('http')
         response = requests.get(url, allow_redirects=allow_redirects,
                          headers=headers, timeout=get_config('general.request.timeout')*2)
 
@@ -583,6 +588,8 @@ def get_url_headers(url, cache_time_delta):
             return headers
 
         headers = {'user-agent': get_config('useragent')}
+        wait_for_host(url)
+        add_test_cost('http')
         a = requests.head(url, allow_redirects=True,
                          headers=headers, timeout=get_config('general.request.timeout')*2)
 
@@ -593,8 +600,6 @@ def get_url_headers(url, cache_time_delta):
                 'status-code': a.status_code
             }
 
-        time.sleep(5)
-
         headers = dict(a.headers)
         headers['status-code'] = a.status_code
         nice_headers = json.dumps(headers, indent=3)
@@ -647,6 +652,8 @@ def has_redirect(url):
     error_msg = None
     try:
         headers = {'user-agent': get_config('useragent')}
+        wait_for_host(url)
+        add_test_cost('http')
         response = requests.get(url, allow_redirects=True,
                          headers=headers, timeout=get_config('general.request.timeout')*2)
 
@@ -721,19 +728,11 @@ def dns_lookup(key, datatype):
             query = dns.message.make_query(key, datatype, want_dnssec=False)
 
         # Send the query and get the response
+        wait_for_resolver(get_config('general.dns.address'))
+        add_test_cost('dns')
         response = dns.query.udp(query, get_config('general.dns.address'))
 
-        if response.rcode() != 0:
-            # HANDLE QUERY FAILED (SERVER ERROR OR NO DNSKEY RECORD)
-            # print('\t\tERROR, RCODE is INVALID:', response.rcode())
-            return []
-
-        text_response = response.to_text()
-        set_cache_file(cache_key, text_response, True)
-
-        time.sleep(5)
-
-        return dns_response_to_list(response)
+        return get_dns_response_list(cache_key, response)
     except dns.query.BadResponse as br:
         print('\t\tDNS Bad response', br)
     except dns.exception.Timeout:
@@ -751,6 +750,53 @@ def dns_lookup(key, datatype):
 
     return []
 
+async def dns_lookup_async(key, datatype):
+    """
+    Same as dns_lookup (sharing its cache) but lets other tasks on the event loop run
+    while waiting for the answer, used by tests implementing run_test_async.
+
+    Args:
+        key (str): The domain or hostname to look up.
+        datatype (int or str): The DNS record type, same value as used with dns_lookup.
+
+    Returns:
+        list: A list containing the DNS records found for the given key.
+    """
+    cache_key = f'dnslookup://{key}#{datatype}#False'
+    if has_cache_file(cache_key, True, timedelta(minutes=get_config('general.cache.max-age'))):
+        return dns_lookup(key, datatype)
+
+    try:
+        query = dns.message.make_query(key, datatype, want_dnssec=False)
+        await wait_for_resolver_async(get_config('general.dns.address'))
+        add_test_cost('dns')
+        response = await dns.asyncquery.udp(query, get_config('general.dns.address'))
+        return get_dns_response_list(cache_key, response)
+    except dns.query.BadResponse as br:
+        print('\t\tDNS Bad response', br)
+    except dns.exception.Timeout:
+        print('\t\tDNS Timeout')
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+        return []
+    except dns.name.BadEscape as be:
+        print('\t\tDNS BAD Escape for:', key, be)
+
+    return []
+
+def get_dns_response_list(cache_key, response):
+    """
+    Caches a DNS response (if the query succeeded) and returns it as a list of names.
+    """
+    if response.rcode() != 0:
+        # HANDLE QUERY FAILED (SERVER ERROR OR NO DNSKEY RECORD)
+        # print('\t\tERROR, RCODE is INVALID:', response.rcode())
+        return []
+
+    text_response = response.to_text()
+    set_cache_file(cache_key, text_response, True)
+
+    return dns_response_to_list(response)
+
 def dns_response_to_list(dns_response):
     """
     Converts a DNS response to a list of names.